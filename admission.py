@@ -0,0 +1,189 @@
+"""Contrôle d'admission des générations, partagé entre les workers via SQLite.
+
+Deux limites sont vérifiées dans une même transaction :
+- un seau à jetons par utilisateur (`rate` jetons par seconde, `burst` au
+  maximum), qui borne la fréquence des générations d'un même compte ;
+- un nombre maximal de générations en cours sur la machine, tous workers
+  confondus. Chaque génération admise prend un bail, rendu à la fin ; les
+  baux plus vieux que `lease_ttl` (worker arrêté en cours de génération) sont
+  ignorés puis supprimés.
+
+Une requête refusée lève AdmissionRejected avec le délai après lequel
+réessayer (en-tête Retry-After). Si la base est inaccessible, les requêtes
+sont admises : le limiteur ne doit pas rendre la génération indisponible.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class AdmissionRejected(Exception):
+    """Levée quand une génération est refusée (limite de l'utilisateur ou limite globale)."""
+
+    def __init__(self, message, reason, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Seau à jetons par utilisateur et limite globale de générations en cours."""
+
+    def __init__(self, path, rate=0.1, burst=3, max_in_flight=32, lease_ttl=180, busy_retry_after=5,
+                 cleanup_interval=60):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.lease_ttl = lease_ttl
+        self.busy_retry_after = busy_retry_after
+        self.cleanup_interval = cleanup_interval
+        self._last_cleanup = 0.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected_rate = 0
+        self.rejected_busy = 0
+        self.errors = 0
+        self.refunded = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS admission_buckets ("
+            " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS admission_leases ("
+            " id TEXT PRIMARY KEY, key TEXT NOT NULL, started_at REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        # Une connexion par thread et par processus (les workers sont forkés)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def acquire(self, key):
+        """Admet une génération pour `key` et retourne son bail, ou lève AdmissionRejected."""
+        now = time.time()
+        lease_id = uuid.uuid4().hex
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rejection = self._check(conn, key, lease_id, now)
+                conn.execute('COMMIT' if rejection is None else 'ROLLBACK')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            print(f"⚠️ Erreur du contrôle d'admission: {e}")
+            self._count('errors')
+            return None
+        if rejection is not None:
+            self._count('rejected_rate' if rejection.reason == 'rate' else 'rejected_busy')
+            raise rejection
+        self._count('admitted')
+        return lease_id
+
+    def _check(self, conn, key, lease_id, now):
+        """Vérifie les deux limites et prend le bail ; retourne l'AdmissionRejected éventuelle."""
+        row = conn.execute(
+            "SELECT tokens, updated_at FROM admission_buckets WHERE key = ?", (key,)
+        ).fetchone()
+        tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+        if tokens < 1:
+            retry_after = math.ceil((1 - tokens) / self.rate) if self.rate else self.busy_retry_after
+            return AdmissionRejected("Trop de générations demandées, veuillez réessayer plus tard.",
+                                     'rate', retry_after)
+
+        conn.execute("DELETE FROM admission_leases WHERE started_at <= ?", (now - self.lease_ttl,))
+        (in_flight,) = conn.execute("SELECT COUNT(*) FROM admission_leases").fetchone()
+        if in_flight >= self.max_in_flight:
+            return AdmissionRejected("Trop de générations en cours, veuillez réessayer dans quelques instants.",
+                                     'busy', self.busy_retry_after)
+
+        conn.execute(
+            "INSERT OR REPLACE INTO admission_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+            (key, tokens - 1, now)
+        )
+        if self.rate and now - self._last_cleanup >= self.cleanup_interval:
+            # Seaux de nouveau pleins : équivalents à un utilisateur inconnu
+            self._last_cleanup = now
+            conn.execute("DELETE FROM admission_buckets WHERE updated_at <= ?", (now - self.burst / self.rate,))
+        conn.execute(
+            "INSERT INTO admission_leases (id, key, started_at) VALUES (?, ?, ?)", (lease_id, key, now)
+        )
+        return None
+
+    def release(self, lease_id):
+        """Rend le bail d'une génération terminée."""
+        if lease_id is None:
+            return
+        try:
+            self._connection().execute("DELETE FROM admission_leases WHERE id = ?", (lease_id,))
+        except sqlite3.Error as e:
+            print(f"⚠️ Erreur du contrôle d'admission: {e}")
+            self._count('errors')
+
+    def refund(self, lease_id):
+        """Rend le bail et le jeton d'une génération admise qui n'a finalement pas été lancée (file pleine)."""
+        if lease_id is None:
+            return
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute("SELECT key FROM admission_leases WHERE id = ?", (lease_id,)).fetchone()
+                conn.execute("DELETE FROM admission_leases WHERE id = ?", (lease_id,))
+                if row is not None:
+                    conn.execute(
+                        "UPDATE admission_buckets SET tokens = MIN(tokens + 1, ?) WHERE key = ?", (self.burst, row[0])
+                    )
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            print(f"⚠️ Erreur du contrôle d'admission: {e}")
+            self._count('errors')
+            return
+        if row is not None:
+            self._count('refunded')
+
+    def in_flight(self):
+        try:
+            (count,) = self._connection().execute(
+                "SELECT COUNT(*) FROM admission_leases WHERE started_at > ?", (time.time() - self.lease_ttl,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        return count
+
+    def stats(self):
+        """Compteurs du worker courant ; `in_flight` compte les générations de tous les workers."""
+        with self._lock:
+            stats = {
+                'admitted': self.admitted,
+                'rejected_rate': self.rejected_rate,
+                'rejected_busy': self.rejected_busy,
+                'errors': self.errors,
+                'refunded': self.refunded,
+            }
+        stats['in_flight'] = self.in_flight()
+        stats['max_in_flight'] = self.max_in_flight
+        return stats
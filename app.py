@@ -1,26 +1,68 @@
 import os
+import asyncio
 import json
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_from_directory
+import hashlib
+import time
+import click
+from flask import Flask, Response, g, render_template, request, jsonify, session, redirect, url_for, send_from_directory
 from flask_cors import CORS
 from flask_session import Session
-import firebase_admin
-from firebase_admin import credentials, auth
-from firebase_admin import firestore
 from dotenv import load_dotenv
+from cache import MISSING, SQLiteCache, make_cache
+from singleflight import AsyncSingleFlight, SingleFlight, SingleFlightTimeout
+from plan_stream import IncrementalPlanParser, LatencyStats
+from jobs import JobManager, QueueFullError
+from write_behind import WriteBehindBuffer
+from sessions import ServerSideSession, SQLiteSessionInterface
+from token_verification import CachedTokenVerifier, firebase_token_verifier
+from plan_codec import PlanCodec
+from local_planner import LocalPlanGenerator
+from plan_validation import PlanValidator, complete_plan, request_validated_plan, request_validated_plan_async
+from prompt_builder import PromptBuilder, TokenUsageStats
+from static_assets import JSONAsset
+from asset_pipeline import AssetManifest
+from page_cache import PageCache
+from blog_store import BlogStore
+from sitemap import Sitemap
+from admission import AdmissionController, AdmissionRejected
+from hedging import HedgePolicy
+from lazy_services import LazyService
+from metrics import DEPENDENCY_BUCKETS, Metrics
+from resilience import CircuitBreaker, CircuitOpenError, ResilientClient, RetryPolicy
 
 # Load environment variables from .env file
 load_dotenv()
 
-try:
-    from openai import OpenAI
-    client = OpenAI()
-except ImportError:
-    client = None
+def create_openai_client():
+    """Client OpenAI, créé à la première génération (le SDK est long à importer)"""
+    try:
+        from openai import OpenAI
+    except ImportError:
+        return None
+    return OpenAI()
+
+openai_client = LazyService('openai', create_openai_client)
+
+# Connexions HTTP simultanées du client AsyncOpenAI (point d'entrée ASGI), partagées par les générations
+ASYNC_GENERATION_MAX_CONNECTIONS = int(os.environ.get('ASYNC_GENERATION_MAX_CONNECTIONS', 200))
+
+def create_async_openai_client():
+    """Client AsyncOpenAI du point d'entrée ASGI, avec un seul pool de connexions par worker"""
+    try:
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    except ImportError:
+        return None
+    limits = httpx.Limits(max_connections=ASYNC_GENERATION_MAX_CONNECTIONS,
+                          max_keepalive_connections=ASYNC_GENERATION_MAX_CONNECTIONS)
+    return AsyncOpenAI(http_client=DefaultAsyncHttpxClient(limits=limits))
+
+async_openai_client = LazyService('openai-async', create_async_openai_client)
 
 app = Flask(__name__)
+# Valeurs d'exemple (code, README) : publiques, elles ne protègent aucun cookie signé
+PLACEHOLDER_SECRET_KEYS = {'your-secret-key-change-this', 'your-super-secret-key-change-this', 'your-secret-key'}
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-this')
-app.config['SESSION_TYPE'] = 'filesystem'
-Session(app)
 
 CORS(app)
 
@@ -48,6 +90,13 @@ TIME_BASED_EXERCISES = {
 
 DAY_MAPPING = {1: "Lundi", 2: "Mardi", 3: "Mercredi", 4: "Jeudi", 5: "Vendredi", 6: "Samedi", 7: "Dimanche"}
 
+# Mappings inverses (nom -> ID), calculés une seule fois
+EXERCISE_TO_ID = {v: k for k, v in EXERCISE_MAPPING.items()}
+DAY_TO_ID = {v: k for k, v in DAY_MAPPING.items()}
+
+# Format binaire compact des plans (cache, Firestore)
+plan_codec = PlanCodec(EXERCISE_MAPPING, DAY_MAPPING)
+
 # Firebase configuration - using environment variables for security
 FIREBASE_CONFIG = {
     "type": "service_account",
@@ -63,7 +112,6 @@ FIREBASE_CONFIG = {
 }
 
 # Check if Firebase credentials are properly configured
-firebase_initialized = False
 missing_credentials = []
 
 # Check for missing environment variables
@@ -85,21 +133,259 @@ if missing_credentials:
     for cred in missing_credentials:
         print(f"  - {cred}")
     print("Firebase authentication will not work without these credentials.")
-    db = None
-else:
+
+def init_firebase():
+    """Initialise Firebase Admin au premier usage ; retourne l'application (None sans identifiants)"""
+    if missing_credentials:
+        return None
+    import firebase_admin
+    from firebase_admin import auth, credentials
+    try:
+        firebase_app = firebase_admin.get_app()
+    except ValueError:
+        firebase_app = firebase_admin.initialize_app(credentials.Certificate(FIREBASE_CONFIG))
+    print("✅ Firebase Admin SDK initialized successfully")
     try:
-        cred = credentials.Certificate(FIREBASE_CONFIG)
-        firebase_admin.initialize_app(cred)
-        firebase_initialized = True
-        db = firestore.client()
-        print("✅ Firebase Admin SDK initialized successfully")
+        # Mesure et préchargement des certificats utilisés pour vérifier les ID tokens
+        if token_verifier.attach(firebase_token_verifier(auth)):
+            token_verifier.start()
+        else:
+            print("⚠️ Version de firebase-admin non prise en charge : certificats Firebase non préchargés")
     except Exception as e:
-        print(f"❌ Firebase initialization error: {e}")
-        print("Firebase authentication will not work.")
-        db = None
+        print(f"⚠️ Préchargement des certificats Firebase indisponible: {e}")
+    return firebase_app
+
+def init_firestore():
+    """Client Firestore, créé à la première lecture ou écriture d'un plan"""
+    if firebase.get() is None:
+        return None
+    from firebase_admin import firestore
+    return firestore.client()
+
+firebase = LazyService('firebase', init_firebase)
+firestore_db = LazyService('firestore', init_firestore)
+
+def get_db():
+    """Client Firestore, ou None si Firebase n'est pas configuré"""
+    return firestore_db.get()
+
+def verify_id_token(id_token):
+    from firebase_admin import auth
+    with dependency_duration.time('firebase_auth', 'verify_id_token'):
+        return auth.verify_id_token(id_token)
+
+# Base SQLite des caches partagés entre les workers d'une même machine
+CACHE_DB_PATH = os.environ.get('CACHE_DB_PATH', os.path.join(app.instance_path, 'cache.sqlite3'))
+
+# Métriques Prometheus (/metrics), additionnées entre les workers via un instantané par processus
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+metrics = Metrics(
+    os.environ.get('METRICS_DIR', os.path.join(app.instance_path, 'metrics')),
+    prefix='corvio_',
+    flush_interval=float(os.environ.get('METRICS_FLUSH_INTERVAL', 5)),
+    enabled=METRICS_ENABLED
+)
+http_request_duration = metrics.histogram(
+    'http_request_duration_seconds', "Durée des requêtes HTTP par route", ('method', 'route', 'status'))
+dependency_duration = metrics.histogram(
+    'dependency_duration_seconds', "Durée des appels aux services externes (OpenAI, Firestore, Firebase Auth)",
+    ('dependency', 'operation', 'outcome'), buckets=DEPENDENCY_BUCKETS)
+
+if METRICS_ENABLED:
+    @app.before_request
+    def start_request_timer():
+        metrics.start()
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_duration(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            http_request_duration.observe(time.perf_counter() - started, request.method, route,
+                                          str(response.status_code))
+        return response
+
+# Sessions : "cookie" (cookie signé, défaut), "sqlite" (base indexée partagée) ou "filesystem" (Flask-Session)
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cookie')
+if SESSION_BACKEND == 'cookie' and (not os.environ.get('SECRET_KEY') or app.secret_key in PLACEHOLDER_SECRET_KEYS):
+    # Le cookie contient l'uid : signé avec une clé connue, n'importe qui pourrait se faire passer pour un autre compte
+    print("⚠️ SECRET_KEY absente ou valeur d'exemple : sessions stockées en SQLite au lieu du cookie signé")
+    SESSION_BACKEND = 'sqlite'
+# Ne réécrire la session que lorsqu'elle est modifiée
+app.config['SESSION_REFRESH_EACH_REQUEST'] = False
+if SESSION_BACKEND == 'filesystem':
+    app.config['SESSION_TYPE'] = 'filesystem'
+    Session(app)
+elif SESSION_BACKEND == 'sqlite':
+    app.session_interface = SQLiteSessionInterface(SQLiteCache(
+        CACHE_DB_PATH,
+        namespace='sessions',
+        max_entries=int(os.environ.get('SESSION_MAX_ENTRIES', 1000000)),
+        ttl=int(app.permanent_session_lifetime.total_seconds()),
+        cleanup_interval=60
+    ))
+
+# Cache des plans utilisateurs (borné, LRU), stockés au format binaire compact
+def encode_cached_plan(plan):
+    return plan_codec.encode(plan)
+
+def decode_cached_plan(data):
+    if data[:1] == b'{':
+        # Entrée écrite en JSON compressé par une version précédente
+        return decompress_workout_plan(json.loads(data))
+    return plan_codec.decode(data)
+
+# Backend : "memory" (propre au worker), "sqlite" (partagé) ou "tiered" (copie locale versionnée + partagé)
+plan_cache = make_cache(
+    os.environ.get('PLAN_CACHE_BACKEND', 'tiered'),
+    path=CACHE_DB_PATH,
+    namespace='plans',
+    max_entries=int(os.environ.get('PLAN_CACHE_SIZE', 10000)),
+    max_bytes=int(os.environ.get('PLAN_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    ttl=int(os.environ.get('PLAN_CACHE_TTL', 0)) or None,
+    negative_ttl=int(os.environ.get('PLAN_CACHE_NEGATIVE_TTL', 300)),
+    encode=encode_cached_plan,
+    decode=decode_cached_plan
+)
+
+# Cache des plans générés, partagé entre les workers via SQLite
+generation_cache = SQLiteCache(
+    CACHE_DB_PATH,
+    namespace='generation',
+    max_entries=int(os.environ.get('GENERATION_CACHE_SIZE', 5000)),
+    ttl=int(os.environ.get('GENERATION_CACHE_TTL', 7 * 24 * 3600))
+)
+GENERATION_CACHE_ENABLED = os.environ.get('GENERATION_CACHE_ENABLED', '1') != '0'
+
+# Regroupement des générations concurrentes pour un même profil
+generation_flight = SingleFlight(timeout=int(os.environ.get('GENERATION_WAIT_TIMEOUT', 90)))
+async_generation_flight = AsyncSingleFlight(timeout=int(os.environ.get('GENERATION_WAIT_TIMEOUT', 90)))
+
+# Latences du streaming : premier jour affiché et plan complet
+stream_first_day_latency = LatencyStats()
+stream_total_latency = LatencyStats()
+
+# Générations en tâche de fond : pool borné, file limitée, délai par tâche
+GENERATION_JOBS_ENABLED = os.environ.get('GENERATION_JOBS_ENABLED', '1') != '0'
+# Attente maximale d'une requête de suivi (?wait=) : elle occupe un worker synchrone
+GENERATION_JOB_MAX_WAIT = 2
+# Affichage jour par jour via /generate-stream : la vue garde un worker synchrone pendant tout l'appel OpenAI
+GENERATION_STREAM_UI = os.environ.get('GENERATION_STREAM_UI', '0') == '1'
+generation_jobs = JobManager(
+    SQLiteCache(CACHE_DB_PATH, namespace='jobs', max_entries=10000),
+    max_workers=int(os.environ.get('GENERATION_WORKERS', 4)),
+    max_queue=int(os.environ.get('GENERATION_QUEUE_SIZE', 16)),
+    job_timeout=int(os.environ.get('GENERATION_JOB_TIMEOUT', 120))
+)
+
+# Contrôle d'admission des générations : fréquence par utilisateur et générations en cours (tous workers)
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') != '0'
+generation_admission = AdmissionController(
+    CACHE_DB_PATH,
+    rate=float(os.environ.get('GENERATION_RATE_PER_MINUTE', 6)) / 60,
+    burst=int(os.environ.get('GENERATION_BURST', 3)),
+    max_in_flight=int(os.environ.get('GENERATION_MAX_IN_FLIGHT', 32)),
+    lease_ttl=int(os.environ.get('GENERATION_JOB_TIMEOUT', 120)) + 60
+)
+
+# Statistiques exposées sur /stats (nom -> fonction retournant un dict)
+STATS_PROVIDERS = {
+    'generation_cache': generation_cache.stats,
+    'plan_cache': plan_cache.stats,
+    'generation_flight': generation_flight.stats,
+    'stream_first_day': stream_first_day_latency.stats,
+    'stream_total': stream_total_latency.stats,
+    'generation_jobs': generation_jobs.stats,
+    'async_generation_flight': async_generation_flight.stats,
+    'admission': generation_admission.stats,
+}
+
+# Vérification des ID tokens : résultat gardé jusqu'à `exp`, certificats Google préchargés
+token_verifier = CachedTokenVerifier(
+    verify_id_token,
+    max_entries=int(os.environ.get('TOKEN_CACHE_SIZE', 10000)),
+    refresh_margin=int(os.environ.get('TOKEN_CERT_REFRESH_MARGIN', 300))
+)
+STATS_PROVIDERS['token_verifier'] = token_verifier.stats
+STATS_PROVIDERS['services'] = lambda: {service.name: service.stats()
+                                       for service in (openai_client, async_openai_client, firebase, firestore_db)}
+
+# Création des clients OpenAI/Firebase/Firestore au démarrage du worker (hook post_fork de gunicorn)
+# plutôt qu'à la première requête qui en a besoin
+SDK_WARMUP = os.environ.get('SDK_WARMUP', '1') != '0'
 
-# In-memory storage for user workout plans
-user_workout_plans = {}
+def warm_up():
+    """Initialise les SDK utilisés par l'application et démarre le rafraîchissement des certificats"""
+    if GENERATION_MODE != 'local' and os.environ.get('OPENAI_API_KEY'):
+        openai_client.get()
+    get_db()
+    token_verifier.start()
+
+# Mode de génération : "local" (générateur local uniquement), "llm-fallback" (OpenAI, puis générateur
+# local en cas de délai dépassé ou d'erreur) ou "llm" (OpenAI uniquement)
+GENERATION_MODE = os.environ.get('GENERATION_MODE', 'llm-fallback')
+GENERATION_LLM_TIMEOUT = float(os.environ.get('GENERATION_LLM_TIMEOUT', 20))
+# Budget de temps de tous les appels OpenAI d'une génération (relances et nouvelles tentatives comprises)
+GENERATION_BUDGET = float(os.environ.get('GENERATION_BUDGET',
+                                         GENERATION_LLM_TIMEOUT if GENERATION_MODE == 'llm-fallback' else 60))
+# Nouvelles tentatives (erreurs transitoires uniquement) et délai maximal de chaque appel
+openai_retry = RetryPolicy(
+    max_retries=int(os.environ.get('OPENAI_MAX_RETRIES', 2)),
+    call_timeout=float(os.environ.get('OPENAI_CALL_TIMEOUT', 30))
+)
+# Disjoncteur : échec immédiat (ou plan local) quand OpenAI renvoie trop d'erreurs transitoires
+openai_breaker = CircuitBreaker(
+    'openai',
+    error_rate=float(os.environ.get('OPENAI_BREAKER_ERROR_RATE', 0.5)),
+    min_calls=int(os.environ.get('OPENAI_BREAKER_MIN_CALLS', 10)),
+    window=float(os.environ.get('OPENAI_BREAKER_WINDOW', 60)),
+    open_seconds=float(os.environ.get('OPENAI_BREAKER_OPEN_SECONDS', 30))
+)
+STATS_PROVIDERS['openai_breaker'] = openai_breaker.stats
+STATS_PROVIDERS['openai_retry'] = openai_retry.stats
+# Couverture (hedging) de la première requête OpenAI d'une génération quand elle dépasse le percentile de latence
+GENERATION_HEDGING = os.environ.get('GENERATION_HEDGING', '0') == '1'
+generation_hedge = HedgePolicy(
+    percentile=float(os.environ.get('HEDGE_PERCENTILE', 95)),
+    max_rate=float(os.environ.get('HEDGE_MAX_RATE', 0.1))
+)
+if GENERATION_HEDGING:
+    STATS_PROVIDERS['hedging'] = generation_hedge.stats
+# Catalogue des exercices : lu une fois, servi précompressé (relu si le fichier change)
+exercise_catalogue = JSONAsset(
+    os.path.join(app.root_path, 'static', 'data', 'exercises.json'),
+    max_age=int(os.environ.get('EXERCISES_MAX_AGE', 86400))
+)
+STATS_PROVIDERS['exercise_catalogue'] = exercise_catalogue.stats
+# CSS/JS avec empreinte (générés par `python asset_pipeline.py`) : url_for('static', ...) pointe
+# vers static/dist/ et ces fichiers sont servis précompressés avec un cache d'un an
+asset_manifest = AssetManifest(app.static_folder)
+if asset_manifest.assets and os.environ.get('STATIC_FINGERPRINTS', '1') != '0':
+    app.url_defaults(asset_manifest.url_defaults)
+    app.view_functions['static'] = asset_manifest.wrap_static_view(app.view_functions['static'])
+    print(f"✅ {len(asset_manifest.assets)} fichiers statiques avec empreinte")
+local_generator = LocalPlanGenerator([], TIME_BASED_EXERCISES)
+STATS_PROVIDERS['local_generator'] = local_generator.stats
+
+# Prompt limité aux exercices accessibles à l'utilisateur, tokens consommés par appel
+prompt_builder = PromptBuilder([], TIME_BASED_EXERCISES)
+token_usage = TokenUsageStats()
+STATS_PROVIDERS['token_usage'] = token_usage.stats
+
+def load_exercise_catalogue(exercises):
+    """Recharge le générateur local et le prompt avec le catalogue ; seuls les IDs décompressables sont gardés"""
+    exercises = [exercise for exercise in exercises if exercise.get('id') in EXERCISE_MAPPING]
+    local_generator.load(exercises)
+    prompt_builder.load(exercises)
+
+# Au démarrage, puis à chaque modification de static/data/exercises.json
+exercise_catalogue.on_reload(load_exercise_catalogue)
+
+# Validation des plans renvoyés par OpenAI (schéma JSON, réparation, relance des jours manquants)
+plan_validator = PlanValidator(EXERCISE_MAPPING, TIME_BASED_EXERCISES)
+PLAN_MAX_REASKS = int(os.environ.get('PLAN_MAX_REASKS', 1))
+STATS_PROVIDERS['plan_validation'] = plan_validator.stats
 
 # Load product suggestions
 PRODUCT_SUGGESTIONS = [
@@ -125,434 +411,46 @@ PRODUCT_SUGGESTIONS = [
     }
 ]
 
-# Blog articles data (5 articles)
-BLOG_ARTICLES = [
-    {
-        "id": "musculation-debutants",
-        "title": "Guide complet de la musculation pour débutants",
-        "category": "Musculation",
-        "date": "28 Juillet 2025",
-        "image": "strength-training.png",
-        "excerpt": "Découvrez les bases essentielles de la musculation : exercices fondamentaux, techniques correctes et progression adaptée aux débutants.",
-        "content": """
-        <h2>Les bases de la musculation</h2>
-        <p>La musculation est une discipline sportive qui vise à développer la force et la masse musculaire. Pour les débutants, il est essentiel de comprendre les principes fondamentaux avant de commencer. Cette discipline ne se résume pas à soulever des poids, mais implique une approche holistique du développement physique.</p>
-        
-        <h3>Les exercices fondamentaux</h3>
-        <p>Avant de vous lancer dans des exercices complexes, maîtrisez ces mouvements de base qui constituent la fondation de toute routine de musculation efficace :</p>
-        <ul>
-            <li><strong>Pompes</strong> : Excellent exercice pour les pectoraux et les triceps. Commencez par 3 séries de 5-10 répétitions selon votre niveau.</li>
-            <li><strong>Squats</strong> : Indispensable pour les jambes et les fessiers. Cet exercice poly-articulaire engage tout le bas du corps.</li>
-            <li><strong>Gainage</strong> : Pour renforcer la ceinture abdominale et améliorer votre posture générale.</li>
-            <li><strong>Tractions</strong> : Développez votre dos et vos biceps avec cet exercice essentiel.</li>
-            <li><strong>Fentes</strong> : Travaillez l'équilibre et renforcez vos jambes de manière unilatérale.</li>
-        </ul>
-        
-        <h3>Techniques correctes</h3>
-        <p>La qualité prime sur la quantité. Il est préférable de faire moins de répétitions avec une technique parfaite que l'inverse. Voici les points clés à respecter :</p>
-        <ul>
-            <li><strong>Contrôle du mouvement</strong> : Effectuez chaque répétition de manière contrôlée, sans à-coups.</li>
-            <li><strong>Respiration</strong> : Expirez lors de l'effort, inspirez lors du retour à la position initiale.</li>
-            <li><strong>Amplitude complète</strong> : Utilisez toute l'amplitude de mouvement pour maximiser l'efficacité.</li>
-            <li><strong>Posture</strong> : Maintenez une posture correcte pour éviter les blessures.</li>
-        </ul>
-        
-        <h3>Progression adaptée</h3>
-        <p>Commencez progressivement et augmentez l'intensité au fil des semaines. Votre corps a besoin de temps pour s'adapter. Voici un plan de progression sur 8 semaines :</p>
-        <ul>
-            <li><strong>Semaines 1-2</strong> : Apprentissage des mouvements de base, 2-3 séances par semaine</li>
-            <li><strong>Semaines 3-4</strong> : Augmentation du volume d'entraînement, ajout de variantes</li>
-            <li><strong>Semaines 5-6</strong> : Intensification progressive, introduction de charges</li>
-            <li><strong>Semaines 7-8</strong> : Optimisation de la routine, personnalisation selon vos objectifs</li>
-        </ul>
-        
-        <h3>Récupération et nutrition</h3>
-        <p>N'oubliez pas que la musculation ne se limite pas à l'entraînement. La récupération et la nutrition sont tout aussi importantes :</p>
-        <ul>
-            <li><strong>Sommeil</strong> : 7-9 heures par nuit pour une récupération optimale</li>
-            <li><strong>Protéines</strong> : 1.6-2.2g par kg de poids corporel pour soutenir la croissance musculaire</li>
-            <li><strong>Hydratation</strong> : Au moins 2 litres d'eau par jour</li>
-            <li><strong>Étirements</strong> : 10-15 minutes après chaque séance</li>
-        </ul>
-        
-        <h3>Objectifs et motivation</h3>
-        <p>Définissez des objectifs réalistes et mesurables. Que ce soit perdre du poids, gagner en force ou améliorer votre silhouette, chaque objectif nécessite une approche spécifique. Gardez un journal d'entraînement pour suivre vos progrès et rester motivé.</p>
-        """
-    },
-    {
-        "id": "cardio-efficace",
-        "title": "5 séances de cardio efficaces pour brûler les graisses",
-        "category": "Cardio",
-        "date": "30 Juillet 2025",
-        "image": "cardio-workout.png",
-        "excerpt": "Optimisez votre perte de poids avec ces entraînements cardio variés et intensifs, adaptés à tous les niveaux.",
-        "content": """
-        <h2>Le cardio pour perdre du poids</h2>
-        <p>Le cardio est essentiel pour brûler des calories et améliorer votre condition cardiovasculaire. Contrairement aux idées reçues, il ne s'agit pas seulement de courir des heures sur un tapis. Voici 5 séances variées et efficaces pour maximiser vos résultats.</p>
-        
-        <h3>Séance 1 : HIIT (High Intensity Interval Training)</h3>
-        <p>Le HIIT est l'une des méthodes les plus efficaces pour brûler des graisses. Cette technique alterne des périodes d'effort intense avec des périodes de récupération active.</p>
-        <ul>
-            <li><strong>Échauffement</strong> : 5 minutes de cardio léger</li>
-            <li><strong>Intervalles</strong> : 30 secondes d'effort intense suivies de 30 secondes de récupération</li>
-            <li><strong>Répétitions</strong> : 10-15 cycles selon votre niveau</li>
-            <li><strong>Exercices</strong> : Burpees, jumping jacks, mountain climbers, high knees</li>
-            <li><strong>Récupération</strong> : 5 minutes d'étirements</li>
-        </ul>
-        
-        <h3>Séance 2 : Course à pied progressive</h3>
-        <p>La course à pied reste un classique efficace. Cette séance progressive vous permettra d'améliorer votre endurance tout en brûlant des calories.</p>
-        <ul>
-            <li><strong>Échauffement</strong> : 10 minutes de marche rapide</li>
-            <li><strong>Phase 1</strong> : 5 minutes de course à un rythme modéré</li>
-            <li><strong>Phase 2</strong> : 10 minutes d'alternance course/marche</li>
-            <li><strong>Phase 3</strong> : 5 minutes de course continue</li>
-            <li><strong>Récupération</strong> : 5 minutes de marche lente</li>
-        </ul>
-        
-        <h3>Séance 3 : Vélo avec variations d'intensité</h3>
-        <p>Le vélo est excellent pour les articulations tout en offrant un entraînement cardio efficace. Cette séance combine endurance et intensité.</p>
-        <ul>
-            <li><strong>Échauffement</strong> : 10 minutes à résistance faible</li>
-            <li><strong>Intervalles</strong> : 2 minutes à haute intensité, 3 minutes à intensité modérée</li>
-            <li><strong>Durée totale</strong> : 45 minutes</li>
-            <li><strong>Variations</strong> : Montez en selle, sprints assis, pédalage en danseuse</li>
-        </ul>
-        
-        <h3>Séance 4 : Natation complète</h3>
-        <p>La natation est un sport complet qui sollicite tous les muscles tout en préservant les articulations. Parfait pour la récupération active.</p>
-        <ul>
-            <li><strong>Échauffement</strong> : 5 minutes de nage libre à rythme lent</li>
-            <li><strong>Techniques</strong> : Alternance crawl, brasse, dos crawlé</li>
-            <li><strong>Intervalles</strong> : 50m sprint, 50m récupération</li>
-            <li><strong>Durée</strong> : 30-45 minutes selon votre niveau</li>
-        </ul>
-        
-        <h3>Séance 5 : Marche rapide en extérieur</h3>
-        <p>Accessible à tous, la marche rapide peut être très efficace si pratiquée correctement. Idéale pour les débutants ou en récupération.</p>
-        <ul>
-            <li><strong>Intensité</strong> : Rythme soutenu (vous devez pouvoir parler mais pas chanter)</li>
-            <li><strong>Durée</strong> : 45-60 minutes</li>
-            <li><strong>Variations</strong> : Inclinaisons, escaliers, terrains variés</li>
-            <li><strong>Bonus</strong> : Exposition à la nature et vitamine D</li>
-        </ul>
-        
-        <h3>Optimisation de vos séances cardio</h3>
-        <p>Pour maximiser l'efficacité de vos entraînements cardio :</p>
-        <ul>
-            <li><strong>Fréquence</strong> : 3-5 séances par semaine selon vos objectifs</li>
-            <li><strong>Intensité</strong> : Variez entre séances d'endurance et d'intensité</li>
-            <li><strong>Progression</strong> : Augmentez progressivement la durée et l'intensité</li>
-            <li><strong>Récupération</strong> : Accordez-vous au moins un jour de repos par semaine</li>
-            <li><strong>Hydratation</strong> : Buvez avant, pendant et après l'effort</li>
-        </ul>
-        
-        <h3>Mesure de vos progrès</h3>
-        <p>Suivez vos améliorations pour rester motivé :</p>
-        <ul>
-            <li><strong>Fréquence cardiaque</strong> : Mesurez votre FC de repos et d'effort</li>
-            <li><strong>Durée</strong> : Augmentez progressivement la durée de vos séances</li>
-            <li><strong>Intensité</strong> : Notez vos sensations d'effort (échelle de Borg)</li>
-            <li><strong>Récupération</strong> : Observez l'amélioration de votre temps de récupération</li>
-        </ul>
-        """
-    },
-    {
-        "id": "nutrition-sportive",
-        "title": "Nutrition sportive : que manger avant et après l'entraînement",
-        "category": "Nutrition",
-        "date": "31 Juillet 2025",
-        "image": "nutrition.png",
-        "excerpt": "Maximisez vos performances et votre récupération grâce à une alimentation adaptée à vos objectifs sportifs.",
-        "content": """
-        <h2>L'importance de la nutrition sportive</h2>
-        <p>Une alimentation adaptée peut faire la différence entre une séance moyenne et une séance exceptionnelle. La nutrition sportive ne se limite pas à manger plus, mais à manger mieux au bon moment. Voici un guide complet pour optimiser vos performances.</p>
-        
-        <h3>Avant l'entraînement : Le carburant</h3>
-        <p>Ce que vous mangez avant l'effort détermine vos performances. Voici un timing précis pour optimiser votre énergie :</p>
-        <ul>
-            <li><strong>2-3 heures avant</strong> : Repas complet avec glucides complexes (riz, pâtes, quinoa), protéines maigres (poulet, poisson, œufs) et légumes. Exemple : Riz complet + poulet + brocolis</li>
-            <li><strong>1 heure avant</strong> : Collation légère riche en glucides simples (banane, pomme, barre énergétique naturelle)</li>
-            <li><strong>30 minutes avant</strong> : Hydratation suffisante (500ml d'eau) et éventuellement un café pour booster les performances</li>
-            <li><strong>15 minutes avant</strong> : Évitez de manger pour laisser le sang disponible pour les muscles</li>
-        </ul>
-        
-        <h3>Pendant l'entraînement : L'hydratation</h3>
-        <p>Pour les séances de moins d'une heure, l'eau suffit. Pour les efforts plus longs :</p>
-        <ul>
-            <li><strong>Hydratation</strong> : 150-200ml toutes les 15-20 minutes</li>
-            <li><strong>Électrolytes</strong> : Pour les efforts de plus d'une heure, ajoutez du sel ou une boisson isotonique</li>
-            <li><strong>Glucides</strong> : Pour les séances de plus de 90 minutes, consommez 30-60g de glucides par heure</li>
-        </ul>
-        
-        <h3>Après l'entraînement : La fenêtre anabolique</h3>
-        <p>Les 30 premières minutes après l'effort sont cruciales pour la récupération et la croissance musculaire :</p>
-        <ul>
-            <li><strong>Dans les 30 minutes</strong> : Protéines (20-30g) + glucides simples (30-60g). Exemple : Shake protéiné + banane ou yaourt grec + miel</li>
-            <li><strong>Dans les 2 heures</strong> : Repas équilibré complet avec protéines, glucides complexes et lipides</li>
-            <li><strong>Hydratation</strong> : Compensez les pertes hydriques (1.5L par kg perdu)</li>
-        </ul>
-        
-        <h3>Macronutriments selon vos objectifs</h3>
-        <p>Adaptez vos apports selon vos objectifs sportifs :</p>
-        <ul>
-            <li><strong>Perte de poids</strong> : Déficit calorique modéré (-300 à -500 kcal), protéines élevées (1.8-2.2g/kg), glucides modérés</li>
-            <li><strong>Prise de muscle</strong> : Surplus calorique léger (+200 à +500 kcal), protéines élevées (1.6-2.2g/kg), glucides suffisants</li>
-            <li><strong>Endurance</strong> : Glucides élevés (6-10g/kg), protéines modérées (1.2-1.6g/kg)</li>
-            <li><strong>Force</strong> : Protéines élevées (1.6-2.2g/kg), glucides modérés, lipides suffisants</li>
-        </ul>
-        
-        <h3>Micronutriments essentiels</h3>
-        <p>N'oubliez pas les vitamines et minéraux qui soutiennent vos performances :</p>
-        <ul>
-            <li><strong>Vitamine D</strong> : Essentielle pour la force musculaire et la récupération</li>
-            <li><strong>Magnésium</strong> : Aide à la contraction musculaire et prévient les crampes</li>
-            <li><strong>Zinc</strong> : Important pour la synthèse protéique et la récupération</li>
-            <li><strong>Vitamines B</strong> : Nécessaires pour la production d'énergie</li>
-            <li><strong>Antioxydants</strong> : Vitamines C et E pour lutter contre le stress oxydatif</li>
-        </ul>
-        
-        <h3>Supplémentation intelligente</h3>
-        <p>Certains suppléments peuvent compléter une alimentation équilibrée :</p>
-        <ul>
-            <li><strong>Protéines en poudre</strong> : Pratique pour atteindre vos besoins quotidiens</li>
-            <li><strong>Créatine</strong> : Améliore les performances en force et puissance</li>
-            <li><strong>BCAA</strong> : Peuvent aider à la récupération musculaire</li>
-            <li><strong>Oméga-3</strong> : Anti-inflammatoires naturels</li>
-            <li><strong>Vitamine D</strong> : Complément souvent nécessaire en hiver</li>
-        </ul>
-        
-        <h3>Planification et préparation</h3>
-        <p>La réussite en nutrition sportive passe par une bonne organisation :</p>
-        <ul>
-            <li><strong>Planification hebdomadaire</strong> : Préparez vos repas à l'avance</li>
-            <li><strong>Liste de courses</strong> : Établissez une liste basée sur vos besoins nutritionnels</li>
-            <li><strong>Préparation</strong> : Cuisinez en batch pour gagner du temps</li>
-            <li><strong>Flexibilité</strong> : Adaptez selon vos séances du jour</li>
-        </ul>
-        """
-    },
-    {
-        "id": "entrainement-domicile",
-        "title": "Programme d'entraînement complet à domicile sans matériel",
-        "category": "Entraînement",
-        "date": "1 Août 2025",
-        "image": "home-workout.png",
-        "excerpt": "Restez en forme même sans salle de sport avec ce programme complet utilisant uniquement votre poids de corps.",
-        "content": """
-        <h2>L'entraînement à domicile</h2>
-        <p>Pas besoin d'équipement coûteux pour se muscler et rester en forme. Votre corps est votre meilleur outil. L'entraînement à domicile offre de nombreux avantages : flexibilité horaire, économies, pas de déplacement, et la possibilité de s'entraîner n'importe où. Voici un programme complet et progressif.</p>
-        
-        <h3>Programme hebdomadaire complet</h3>
-        <p>Ce programme de 7 jours est conçu pour solliciter tous les groupes musculaires tout en respectant les principes de récupération :</p>
-        <ul>
-            <li><strong>Lundi - Haut du corps</strong> : Pompes, dips, gainage, tractions (si possible)</li>
-            <li><strong>Mardi - Bas du corps</strong> : Squats, fentes, mollets, wall sit</li>
-            <li><strong>Mercredi - Repos actif</strong> : Étirements, yoga, marche</li>
-            <li><strong>Jeudi - Cardio HIIT</strong> : Burpees, jumping jacks, mountain climbers</li>
-            <li><strong>Vendredi - Corps complet</strong> : Circuit training avec tous les exercices</li>
-            <li><strong>Samedi - Flexibilité</strong> : Étirements, yoga, mobilité</li>
-            <li><strong>Dimanche - Repos complet</strong> : Récupération, promenade légère</li>
-        </ul>
-        
-        <h3>Exercices clés par groupe musculaire</h3>
-        <p>Maîtrisez ces exercices fondamentaux avant d'ajouter de la complexité :</p>
-        
-        <h4>Haut du corps</h4>
-        <ul>
-            <li><strong>Pompes classiques</strong> : 3 séries de 8-15 répétitions</li>
-            <li><strong>Pompes diamant</strong> : Pour les triceps (plus difficile)</li>
-            <li><strong>Pompes larges</strong> : Pour les pectoraux</li>
-            <li><strong>Dips sur chaise</strong> : Triceps et épaules</li>
-            <li><strong>Gainage planche</strong> : 3 séries de 30-60 secondes</li>
-        </ul>
-        
-        <h4>Bas du corps</h4>
-        <ul>
-            <li><strong>Squats</strong> : 3 séries de 15-20 répétitions</li>
-            <li><strong>Fentes avant</strong> : 3 séries de 10 par jambe</li>
-            <li><strong>Fentes latérales</strong> : Pour les adducteurs</li>
-            <li><strong>Wall sit</strong> : 3 séries de 30-60 secondes</li>
-            <li><strong>Mollets</strong> : 3 séries de 20-30 répétitions</li>
-        </ul>
-        
-        <h4>Cardio et explosivité</h4>
-        <ul>
-            <li><strong>Burpees</strong> : Exercice complet par excellence</li>
-            <li><strong>Jumping jacks</strong> : Cardio simple et efficace</li>
-            <li><strong>Mountain climbers</strong> : Cardio + gainage</li>
-            <li><strong>High knees</strong> : Cardio intense</li>
-            <li><strong>Jump squats</strong> : Force explosive</li>
-        </ul>
-        
-        <h3>Progression sur 12 semaines</h3>
-        <p>Ce plan de progression vous permettra d'évoluer de débutant à intermédiaire :</p>
-        
-        <h4>Semaines 1-4 : Fondation</h4>
-        <ul>
-            <li>Apprentissage des mouvements de base</li>
-            <li>2-3 séances par semaine</li>
-            <li>Focus sur la technique</li>
-            <li>Récupération suffisante</li>
-        </ul>
-        
-        <h4>Semaines 5-8 : Développement</h4>
-        <ul>
-            <li>Augmentation du volume</li>
-            <li>Ajout de variantes</li>
-            <li>4-5 séances par semaine</li>
-            <li>Introduction de circuits</li>
-        </ul>
-        
-        <h4>Semaines 9-12 : Intensification</h4>
-        <ul>
-            <li>Complexité accrue</li>
-            <li>Supersets et circuits</li>
-            <li>5-6 séances par semaine</li>
-            <li>Objectifs personnalisés</li>
-        </ul>
-        
-        <h3>Variantes et progressions</h3>
-        <p>Une fois les exercices de base maîtrisés, ajoutez de la difficulté :</p>
-        <ul>
-            <li><strong>Pompes</strong> : Pompes déclinées, pompes sur une main</li>
-            <li><strong>Squats</strong> : Squats sautés, pistol squats</li>
-            <li><strong>Gainage</strong> : Planche latérale, gainage dynamique</li>
-            <li><strong>Cardio</strong> : Burpees avec pompe, mountain climbers croisés</li>
-        </ul>
-        
-        <h3>Équipement minimal (optionnel)</h3>
-        <p>Si vous souhaitez investir dans du matériel basique :</p>
-        <ul>
-            <li><strong>Tapis de yoga</strong> : Confort et amorti</li>
-            <li><strong>Élastiques</strong> : Résistance progressive</li>
-            <li><strong>Haltères</strong> : Pour ajouter de la charge</li>
-            <li><strong>Barre de traction</strong> : Pour les tractions</li>
-        </ul>
-        
-        <h3>Motivation et suivi</h3>
-        <p>Gardez la motivation avec ces stratégies :</p>
-        <ul>
-            <li><strong>Journal d'entraînement</strong> : Notez vos progrès</li>
-            <li><strong>Photos</strong> : Suivez vos transformations</li>
-            <li><strong>Objectifs SMART</strong> : Spécifiques, mesurables, atteignables</li>
-            <li><strong>Communauté</strong> : Rejoignez des groupes en ligne</li>
-            <li><strong>Variété</strong> : Changez régulièrement vos routines</li>
-        </ul>
-        """
-    },
-    {
-        "id": "recuperation-musculaire",
-        "title": "Les secrets d'une récupération musculaire optimale",
-        "category": "Récupération",
-        "date": "2 Août 2025",
-        "image": "recovery.png",
-        "excerpt": "Découvrez les techniques et astuces pour accélérer votre récupération et éviter les blessures.",
-        "content": """
-        <h2>La récupération : clé du progrès</h2>
-        <p>La récupération est aussi importante que l'entraînement lui-même. C'est pendant cette phase que vos muscles se reconstruisent, s'adaptent et se renforcent. Une récupération optimale vous permettra de progresser plus rapidement tout en évitant les blessures et le surentraînement.</p>
-        
-        <h3>Comprendre le processus de récupération</h3>
-        <p>Après un entraînement, votre corps passe par plusieurs phases de récupération :</p>
-        <ul>
-            <li><strong>Phase immédiate (0-4h)</strong> : Restauration des réserves énergétiques, réduction de l'inflammation</li>
-            <li><strong>Phase courte (4-24h)</strong> : Réparation des micro-lésions musculaires, synthèse protéique</li>
-            <li><strong>Phase longue (24-72h)</strong> : Adaptation musculaire, amélioration de la performance</li>
-            <li><strong>Phase de surcompensation</strong> : Le corps se renforce au-delà du niveau initial</li>
-        </ul>
-        
-        <h3>Techniques de récupération actives</h3>
-        <p>La récupération active favorise la circulation sanguine et accélère l'élimination des déchets métaboliques :</p>
-        <ul>
-            <li><strong>Étirements dynamiques</strong> : Après chaque séance, 10-15 minutes d'étirements progressifs</li>
-            <li><strong>Récupération active</strong> : 20-30 minutes de cardio léger (marche, vélo) le lendemain d'une séance intense</li>
-            <li><strong>Mobilité articulaire</strong> : Exercices de mobilité pour maintenir l'amplitude de mouvement</li>
-            <li><strong>Yoga ou pilates</strong> : Améliore la flexibilité et réduit le stress</li>
-        </ul>
-        
-        <h3>Techniques de récupération passives</h3>
-        <p>Ces techniques favorisent la relaxation et la régénération :</p>
-        <ul>
-            <li><strong>Sommeil</strong> : 7-9 heures par nuit, qualité plus importante que quantité</li>
-            <li><strong>Étirements statiques</strong> : 30 secondes par muscle, sans forcer</li>
-            <li><strong>Massage</strong> : Auto-massage avec rouleau de mousse ou balle de tennis</li>
-            <li><strong>Compression</strong> : Vêtements compressifs pour améliorer la circulation</li>
-            <li><strong>Contraste chaud/froid</strong> : Douche alternée ou bain de glace</li>
-        </ul>
-        
-        <h3>Nutrition pour la récupération</h3>
-        <p>L'alimentation joue un rôle crucial dans la récupération musculaire :</p>
-        <ul>
-            <li><strong>Protéines</strong> : 20-30g dans les 30 minutes post-entraînement pour la synthèse musculaire</li>
-            <li><strong>Glucides</strong> : 30-60g pour restaurer les réserves de glycogène</li>
-            <li><strong>Antioxydants</strong> : Fruits et légumes colorés pour lutter contre le stress oxydatif</li>
-            <li><strong>Oméga-3</strong> : Anti-inflammatoires naturels (poissons gras, noix)</li>
-            <li><strong>Hydratation</strong> : Compensez les pertes hydriques (1.5L par kg perdu)</li>
-        </ul>
-        
-        <h3>Gestion du stress et récupération mentale</h3>
-        <p>Le stress chronique peut impacter négativement votre récupération :</p>
-        <ul>
-            <li><strong>Techniques de respiration</strong> : Respiration diaphragmatique pour réduire le cortisol</li>
-            <li><strong>Méditation</strong> : 10-15 minutes par jour pour la relaxation mentale</li>
-            <li><strong>Nature</strong> : Marche en extérieur pour réduire le stress</li>
-            <li><strong>Sommeil de qualité</strong> : Chambre fraîche, sombre et silencieuse</li>
-            <li><strong>Déconnexion</strong> : Limitez les écrans avant le coucher</li>
-        </ul>
-        
-        <h3>Signes de surentraînement à surveiller</h3>
-        <p>Reconnaissez ces signaux pour éviter le surentraînement :</p>
-        <ul>
-            <li><strong>Physiques</strong> : Fatigue persistante, baisse de performance, douleurs articulaires</li>
-            <li><strong>Mentaux</strong> : Irritabilité, troubles du sommeil, perte de motivation</li>
-            <li><strong>Immunitaires</strong> : Infections fréquentes, temps de récupération prolongé</li>
-            <li><strong>Cardiovasculaires</strong> : Fréquence cardiaque de repos élevée</li>
-        </ul>
-        
-        <h3>Planification de la récupération</h3>
-        <p>Intégrez la récupération dans votre planification d'entraînement :</p>
-        <ul>
-            <li><strong>Déload week</strong> : Une semaine de réduction d'intensité toutes les 4-6 semaines</li>
-            <li><strong>Récupération active</strong> : 1-2 jours par semaine</li>
-            <li><strong>Sommeil prioritaire</strong> : Planifiez vos heures de coucher</li>
-            <li><strong>Évaluation régulière</strong> : Notez votre niveau de fatigue et d'énergie</li>
-            <li><strong>Adaptation</strong> : Ajustez selon vos sensations et votre récupération</li>
-        </ul>
-        
-        <h3>Outils et technologies de récupération</h3>
-        <p>Utilisez ces outils pour optimiser votre récupération :</p>
-        <ul>
-            <li><strong>Rouleau de mousse</strong> : Auto-massage et relâchement myofascial</li>
-            <li><strong>Balle de tennis/lacrosse</strong> : Massage ciblé des points de tension</li>
-            <li><strong>Vêtements compressifs</strong> : Améliorent la circulation et réduisent les courbatures</li>
-            <li><strong>Appareils de récupération</strong> : Pistolets de massage, appareils de stimulation électrique</li>
-            <li><strong>Applications de suivi</strong> : Monitoring du sommeil, de la fréquence cardiaque</li>
-        </ul>
-        """
-    }
-]
+
+# Articles du blog : index chargé au démarrage, corps lus à la demande (content/blog/)
+blog_store = BlogStore(
+    os.path.join(app.root_path, 'content', 'blog'),
+    body_cache_size=int(os.environ.get('BLOG_BODY_CACHE_SIZE', 64)),
+    per_page=int(os.environ.get('BLOG_PAGE_SIZE', 12))
+)
+STATS_PROVIDERS['blog'] = blog_store.stats
 
 # Fonction pour récupérer un article par ID
 def get_article_by_id(article_id):
-    for article in BLOG_ARTICLES:
-        if article['id'] == article_id:
-            return article
-    return None
+    return blog_store.get(article_id)
+
+# URL canonique du site (balises og:) : les pages en cache ne dépendent pas de l'en-tête Host
+SITE_URL = os.environ.get('SITE_URL', 'https://corvio.xyz').rstrip('/')
+
+@app.context_processor
+def inject_site_url():
+    return {'site_url': SITE_URL}
+
+# Pages rendues gardées en mémoire (anonymes ou par utilisateur), vidées si un template ou le blog change
+page_cache = PageCache(
+    os.path.join(app.root_path, app.template_folder),
+    content_version=blog_store.version,
+    max_entries=int(os.environ.get('PAGE_CACHE_SIZE', 1000)),
+    max_bytes=int(os.environ.get('PAGE_CACHE_MAX_BYTES', 16 * 1024 * 1024)),
+    enabled=os.environ.get('PAGE_CACHE_ENABLED', '1') != '0'
+)
+STATS_PROVIDERS['page_cache'] = page_cache.stats
 
 def compress_workout_plan(plan_data):
     """Compresse un plan d'entraînement en remplaçant les noms par des IDs"""
     if not isinstance(plan_data, dict) or 'jours' not in plan_data:
         return plan_data
     
-    # Mapping inverse pour trouver les IDs
-    exercise_to_id = {v: k for k, v in EXERCISE_MAPPING.items()}
-    day_to_id = {v: k for k, v in DAY_MAPPING.items()}
-    
     compressed = {"j": []}  # "j" pour "jours"
     
     for day in plan_data['jours']:
         compressed_day = {
-            "d": day_to_id.get(day.get('nomJour', ''), day.get('nomJour', '')),  # "d" pour "day"
+            "d": DAY_TO_ID.get(day.get('nomJour', ''), day.get('nomJour', '')),  # "d" pour "day"
             "t": 1 if day.get('type') == 'workout' else 0,  # "t" pour "type", 1=workout, 0=rest
             "e": []  # "e" pour "exercices"
         }
@@ -560,7 +458,7 @@ def compress_workout_plan(plan_data):
         if day.get('type') == 'workout' and day.get('exercices'):
             for exercise in day['exercices']:
                 compressed_exercise = {
-                    "n": exercise_to_id.get(exercise.get('nom', ''), exercise.get('nom', '')),  # "n" pour "nom"
+                    "n": EXERCISE_TO_ID.get(exercise.get('nom', ''), exercise.get('nom', '')),  # "n" pour "nom"
                     "s": exercise.get('series', 0),  # "s" pour "series"
                     "r": exercise.get('repetitions'),  # "r" pour "repetitions"
                     "m": exercise.get('duree_minutes')  # "m" pour "minutes"
@@ -573,128 +471,417 @@ def compress_workout_plan(plan_data):
     
     return compressed
 
+def decompress_workout_day(day):
+    """Décompresse un seul jour d'un plan compressé"""
+    decompressed_day = {
+        "nomJour": DAY_MAPPING.get(day.get('d'), str(day.get('d', ''))),
+        "type": "workout" if day.get('t', 0) == 1 else "rest",
+        "exercices": []
+    }
+    
+    if day.get('t', 0) == 1 and day.get('e'):
+        for exercise in day['e']:
+            decompressed_exercise = {
+                "nom": EXERCISE_MAPPING.get(exercise.get('n'), str(exercise.get('n', ''))),
+                "series": exercise.get('s', 0),
+                "repetitions": exercise.get('r'),
+                "duree_minutes": exercise.get('m')
+            }
+            decompressed_day["exercices"].append(decompressed_exercise)
+    
+    return decompressed_day
+
 def decompress_workout_plan(compressed_data):
     """Décompresse un plan d'entraînement compressé"""
     if not isinstance(compressed_data, dict) or 'j' not in compressed_data:
         return compressed_data
     
-    decompressed = {"jours": []}
-    
-    for day in compressed_data['j']:
-        decompressed_day = {
-            "nomJour": DAY_MAPPING.get(day.get('d'), str(day.get('d', ''))),
-            "type": "workout" if day.get('t', 0) == 1 else "rest",
-            "exercices": []
-        }
-        
-        if day.get('t', 0) == 1 and day.get('e'):
-            for exercise in day['e']:
-                decompressed_exercise = {
-                    "nom": EXERCISE_MAPPING.get(exercise.get('n'), str(exercise.get('n', ''))),
-                    "series": exercise.get('s', 0),
-                    "repetitions": exercise.get('r'),
-                    "duree_minutes": exercise.get('m')
-                }
-                decompressed_day["exercices"].append(decompressed_exercise)
-        
-        decompressed["jours"].append(decompressed_day)
-    
-    return decompressed
+    return {"jours": [decompress_workout_day(day) for day in compressed_data['j']]}
+
+def _bucket(value, step):
+    """Arrondit une valeur numérique à la tranche la plus proche (None si invalide)."""
+    try:
+        return int(round(float(value) / step) * step)
+    except (ValueError, TypeError):
+        return None
+
+def build_profile_key(height, weight, age, gym, equipment_list, difficulty,
+                      max_session_duration=None, max_workout_days=None):
+    """Construit la clé de cache d'un profil normalisé (tranches d'âge, de taille et de poids)"""
+    profile = {
+        "a": _bucket(age, 5),
+        "h": _bucket(height, 5),
+        "w": _bucket(weight, 5),
+        "g": bool(gym),
+        # L'équipement n'apparaît pas dans le prompt quand l'utilisateur est en salle
+        "eq": [] if gym else sorted({str(item).strip().lower() for item in equipment_list or []}),
+        "df": str(difficulty or '').strip().lower(),
+        "sd": max_session_duration,
+        "wd": max_workout_days,
+    }
+    raw = json.dumps(profile, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def build_workout_prompt(height, weight, age, gym, equipment_list, difficulty,
+                         max_session_duration=None, max_workout_days=None):
+    """Construit le prompt envoyé à OpenAI pour un profil utilisateur"""
+    return prompt_builder.build(height, weight, age, gym, equipment_list, difficulty,
+                                max_session_duration, max_workout_days)
+
+def _plan_without_llm(cache_key, gym, equipment_list, difficulty, max_session_duration, max_workout_days,
+                      client_service):
+    """Plan servi sans appel au modèle (mode local, cache, OpenAI non configuré), ou None"""
+    # Catalogue modifié depuis : générateur local et prompt rechargés avant la génération
+    exercise_catalogue.refresh()
+    if GENERATION_MODE == 'local':
+        return json.dumps(local_generator.generate(gym, equipment_list, difficulty,
+                                                   max_session_duration, max_workout_days))
+
+    if GENERATION_CACHE_ENABLED:
+        cached_plan = generation_cache.get(cache_key)
+        if cached_plan is not None:
+            return json.dumps(cached_plan, ensure_ascii=False)
+
+    if not os.environ.get("OPENAI_API_KEY") or client_service.get() is None:
+        # OpenAI non configuré : plan construit par le générateur local
+        return json.dumps(local_generator.generate(gym, equipment_list, difficulty,
+                                                   max_session_duration, max_workout_days))
+    return None
+
+def _generation_failed(error, gym, equipment_list, difficulty, max_session_duration, max_workout_days):
+    """Plan du générateur local (mode llm-fallback) ou message d'erreur après un échec d'OpenAI"""
+    if GENERATION_MODE == 'llm-fallback':
+        print(f"⚠️ OpenAI indisponible ({error}), plan construit par le générateur local")
+        local_generator.record_fallback()
+        return json.dumps(local_generator.generate(gym, equipment_list, difficulty,
+                                                   max_session_duration, max_workout_days))
+    if isinstance(error, SingleFlightTimeout):
+        return "La génération du programme d'entraînement prend trop de temps, veuillez réessayer."
+    if isinstance(error, CircuitOpenError):
+        return "Le service de génération est temporairement indisponible, veuillez réessayer dans quelques instants."
+    return f"Une erreur est survenue lors de la génération du programme d'entraînement: {str(error)}"
 
 def generate_workout_plan(height: str, weight: str, age: str, gym: bool, equipment_list: list[str], 
                          difficulty: str = "intermediate", max_session_duration: int = None, max_workout_days: int = None) -> str:
     """
     Utilise l'API OpenAI pour générer un plan d'entraînement personnalisé en format compressé.
+    Les plans déjà générés pour un profil équivalent sont servis depuis le cache.
     """
-    if gym:
-        equipment_text = "en salle de sport avec accès à une grande variété d'équipements"
-    else:
-        if equipment_list:
-            formatted = ", ".join(equipment_list)
-            equipment_text = f"à domicile avec : {formatted}"
-        else:
-            equipment_text = "à domicile sans équipement"
+    cache_key = build_profile_key(height, weight, age, gym, equipment_list, difficulty,
+                                  max_session_duration, max_workout_days)
+    plan = _plan_without_llm(cache_key, gym, equipment_list, difficulty, max_session_duration, max_workout_days,
+                             openai_client)
+    if plan is not None:
+        return plan
 
-    # Construire le texte de difficulté
-    difficulty_text = f"niveau {difficulty}"
-    
-    # Construire les contraintes de durée et jours
-    constraints = []
-    if max_session_duration:
-        constraints.append(f"durée maximale de session: {max_session_duration} minutes")
-    if max_workout_days:
-        constraints.append(f"maximum {max_workout_days} jours d'entraînement par semaine")
-    
-    constraints_text = ""
-    if constraints:
-        constraints_text = f" Contraintes: {', '.join(constraints)}."
+    prompt = build_workout_prompt(height, weight, age, gym, equipment_list, difficulty,
+                                  max_session_duration, max_workout_days)
 
-    # Liste des exercices disponibles avec leurs IDs
-    exercise_list = "\n".join([f"{k}: {v}" for k, v in EXERCISE_MAPPING.items()])
-    
-    # Informations sur les exercices mesurés en temps
-    time_exercises = "\n".join([f"- {v} (ID: {k})" for k, v in TIME_BASED_EXERCISES.items()])
-    
-    prompt = (
-        f"Créez un programme d'entraînement pour: {age} ans, {height}cm, {weight}kg, {equipment_text}, {difficulty_text}.{constraints_text} "
-        f"UTILISEZ UNIQUEMENT ce format JSON compressé et ces exercices:\n{exercise_list}\n\n"
-        f"IMPORTANT - Exercices mesurés en TEMPS (utilisez 'm' pour minutes):\n{time_exercises}\n\n"
-        f"Format JSON OBLIGATOIRE (sans explication, sans ```json):\n"
-        f'{{"j":[{{"d":1,"t":1,"e":[{{"n":1,"s":3,"r":12}},{{"n":4,"s":3,"m":1}}]}},{{"d":2,"t":0,"e":[]}}]}}\n\n'
-        f"Légende: j=jours, d=jour(1-7), t=type(1=workout,0=rest), e=exercices, n=nom(ID), s=séries, r=répétitions, m=minutes\n"
-        f"RÈGLES: Pour les exercices de gainage, cardio et étirements, utilisez 'm' (minutes). Pour les autres, utilisez 'r' (répétitions).\n"
-        f"Choisissez les exercices selon l'équipement disponible et le niveau de difficulté. RETOURNEZ SEULEMENT LE JSON."
+    try:
+        # Les appels concurrents pour un même profil partagent une seule requête OpenAI
+        if GENERATION_MODE == 'llm-fallback':
+            return generation_flight.do(cache_key, lambda: _request_workout_plan(prompt, cache_key, max_workout_days),
+                                        timeout=GENERATION_LLM_TIMEOUT)
+        return generation_flight.do(cache_key, lambda: _request_workout_plan(prompt, cache_key, max_workout_days))
+    except Exception as e:
+        return _generation_failed(e, gym, equipment_list, difficulty, max_session_duration, max_workout_days)
+
+async def generate_workout_plan_async(height, weight, age, gym, equipment_list, difficulty="intermediate",
+                                      max_session_duration=None, max_workout_days=None):
+    """Version asynchrone de generate_workout_plan (point d'entrée ASGI, client AsyncOpenAI)"""
+    cache_key = build_profile_key(height, weight, age, gym, equipment_list, difficulty,
+                                  max_session_duration, max_workout_days)
+    # Lecture du cache SQLite (écriture de last_access, verrou possible) hors de la boucle asyncio
+    plan = await asyncio.to_thread(_plan_without_llm, cache_key, gym, equipment_list, difficulty,
+                                   max_session_duration, max_workout_days, async_openai_client)
+    if plan is not None:
+        return plan
+
+    prompt = build_workout_prompt(height, weight, age, gym, equipment_list, difficulty,
+                                  max_session_duration, max_workout_days)
+    try:
+        timeout = GENERATION_LLM_TIMEOUT if GENERATION_MODE == 'llm-fallback' else None
+        return await async_generation_flight.do(
+            cache_key, lambda: _request_workout_plan_async(prompt, cache_key, max_workout_days), timeout=timeout)
+    except Exception as e:
+        return _generation_failed(e, gym, equipment_list, difficulty, max_session_duration, max_workout_days)
+
+def llm_client(service=None):
+    """Client OpenAI d'une génération : disjoncteur, nouvelles tentatives et budget de GENERATION_BUDGET secondes"""
+    service = service or openai_client
+    return ResilientClient(service.get(), openai_breaker, openai_retry, GENERATION_BUDGET,
+                           asynchronous=service is async_openai_client,
+                           timer=lambda operation: dependency_duration.time('openai', operation))
+
+def iter_workout_plan_days(height, weight, age, gym, equipment_list, difficulty="intermediate",
+                           max_session_duration=None, max_workout_days=None):
+    """
+    Génère les jours compressés d'un plan au fur et à mesure de la réponse OpenAI.
+    Chaque jour est renvoyé dès que son objet JSON est complet.
+    """
+    exercise_catalogue.refresh()
+    if GENERATION_MODE == 'local':
+        yield from local_generator.generate(gym, equipment_list, difficulty,
+                                            max_session_duration, max_workout_days)['j']
+        return
+
+    cache_key = build_profile_key(height, weight, age, gym, equipment_list, difficulty,
+                                  max_session_duration, max_workout_days)
+    if GENERATION_CACHE_ENABLED:
+        cached_plan = generation_cache.get(cache_key)
+        if cached_plan is not None:
+            yield from cached_plan['j']
+            return
+
+    if not os.environ.get("OPENAI_API_KEY") or openai_client.get() is None:
+        # OpenAI non configuré : le générateur local renvoie la semaine d'un coup
+        yield from local_generator.generate(gym, equipment_list, difficulty,
+                                            max_session_duration, max_workout_days)['j']
+        return
+
+    prompt = build_workout_prompt(height, weight, age, gym, equipment_list, difficulty,
+                                  max_session_duration, max_workout_days)
+    days = []
+    try:
+        for day in _stream_workout_plan_days(prompt, max_workout_days):
+            days.append(day)
+            yield day
+    except Exception as e:
+        if GENERATION_MODE != 'llm-fallback':
+            raise
+        # Compléter avec les jours du générateur local qui n'ont pas encore été envoyés
+        print(f"⚠️ OpenAI indisponible ({e}), plan complété par le générateur local")
+        local_generator.record_fallback()
+        sent = {day.get('d') for day in days}
+        local_plan = local_generator.generate(gym, equipment_list, difficulty,
+                                              max_session_duration, max_workout_days)
+        yield from (day for day in local_plan['j'] if day['d'] not in sent)
+        return
+
+    if GENERATION_CACHE_ENABLED:
+        # Même plan que /generate : semaine complète, plafonnée à max_workout_days séances
+        generation_cache.set(cache_key, plan_validator.complete({day['d']: day for day in days}, max_workout_days))
+
+def workout_plan_messages(prompt):
+    """Messages envoyés à OpenAI pour générer un plan"""
+    return [
+        {"role": "system", "content": "Vous êtes un coach sportif. Répondez UNIQUEMENT avec le JSON compressé demandé."},
+        {"role": "user", "content": prompt}
+    ]
+
+def _stream_workout_plan_days(prompt, max_workout_days=None, llm=None):
+    """
+    Appelle OpenAI en streaming et renvoie chaque jour compressé valide dès qu'il est complet,
+    puis les jours manquants (redemandés ou complétés par des jours de repos).
+    """
+    llm = llm or llm_client()
+    messages = workout_plan_messages(prompt)
+    options = {'model': "gpt-4.1-mini", 'max_tokens': PromptBuilder.max_tokens(max_workout_days), 'temperature': 0.7}
+    stream = llm.chat.completions.create(
+        messages=messages,
+        response_format=plan_validator.response_format,
+        stream=True,
+        stream_options={'include_usage': True},
+        **options
     )
+    parser = IncrementalPlanParser()
+    sent = set()
+    finish_reason = None
+    for chunk in stream:
+        if getattr(chunk, 'usage', None):
+            # Dernier morceau : tokens consommés par la requête
+            token_usage.record(chunk.usage, finish_reason)
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        finish_reason = choice.finish_reason or finish_reason
+        if not choice.delta.content:
+            continue
+        for raw_day in parser.feed(choice.delta.content):
+            day, _ = plan_validator.validate_day(raw_day)
+            if day is None or day['d'] in sent or (day['t'] == 1 and not day['e']):
+                continue
+            sent.add(day['d'])
+            yield day
 
-    if client is None:
-        # Version compressée de l'exemple par défaut
-        example = {
-            "j": [
-                {"d": 1, "t": 1, "e": [{"n": 1, "s": 3, "r": 12}, {"n": 2, "s": 3, "r": 15}]},
-                {"d": 2, "t": 1, "e": [{"n": 3, "s": 3, "r": 12}, {"n": 4, "s": 3, "m": 1}]},
-                {"d": 3, "t": 0, "e": []},
-                {"d": 4, "t": 1, "e": [{"n": 10, "s": 3, "r": 10}, {"n": 23, "s": 3, "m": 2}]},
-                {"d": 5, "t": 1, "e": [{"n": 15, "s": 3, "r": 8}, {"n": 24, "s": 3, "r": 12}]},
-                {"d": 6, "t": 1, "e": [{"n": 21, "s": 3, "m": 3}, {"n": 22, "s": 3, "m": 2}]},
-                {"d": 7, "t": 0, "e": []}
-            ]
-        }
-        return json.dumps(example, ensure_ascii=False)
+    # Réparation de la réponse complète : jours non découpés, réponse tronquée, exercices inconnus
+    check = plan_validator.check(parser.full_text(), truncated=finish_reason == 'length')
+    plan_data = complete_plan(llm, messages, plan_validator, check, PLAN_MAX_REASKS, max_workout_days,
+                              usage=token_usage, **options)
+    for day in plan_data['j']:
+        if day['d'] not in sent:
+            yield day
 
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        example = {"j": [{"d": 1, "t": 1, "e": [{"n": 1, "s": 3, "r": 12}]}]}
-        return json.dumps(example, ensure_ascii=False)
+def _request_workout_plan(prompt, cache_key, max_workout_days=None, llm=None):
+    """Appelle OpenAI, valide et répare la réponse, puis met le plan en cache"""
+    plan_data = request_validated_plan(
+        llm or llm_client(),
+        workout_plan_messages(prompt),
+        plan_validator,
+        max_reasks=PLAN_MAX_REASKS,
+        max_workout_days=max_workout_days,
+        usage=token_usage,
+        hedge=generation_hedge if GENERATION_HEDGING else None,
+        model="gpt-4.1-mini",
+        max_tokens=PromptBuilder.max_tokens(max_workout_days),
+        temperature=0.7
+    )
+    if GENERATION_CACHE_ENABLED:
+        generation_cache.set(cache_key, plan_data)
+    return json.dumps(plan_data, ensure_ascii=False)
+
+async def _request_workout_plan_async(prompt, cache_key, max_workout_days=None, llm=None):
+    """Équivalent asynchrone de _request_workout_plan (client AsyncOpenAI)"""
+    plan_data = await request_validated_plan_async(
+        llm or llm_client(async_openai_client),
+        workout_plan_messages(prompt),
+        plan_validator,
+        max_reasks=PLAN_MAX_REASKS,
+        max_workout_days=max_workout_days,
+        usage=token_usage,
+        hedge=generation_hedge if GENERATION_HEDGING else None,
+        model="gpt-4.1-mini",
+        max_tokens=PromptBuilder.max_tokens(max_workout_days),
+        temperature=0.7
+    )
+    if GENERATION_CACHE_ENABLED:
+        # Transaction SQLite (BEGIN IMMEDIATE) hors de la boucle asyncio
+        await asyncio.to_thread(generation_cache.set, cache_key, plan_data)
+    return json.dumps(plan_data, ensure_ascii=False)
+
+# Les plans sont stockés dans workoutPlans/{uid} : une lecture = un get(), une écriture = un set()
+PLANS_COLLECTION = 'workoutPlans'
+FIRESTORE_LEGACY_LOOKUP = os.environ.get('FIRESTORE_LEGACY_LOOKUP', '1') != '0'
+# Format du plan dans le document : "dict" (champ plan lisible dans la console) ou "binary" (champ planBin)
+PLAN_STORAGE_FORMAT = os.environ.get('PLAN_STORAGE_FORMAT', 'dict')
+
+def plan_document(user_id):
+    """Référence du document Firestore contenant le plan de l'utilisateur"""
+    return get_db().collection(PLANS_COLLECTION).document(user_id)
+
+def plan_document_data(user_id, plan):
+    """Contenu du document plan selon PLAN_STORAGE_FORMAT (l'autre champ est supprimé)"""
+    from firebase_admin import firestore
+    if PLAN_STORAGE_FORMAT == 'binary':
+        return {'uid': user_id, 'planBin': plan_codec.encode(plan), 'plan': firestore.DELETE_FIELD}
+    return {'uid': user_id, 'plan': plan, 'planBin': firestore.DELETE_FIELD}
+
+def plan_from_document(data):
+    """Plan contenu dans un document Firestore, quel que soit son format"""
+    if data.get('planBin'):
+        return plan_codec.decode(data['planBin'])
+    return data.get('plan')
+
+def write_plan_to_firestore(user_id, plan):
+    """Écrit le plan de l'utilisateur dans son document (créé s'il n'existe pas)"""
+    with dependency_duration.time('firestore', 'set'):
+        plan_document(user_id).set(plan_document_data(user_id, plan), merge=True)
 
-    if client is None:
-        return json.dumps({"j": []}, ensure_ascii=False)
+def flush_plans_to_firestore(items):
+    """Écrit un lot de plans (uid, plan) en une seule écriture groupée Firestore"""
+    batch = get_db().batch()
+    for user_id, plan in items:
+        batch.set(plan_document(user_id), plan_document_data(user_id, plan), merge=True)
+    with dependency_duration.time('firestore', 'batch_commit'):
+        batch.commit()
 
+# Les modifications successives d'un même plan sont regroupées puis écrites par lots
+WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', '1') != '0'
+plan_writer = WriteBehindBuffer(
+    flush_plans_to_firestore,
+    debounce=float(os.environ.get('WRITE_BEHIND_DEBOUNCE', 2)),
+    max_staleness=float(os.environ.get('WRITE_BEHIND_MAX_STALENESS', 10))
+)
+plan_writer.install_shutdown_hooks()
+STATS_PROVIDERS['plan_writer'] = plan_writer.stats
+
+def queue_plan_write(user_id, plan):
+    """Programme l'écriture du plan dans Firestore (immédiate si le write-behind est désactivé)"""
+    if WRITE_BEHIND_ENABLED:
+        plan_writer.put(user_id, plan)
+        return
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[
-                {"role": "system", "content": "Vous êtes un coach sportif. Répondez UNIQUEMENT avec le JSON compressé demandé."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=400,
-            temperature=0.7
-        )
-        workout = response.choices[0].message.content.strip()
+        write_plan_to_firestore(user_id, plan)
+    except Exception as e:
+        print(f"⚠️ Erreur Firestore lors de la sauvegarde: {e}")
+
+def load_plan_from_firestore(user_id):
+    """Lit le plan de l'utilisateur, ou None s'il n'en a pas"""
+    pending_plan = plan_writer.get(user_id)
+    if pending_plan is not None:
+        return pending_plan
+    
+    with dependency_duration.time('firestore', 'get'):
+        snapshot = plan_document(user_id).get()
+    if snapshot.exists:
+        return plan_from_document(snapshot.to_dict())
+    
+    if FIRESTORE_LEGACY_LOOKUP:
+        # Ancien format (document à ID automatique) : on le migre au passage
+        with dependency_duration.time('firestore', 'query'):
+            docs = list(get_db().collection(PLANS_COLLECTION).where('uid', '==', user_id).limit(1).stream())
+        if docs:
+            plan = plan_from_document(docs[0].to_dict())
+            write_plan_to_firestore(user_id, plan)
+            return plan
+    return None
+
+@app.cli.command('migrate-plans')
+@click.option('--page-size', default=200, show_default=True, help="Nombre de documents lus par page")
+@click.option('--delete-legacy', is_flag=True, help="Supprimer les anciens documents après copie")
+@click.option('--dry-run', is_flag=True, help="Afficher les opérations sans rien écrire")
+def migrate_plans(page_size, delete_legacy, dry_run):
+    """Réécrit les plans stockés sous un ID automatique dans workoutPlans/{uid}"""
+    db = get_db()
+    if not db:
+        raise click.ClickException("Firestore n'est pas initialisé")
+    
+    collection = db.collection(PLANS_COLLECTION)
+    last_doc = None
+    scanned = migrated = skipped = 0
+    while True:
+        query = collection.order_by('__name__').limit(page_size)
+        if last_doc is not None:
+            query = query.start_after(last_doc)
+        page = list(query.stream())
+        if not page:
+            break
+        last_doc = page[-1]
+        scanned += len(page)
         
-        # Nettoyer la réponse au cas où il y aurait des balises de code
-        if workout.startswith('```'):
-            workout = workout.split('\n', 1)[1]
-        if workout.endswith('```'):
-            workout = workout.rsplit('\n', 1)[0]
+        legacy = []
+        for doc in page:
+            data = doc.to_dict() or {}
+            if data.get('uid') and doc.id != data['uid']:
+                legacy.append((doc, data))
+        if not legacy:
+            continue
         
-        return workout
-
-    except Exception as e:
-        return f"Une erreur est survenue lors de la génération du programme d'entraînement: {str(e)}"
+        # Une seule lecture groupée pour savoir quels documents cibles existent déjà
+        targets = [collection.document(data['uid']) for _, data in legacy]
+        existing = {snapshot.id for snapshot in db.get_all(targets) if snapshot.exists}
+        
+        batch = db.batch()
+        for (doc, data), target in zip(legacy, targets):
+            if target.id in existing:
+                # Le document uid est plus récent (écrit après le déploiement) : on le garde
+                skipped += 1
+            else:
+                batch.set(target, data)
+                migrated += 1
+            if delete_legacy:
+                batch.delete(doc.reference)
+        if dry_run:
+            click.echo(f"[dry-run] page de {len(page)} documents : {len(legacy)} à migrer")
+        else:
+            batch.commit()
+    
+    click.echo(f"✅ {scanned} documents parcourus, {migrated} migrés, {skipped} déjà présents")
 
 @app.route('/')
+@page_cache.cached
 def index():
-    return render_template('index.html', user=session.get('user'))
+    return render_template('index.html', user=session.get('user'), stream_plan=GENERATION_STREAM_UI)
 
 @app.route('/login')
 def login():
@@ -711,18 +898,21 @@ def workout_plan():
     current_plan = None
     
     # D'abord essayer de récupérer depuis la mémoire
-    current_plan = user_workout_plans.get(user_id, None)
+    current_plan = plan_cache.get(user_id)
     
-    # Si pas en mémoire et Firestore disponible, essayer de récupérer depuis Firestore
-    if not current_plan and db:
+    if current_plan is MISSING:
+        # Utilisateur connu pour ne pas avoir de plan : inutile d'interroger Firestore
+        current_plan = None
+    elif current_plan is None and get_db():
+        # Si pas en mémoire et Firestore disponible, essayer de récupérer depuis Firestore
         try:
-            docs = list(db.collection('workoutPlans').where('uid', '==', user_id).limit(1).stream())
-            if docs:
-                doc_data = docs[0].to_dict()
-                current_plan = doc_data.get('plan')
+            current_plan = load_plan_from_firestore(user_id)
+            if current_plan:
                 # Sauvegarder aussi en mémoire pour les prochaines fois
-                user_workout_plans[user_id] = current_plan
+                plan_cache.set(user_id, current_plan)
                 print(f"✅ Plan récupéré depuis Firestore pour l'utilisateur {user_id}")
+            else:
+                plan_cache.set_missing(user_id)
         except Exception as e:
             print(f"⚠️ Erreur lors de la récupération Firestore: {e}")
     
@@ -733,14 +923,17 @@ def workout_plan():
                          workout_plan=current_plan)
 
 @app.route('/about')
+@page_cache.cached
 def about():
     return render_template('about.html', user=session.get('user'))
 
 @app.route('/contact')
+@page_cache.cached
 def contact():
     return render_template('contact.html', user=session.get('user'))
 
 @app.route('/privacy')
+@page_cache.cached
 def privacy():
     return render_template('privacy.html', user=session.get('user'))
 
@@ -748,7 +941,7 @@ def privacy():
 def verify_token():
     """Verify Firebase ID token"""
     try:
-        if not firebase_initialized:
+        if firebase.get() is None:
             return jsonify({
                 'error': 'Firebase not initialized. Please check your Firebase credentials.',
                 'details': 'Missing environment variables for Firebase configuration'
@@ -764,7 +957,7 @@ def verify_token():
             return jsonify({'error': 'No token provided'}), 400
         
         try:
-            decoded_token = auth.verify_id_token(id_token)
+            decoded_token = token_verifier.verify(id_token)
         except Exception as firebase_error:
             print(f"Firebase token verification error: {firebase_error}")
             return jsonify({
@@ -772,6 +965,11 @@ def verify_token():
                 'details': str(firebase_error)
             }), 401
         
+        if isinstance(session, ServerSideSession):
+            # Nouvel identifiant de session à la connexion
+            session.regenerate()
+        # Session conservée après fermeture du navigateur (PERMANENT_SESSION_LIFETIME)
+        session.permanent = True
         session['user'] = {
             'uid': decoded_token['uid'],
             'email': decoded_token.get('email', ''),
@@ -803,13 +1001,8 @@ def check_auth():
     else:
         return jsonify({'authenticated': False})
 
-@app.route('/generate', methods=['POST'])
-def generate():
-    # Vérifier que l'utilisateur est connecté
-    if 'user' not in session:
-        return jsonify({'error': 'Authentication required'}), 401
-    
-    data = request.get_json(force=True)
+def parse_generation_request(data):
+    """Extrait et normalise les paramètres de génération envoyés par le formulaire"""
     height = data.get('height', '')
     weight = data.get('weight', '')
     age = data.get('age', '')
@@ -836,81 +1029,229 @@ def generate():
         except (ValueError, TypeError):
             max_workout_days = None
 
+    return {
+        'height': height,
+        'weight': weight,
+        'age': age,
+        'gym': gym,
+        'equipment_list': equipment_list,
+        'difficulty': difficulty,
+        'max_session_duration': max_session_duration,
+        'max_workout_days': max_workout_days,
+    }
+
+def save_generated_plan(user_id, decompressed_plan):
+    """Sauvegarde un plan généré en mémoire et dans Firestore si disponible"""
+    plan_cache.set(user_id, decompressed_plan)
+    
+    if get_db():
+        # Même file que /update-plan : une modification encore en attente ne peut pas écraser le nouveau plan
+        queue_plan_write(user_id, decompressed_plan)
+
+def build_generation_result(user_id, params):
+    """Génère le plan, le sauvegarde pour l'utilisateur (si user_id) et prépare la réponse pour l'affichage"""
     # Générer le plan compressé
-    compressed_plan = generate_workout_plan(height, weight, age, gym, equipment_list, 
-                                          difficulty, max_session_duration, max_workout_days)
+    compressed_plan = generate_workout_plan(**params)
+    return finish_generation_result(user_id, compressed_plan)
+
+async def build_generation_result_async(user_id, params):
+    """Version asynchrone de build_generation_result ; la sauvegarde (Firestore) se fait dans un thread"""
+    compressed_plan = await generate_workout_plan_async(**params)
+    return await asyncio.to_thread(finish_generation_result, user_id, compressed_plan)
+
+def save_generation_result(user_id, result):
+    """Sauvegarde le plan d'un résultat de génération (tâche de fond terminée dans son délai)"""
+    if 'plan' in result:
+        save_generated_plan(user_id, json.loads(result['plan']))
+
+def finish_generation_result(user_id, compressed_plan):
+    """Décompresse et sauvegarde le plan généré, puis prépare la réponse pour l'affichage"""
+    try:
+        # Parser et décompresser pour la sauvegarde et l'affichage
+        compressed_data = json.loads(compressed_plan)
+        final_plan = decompress_workout_plan(compressed_data)
+    except json.JSONDecodeError:
+        # Message d'erreur renvoyé par generate_workout_plan
+        print(f"⚠️ Plan non généré: {compressed_plan}")
+        return {'error': compressed_plan}
     
     # Sauvegarder pour l'utilisateur connecté
-    if 'user' in session:
-        user_id = session['user']['uid']
+    if user_id:
+        save_generated_plan(user_id, final_plan)
+    
+    return {
+        'plan': json.dumps(final_plan, ensure_ascii=False),
+        'products': PRODUCT_SUGGESTIONS
+    }
+
+def admit_generation(user_id):
+    """Bail de génération de l'utilisateur (None si le contrôle d'admission est désactivé) ; lève AdmissionRejected"""
+    if not ADMISSION_ENABLED:
+        return None
+    return generation_admission.acquire(user_id)
+
+def admission_rejected_response(error):
+    """Réponse 429 d'une génération refusée, avec le délai avant de réessayer"""
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+@app.route('/generate', methods=['POST'])
+def generate():
+    # Vérifier que l'utilisateur est connecté
+    if 'user' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    params = parse_generation_request(request.get_json(force=True))
+    user_id = session['user']['uid']
+    try:
+        lease = admit_generation(user_id)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+
+    if not GENERATION_JOBS_ENABLED:
         try:
-            # Parser et décompresser pour la sauvegarde
-            compressed_data = json.loads(compressed_plan)
-            decompressed_plan = decompress_workout_plan(compressed_data)
-            user_workout_plans[user_id] = decompressed_plan
-            
-            # Sauvegarder aussi dans Firestore si disponible
-            if db:
-                try:
-                    docs = list(db.collection('workoutPlans').where('uid', '==', user_id).limit(1).stream())
-                    if docs:
-                        doc_id = docs[0].id
-                        db.collection('workoutPlans').document(doc_id).update({'plan': decompressed_plan})
-                    else:
-                        db.collection('workoutPlans').add({'uid': user_id, 'plan': decompressed_plan})
-                except Exception as firestore_error:
-                    print(f"⚠️ Erreur Firestore: {firestore_error}")
-                    
-        except json.JSONDecodeError:
-            print(f"⚠️ Plan généré n'est pas un JSON valide")
+            return jsonify(build_generation_result(user_id, params))
+        finally:
+            generation_admission.release(lease)
+
+    # Lancer la génération en tâche de fond et rendre la main immédiatement
+    try:
+        # Plan sauvegardé seulement si la tâche se termine dans son délai (pas en timeout)
+        job_id = generation_jobs.submit(user_id, build_generation_result, None, params,
+                                        on_finish=lambda: generation_admission.release(lease),
+                                        on_success=lambda result: save_generation_result(user_id, result))
+    except QueueFullError as e:
+        # Génération jamais lancée : le jeton de l'utilisateur lui est rendu
+        generation_admission.refund(lease)
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    return jsonify({
+        'jobId': job_id,
+        'status': 'queued',
+        'statusUrl': url_for('generation_job_status', job_id=job_id)
+    }), 202
+
+@app.route('/generate/jobs/<job_id>')
+def generation_job_status(job_id):
+    """État d'une génération en tâche de fond (?wait=secondes : attente courte, au plus GENERATION_JOB_MAX_WAIT)"""
+    if 'user' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
     
-    # Retourner le plan décompressé pour l'affichage
     try:
-        compressed_data = json.loads(compressed_plan)
-        final_plan = decompress_workout_plan(compressed_data)
-        return jsonify({
-            'plan': json.dumps(final_plan, ensure_ascii=False),
-            'products': PRODUCT_SUGGESTIONS
-        })
-    except:
-        return jsonify({
-            'plan': compressed_plan,
-            'products': PRODUCT_SUGGESTIONS
+        wait = min(max(float(request.args.get('wait', 0)), 0), GENERATION_JOB_MAX_WAIT)
+    except ValueError:
+        wait = 0
+    
+    job = generation_jobs.wait(job_id, wait) if wait else generation_jobs.get(job_id)
+    if not job or job.get('owner') != session['user']['uid']:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    payload = {'jobId': job_id, 'status': job['status']}
+    if job['status'] == 'done':
+        payload.update(job['result'])
+    elif job.get('error'):
+        payload['error'] = job['error']
+    return jsonify(payload)
+
+def format_sse(event, data):
+    """Formate un évènement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/generate-stream', methods=['POST'])
+def generate_stream():
+    """Génère le plan en streaming : chaque jour est envoyé (SSE) dès qu'il est prêt"""
+    if 'user' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    params = parse_generation_request(request.get_json(force=True))
+    user_id = session['user']['uid']
+    try:
+        lease = admit_generation(user_id)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+
+    def events():
+        try:
+            yield from plan_events()
+        finally:
+            # Fin du flux, y compris quand le client se déconnecte
+            generation_admission.release(lease)
+
+    def plan_events():
+        started = time.perf_counter()
+        first_day_ms = None
+        compressed_days = []
+        max_workout_days = params['max_workout_days']
+        workouts = 0
+        try:
+            for day in iter_workout_plan_days(**params):
+                if day.get('t') == 1:
+                    if max_workout_days and workouts >= max_workout_days:
+                        # Séance au-delà du maximum demandé : envoyée comme jour de repos
+                        day = {"d": day['d'], "t": 0, "e": []}
+                    else:
+                        workouts += 1
+                if first_day_ms is None:
+                    first_day_ms = (time.perf_counter() - started) * 1000
+                    stream_first_day_latency.record(first_day_ms)
+                compressed_days.append(day)
+                yield format_sse('day', decompress_workout_day(day))
+        except Exception as e:
+            print(f"❌ Erreur lors de la génération en streaming: {e}")
+            yield format_sse('error', {
+                'error': f"Une erreur est survenue lors de la génération du programme d'entraînement: {str(e)}"
+            })
+            return
+
+        total_ms = (time.perf_counter() - started) * 1000
+        stream_total_latency.record(total_ms)
+        # Plan validé et complété sur 7 jours, comme celui de complete_plan
+        final_plan = decompress_workout_plan(
+            plan_validator.complete({day['d']: day for day in compressed_days}, max_workout_days)
+        )
+        save_generated_plan(user_id, final_plan)
+        yield format_sse('done', {
+            'plan': final_plan,
+            'products': PRODUCT_SUGGESTIONS,
+            'timing': {
+                'first_day_ms': round(first_day_ms, 1) if first_day_ms is not None else None,
+                'total_ms': round(total_ms, 1)
+            }
         })
 
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def is_valid_plan(plan):
+    """Plan décompressé ({"jours": [...]}), comme ceux sauvegardés après une génération"""
+    return isinstance(plan, dict) and isinstance(plan.get('jours'), list)
+
 @app.route('/save-plan', methods=['POST'])
 def save_plan():
     if 'user' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    data = request.get_json()
-    plan = data.get('plan')
+    data = request.get_json(silent=True)
+    plan = data.get('plan') if isinstance(data, dict) else None
     user_id = session['user']['uid']
     
     if not plan:
         return jsonify({'error': 'No plan provided'}), 400
+    if not is_valid_plan(plan):
+        return jsonify({'error': 'Invalid plan'}), 400
     
     try:
         # Sauvegarder en mémoire
-        user_workout_plans[user_id] = plan
+        plan_cache.set(user_id, plan)
         
-        # Sauvegarder dans Firestore si disponible
-        if db:
-            try:
-                # Chercher le document existant
-                docs = list(db.collection('workoutPlans').where('uid', '==', user_id).limit(1).stream())
-                
-                if docs:
-                    # Mettre à jour le document existant
-                    doc_id = docs[0].id
-                    db.collection('workoutPlans').document(doc_id).update({'plan': plan})
-                else:
-                    # Créer un nouveau document
-                    db.collection('workoutPlans').add({'uid': user_id, 'plan': plan})
-                    
-                print(f"✅ Plan sauvegardé dans Firestore pour l'utilisateur {user_id}")
-            except Exception as firestore_error:
-                print(f"⚠️ Erreur Firestore lors de la sauvegarde: {firestore_error}")
+        # Sauvegarder dans Firestore si disponible (écriture différée)
+        if get_db():
+            queue_plan_write(user_id, plan)
         
         return jsonify({'success': True})
     except Exception as e:
@@ -922,44 +1263,26 @@ def update_plan():
     if 'user' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    data = request.get_json()
-    plan = data.get('plan')
+    data = request.get_json(silent=True)
+    plan = data.get('plan') if isinstance(data, dict) else None
     user_id = session['user']['uid']
     
+    if not is_valid_plan(plan):
+        return jsonify({'error': 'Invalid plan'}), 400
+    
     # Mettre à jour le plan en mémoire
-    user_workout_plans[user_id] = plan
+    plan_cache.set(user_id, plan)
     
-    # Si Firestore est disponible, sauvegarder aussi là-bas
-    if db:
-        try:
-            # Chercher le document existant
-            docs = db.collection('workoutPlans').where('uid', '==', user_id).limit(1).stream()
-            doc_id = None
-            for doc in docs:
-                doc_id = doc.id
-                break
-            
-            if doc_id:
-                # Mettre à jour le document existant
-                db.collection('workoutPlans').document(doc_id).update({'plan': plan})
-            else:
-                # Créer un nouveau document
-                db.collection('workoutPlans').add({'uid': user_id, 'plan': plan})
-        except Exception as e:
-            print(f"Erreur Firestore: {e}")
+    # Si Firestore est disponible, sauvegarder aussi là-bas (écriture différée)
+    if get_db():
+        queue_plan_write(user_id, plan)
     
     return jsonify({'success': True})
 
 @app.route('/static/data/exercises.json')
 def exercises():
-    # Retourne la liste des exercices sous forme de JSON pour le front.
-    data_path = os.path.join(app.root_path, 'static', 'data', 'exercises.json')
-    try:
-        with open(data_path, 'r', encoding='utf-8') as f:
-            exercises_data = json.load(f)
-    except Exception:
-        exercises_data = []
-    return jsonify(exercises_data)
+    # Retourne la liste des exercices (précompressée, 304 si le navigateur l'a déjà)
+    return exercise_catalogue.response(request)
 
 @app.route('/ads.txt')
 def ads():
@@ -971,57 +1294,122 @@ def robots():
     return send_from_directory(app.static_folder, 'robots.txt')
 
 @app.route('/legal')
+@page_cache.cached
 def legal():
     return render_template('legal.html', user=session.get('user'))
 
 @app.route('/terms')
+@page_cache.cached
 def terms():
     return render_template('terms.html', user=session.get('user'))
 
 @app.route('/blog')
+@page_cache.cached(query={'page': int})
 def blog():
-    return render_template('blog.html', user=session.get('user'), articles=BLOG_ARTICLES)
+    page = request.args.get('page', 1, type=int)
+    articles = blog_store.page(page)
+    if articles is None:
+        return redirect(url_for('blog'))
+    return render_template('blog.html', user=session.get('user'), articles=articles,
+                           page=page, page_count=blog_store.page_count)
 
 @app.route('/blog/<article_id>')
+@page_cache.cached
 def article(article_id):
     article = get_article_by_id(article_id)
     if article:
-        return render_template('article.html', user=session.get('user'), article=article, articles=BLOG_ARTICLES)
+        return render_template('article.html', user=session.get('user'), article=article, articles=blog_store.articles)
     else:
         return redirect(url_for('blog'))
 
+def stats_access_allowed():
+    """Accès à /stats et /metrics : jeton STATS_TOKEN (X-Stats-Token ou Bearer), sinon local uniquement"""
+    stats_token = os.environ.get('STATS_TOKEN')
+    if stats_token:
+        return stats_token in (request.headers.get('X-Stats-Token'),
+                               request.headers.get('Authorization', '').removeprefix('Bearer '))
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/stats')
+def stats():
+    """Statistiques internes (caches, compteurs) au format JSON"""
+    if not stats_access_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify({name: provider() for name, provider in STATS_PROVIDERS.items()})
+
+# Requêtes des caches exportées sur /metrics (nom -> statistiques contenant hits/misses)
+METRICS_CACHES = {
+    'generation': generation_cache.stats,
+    'plan': plan_cache.stats,
+    'page': page_cache.stats,
+    'id_token': token_verifier.stats,
+    'blog_body': lambda: blog_store.stats()['bodies'],
+}
+
+def cache_request_counts():
+    counts = {}
+    for name, cache_stats in METRICS_CACHES.items():
+        values = cache_stats()
+        for result in ('hits', 'negative_hits', 'misses'):
+            if result in values:
+                counts[(name, result)] = values[result]
+    return counts
+
+metrics.counter_callback('cache_requests_total', "Lectures des caches par résultat", ('cache', 'result'),
+                         cache_request_counts)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métriques au format texte Prometheus, additionnées sur tous les workers"""
+    if not METRICS_ENABLED:
+        return jsonify({'error': 'Not found'}), 404
+    if not stats_access_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Pages du sitemap : (endpoint, template dont la date de modification sert de lastmod, priorité)
+SITEMAP_PAGES = (
+    ('index', 'index.html', '1.0'),
+    ('about', 'about.html', '0.8'),
+    ('contact', 'contact.html', '0.7'),
+    ('blog', 'blog.html', '0.8'),
+    ('privacy', 'privacy.html', '0.5'),
+    ('terms', 'terms.html', '0.5'),
+    ('legal', 'legal.html', '0.5'),
+)
+
+def sitemap_entries():
+    """URL du site (loc, lastmod, priorité) : pages, pages de la liste du blog et articles."""
+    template_folder = os.path.join(app.root_path, app.template_folder)
+    _, blog_modified = blog_store.version()
+    for endpoint, template, priority in SITEMAP_PAGES:
+        lastmod = os.stat(os.path.join(template_folder, template)).st_mtime
+        if endpoint == 'blog':
+            lastmod = max(lastmod, blog_modified)
+        yield url_for(endpoint, _external=True), lastmod, priority
+    for page in range(2, blog_store.page_count + 1):
+        yield url_for('blog', page=page, _external=True), blog_modified, '0.6'
+    for article in blog_store.articles:
+        yield url_for('article', article_id=article['id'], _external=True), article['updated'], '0.7'
+
+sitemap_cache = Sitemap(
+    sitemap_entries,
+    lambda number: url_for('sitemap_part', number=number, _external=True),
+    max_urls=int(os.environ.get('SITEMAP_MAX_URLS', 50000))
+)
+STATS_PROVIDERS['sitemap'] = sitemap_cache.stats
+
 @app.route('/sitemap.xml')
 def sitemap():
-    """Génère un sitemap XML pour le SEO"""
-    from flask import make_response
-    from datetime import datetime
-    
-    # Liste des URLs du site
-    urls = [
-        {'loc': url_for('index', _external=True), 'lastmod': datetime.now().strftime('%Y-%m-%d'), 'priority': '1.0'},
-        {'loc': url_for('about', _external=True), 'lastmod': datetime.now().strftime('%Y-%m-%d'), 'priority': '0.8'},
-        {'loc': url_for('contact', _external=True), 'lastmod': datetime.now().strftime('%Y-%m-%d'), 'priority': '0.7'},
-        {'loc': url_for('blog', _external=True), 'lastmod': datetime.now().strftime('%Y-%m-%d'), 'priority': '0.8'},
-        {'loc': url_for('privacy', _external=True), 'lastmod': datetime.now().strftime('%Y-%m-%d'), 'priority': '0.5'},
-        {'loc': url_for('terms', _external=True), 'lastmod': datetime.now().strftime('%Y-%m-%d'), 'priority': '0.5'},
-        {'loc': url_for('legal', _external=True), 'lastmod': datetime.now().strftime('%Y-%m-%d'), 'priority': '0.5'},
-    ]
-    
-    # Générer le XML
-    xml_content = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    xml_content += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-    
-    for url in urls:
-        xml_content += '  <url>\n'
-        xml_content += f'    <loc>{url["loc"]}</loc>\n'
-        xml_content += f'    <lastmod>{url["lastmod"]}</lastmod>\n'
-        xml_content += f'    <priority>{url["priority"]}</priority>\n'
-        xml_content += '  </url>\n'
-    
-    xml_content += '</urlset>'
-    
-    response = make_response(xml_content)
-    response.headers['Content-Type'] = 'application/xml'
+    """Sitemap XML pour le SEO (ou index de sitemaps au-delà de SITEMAP_MAX_URLS URL)"""
+    return sitemap_cache.response(request)
+
+@app.route('/sitemap-<int:number>.xml')
+def sitemap_part(number):
+    """Sitemap numéroté référencé par l'index"""
+    response = sitemap_cache.response(request, number) if number > 0 else None
+    if response is None:
+        return jsonify({'error': 'Not found'}), 404
     return response
 
 if __name__ == '__main__':
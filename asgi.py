@@ -0,0 +1,146 @@
+"""Point d'entrée ASGI : génération asynchrone, le reste de l'application en WSGI.
+
+    uvicorn asgi:application
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker
+
+POST /generate est traité dans la boucle asyncio avec le client AsyncOpenAI
+(pool de connexions HTTP partagé) : un worker garde des centaines de
+générations en cours sans bloquer un thread pour chacune. Les autres routes
+sont servies par l'application Flask existante, dans un pool de threads.
+Avec ASYNC_GENERATION=0, /generate passe aussi par Flask (chemin synchrone).
+"""
+import asyncio
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import g, request, session
+from werkzeug.exceptions import HTTPException
+
+from admission import AdmissionRejected
+from app import (METRICS_ENABLED, SDK_WARMUP, admit_generation, app, async_openai_client,
+                 build_generation_result_async, generation_admission, http_request_duration, metrics,
+                 parse_generation_request, plan_writer, warm_up)
+
+ASYNC_GENERATION = os.environ.get('ASYNC_GENERATION', '1') != '0'
+# Threads servant les routes Flask (l'équivalent de --threads pour un worker gthread)
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 8))
+
+_wsgi_executor = ThreadPoolExecutor(ASGI_WSGI_THREADS, thread_name_prefix='wsgi')
+
+
+class _ThreadedWsgiInstance(WsgiToAsgiInstance):
+    # asgiref exécute par défaut toutes les requêtes WSGI une par une dans un thread unique
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False,
+                                 executor=_wsgi_executor)
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi dont les requêtes s'exécutent en parallèle dans un pool de threads."""
+
+    async def __call__(self, scope, receive, send):
+        await _ThreadedWsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+wsgi_application = ThreadedWsgiToAsgi(app)
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+def build_environ(scope, body):
+    """Environ WSGI d'une requête ASGI (pour ouvrir la session et lire la requête avec Flask)."""
+    instance = WsgiToAsgiInstance(app)
+    instance.scope = scope
+    return instance.build_environ(scope, io.BytesIO(body))
+
+
+async def send_response(send, response):
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.items()]
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': response.get_data()})
+
+
+async def generate(scope, receive):
+    """POST /generate : même réponse que la vue Flask avec GENERATION_JOBS_ENABLED=0, sans bloquer de thread."""
+    environ = build_environ(scope, await read_body(receive))
+
+    def respond(payload, status=200, headers=None):
+        # Réponse construite par Flask (en-têtes CORS, session) dans le contexte de la requête
+        with app.request_context(environ):
+            response = app.make_response((json.dumps(payload, ensure_ascii=False), status,
+                                          {'Content-Type': 'application/json', **(headers or {})}))
+            return app.process_response(response)
+
+    with app.request_context(environ):
+        early = app.preprocess_request()
+        # Durée mesurée par application() et non par le hook after_request de Flask
+        g.pop('request_started', None)
+        if early is not None:
+            return app.process_response(app.make_response(early))
+        user = session.get('user')
+        if not user:
+            return respond({'error': 'Authentication required'}, 401)
+        try:
+            params = parse_generation_request(request.get_json(force=True))
+        except HTTPException as e:
+            return respond({'error': e.description}, e.code)
+
+    try:
+        # Contrôle d'admission partagé avec les workers WSGI (transaction SQLite courte, hors de la boucle)
+        lease = await asyncio.to_thread(admit_generation, user['uid'])
+    except AdmissionRejected as e:
+        return respond({'error': str(e)}, 429, {'Retry-After': str(e.retry_after)})
+    try:
+        result = await build_generation_result_async(user['uid'], params)
+    finally:
+        await asyncio.to_thread(generation_admission.release, lease)
+    return respond(result)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if SDK_WARMUP:
+                await asyncio.to_thread(warm_up)
+                if ASYNC_GENERATION:
+                    async_openai_client.get()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # Modifications de plans encore en attente et métriques (comme worker_exit avec gunicorn en WSGI)
+            await asyncio.to_thread(plan_writer.flush, force=True)
+            await asyncio.to_thread(metrics.retire)
+            client = async_openai_client.get() if async_openai_client.initialized else None
+            if client is not None:
+                await client.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if ASYNC_GENERATION and scope['type'] == 'http' and scope['path'] == '/generate' and scope['method'] == 'POST':
+        started = time.perf_counter()
+        response = await generate(scope, receive)
+        await send_response(send, response)
+        if METRICS_ENABLED:
+            # Les hooks Flask ne mesurent pas ce chemin : même histogramme que les autres routes
+            http_request_duration.observe(time.perf_counter() - started, 'POST', '/generate',
+                                          str(response.status_code))
+        return
+    return await wsgi_application(scope, receive, send)
@@ -0,0 +1,329 @@
+"""Préparation des fichiers statiques CSS/JS pour la production.
+
+`python asset_pipeline.py` minifie les feuilles de style et les scripts de
+static/, écrit des copies dont le nom contient l'empreinte du contenu
+(static/dist/css/style.3f2a1b9c0d.css) avec leurs variantes .gz/.br, et un
+manifest.json. Au démarrage, l'application lit ce manifest : url_for('static', ...)
+renvoie alors les URL avec empreinte, servies avec un cache d'un an (immutable).
+Sans manifest (développement), les fichiers d'origine sont servis comme avant.
+Une entrée du manifest qui ne correspond plus à son fichier source (modifié
+sans relancer la construction) est ignorée : le fichier d'origine est servi.
+"""
+import gzip
+import hashlib
+import json
+import os
+import string
+import sys
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+ASSET_EXTENSIONS = ('.css', '.js')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_IDENT = frozenset(string.ascii_letters + string.digits + '_$')
+_WHITESPACE = ' \t\r\n\f'
+# Un « / » après ces caractères ou mots-clés commence une expression régulière
+_REGEX_PRECEDERS = frozenset('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = frozenset({'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+                             'void', 'throw', 'instanceof', 'yield', 'await'})
+
+
+def _scan_string(source, start):
+    """Position après la chaîne entre guillemets commençant à `start`."""
+    quote = source[start]
+    index = start + 1
+    while index < len(source):
+        char = source[index]
+        if char == '\\':
+            index += 2
+            continue
+        index += 1
+        if char == quote:
+            break
+    return index
+
+
+def _scan_template(source, start):
+    """Position après le gabarit `...` commençant à `start` (expressions ${...} comprises)."""
+    index = start + 1
+    while index < len(source):
+        char = source[index]
+        if char == '\\':
+            index += 2
+        elif char == '`':
+            return index + 1
+        elif char == '$' and source.startswith('{', index + 1):
+            index = _scan_template_expression(source, index + 2)
+        else:
+            index += 1
+    return index
+
+
+def _scan_template_expression(source, index):
+    depth = 1
+    while index < len(source):
+        char = source[index]
+        if char in '"\'':
+            index = _scan_string(source, index)
+            continue
+        if char == '`':
+            index = _scan_template(source, index)
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        index += 1
+    return index
+
+
+def _scan_regex(source, start):
+    """Position après l'expression régulière commençant à `start`, ou None si ce n'en est pas une."""
+    index = start + 1
+    in_class = False
+    while index < len(source):
+        char = source[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char == '\n':
+            return None
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            index += 1
+            while index < len(source) and source[index] in _IDENT:
+                index += 1
+            return index
+        index += 1
+    return None
+
+
+def _regex_allowed(out):
+    text = ''.join(out[-3:]).rstrip(_WHITESPACE) if out else ''
+    if not text:
+        return True
+    last = text[-1]
+    if last in _REGEX_PRECEDERS or last == '}':
+        return True
+    if last in _IDENT:
+        word = []
+        for chunk in reversed(out):
+            for char in reversed(chunk):
+                if char not in _IDENT:
+                    return ''.join(reversed(word)) in _REGEX_KEYWORDS
+                word.append(char)
+        return ''.join(reversed(word)) in _REGEX_KEYWORDS
+    return False
+
+
+def minify_js(source):
+    """
+    Retire les commentaires et l'indentation d'un script. Les retours à la ligne
+    sont conservés (un seul entre deux instructions) pour ne pas dépendre de
+    l'insertion automatique des points-virgules.
+    """
+    out = []
+    pending = None
+    index = 0
+    length = len(source)
+    while index < length:
+        char = source[index]
+        if char in _WHITESPACE:
+            if char == '\n' or pending == '\n':
+                pending = '\n'
+            else:
+                pending = ' '
+            index += 1
+            continue
+        if char == '/' and source.startswith('/', index + 1):
+            end = source.find('\n', index)
+            index = length if end == -1 else end
+            continue
+        if char == '/' and source.startswith('*', index + 1):
+            end = source.find('*/', index + 2)
+            end = length if end == -1 else end + 2
+            pending = '\n' if '\n' in source[index:end] or pending == '\n' else (pending or ' ')
+            index = end
+            continue
+
+        if pending and out:
+            previous = out[-1][-1]
+            if pending == '\n':
+                out.append('\n')
+            elif (previous in _IDENT and char in _IDENT) or (previous in '+-' and char in '+-'):
+                out.append(' ')
+        pending = None
+
+        if char in '"\'':
+            end = _scan_string(source, index)
+        elif char == '`':
+            end = _scan_template(source, index)
+        elif char == '/' and _regex_allowed(out):
+            end = _scan_regex(source, index) or index + 1
+        else:
+            end = index + 1
+        out.append(source[index:end])
+        index = end
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(source):
+    """Retire les commentaires et les espaces superflus d'une feuille de style."""
+    out = []
+    pending = False
+    index = 0
+    length = len(source)
+    while index < length:
+        char = source[index]
+        if char == '/' and source.startswith('*', index + 1):
+            end = source.find('*/', index + 2)
+            index = length if end == -1 else end + 2
+            pending = True
+            continue
+        if char in _WHITESPACE:
+            pending = True
+            index += 1
+            continue
+        if char in '{};,>':
+            # Aucun espace nécessaire autour de ces caractères
+            if char == '}' and out and out[-1] == ';':
+                out.pop()
+            out.append(char)
+            pending = False
+            index += 1
+            continue
+        if pending and out and out[-1][-1] not in '{};,>:(':
+            out.append(' ')
+        pending = False
+        if char in '"\'':
+            end = _scan_string(source, index)
+        else:
+            end = index + 1
+        out.append(source[index:end])
+        index = end
+    return ''.join(out).strip() + '\n'
+
+
+def fingerprinted_name(path, content):
+    """css/style.css -> css/style.<empreinte>.css"""
+    root, extension = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:10]}{extension}"
+
+
+def minified_asset(static_folder, relative):
+    """(taille d'origine, contenu minifié) d'un fichier CSS/JS de static_folder."""
+    with open(os.path.join(static_folder, *relative.split('/')), 'r', encoding='utf-8') as f:
+        text = f.read()
+    minified = minify_css(text) if relative.endswith('.css') else minify_js(text)
+    return len(text.encode('utf-8')), minified.encode('utf-8')
+
+
+def build_assets(static_folder, output_dir=DIST_DIR):
+    """Minifie et compresse les CSS/JS de static_folder ; retourne le manifest {source: fichier}."""
+    manifest = {}
+    output_root = os.path.join(static_folder, output_dir)
+    for directory, subdirectories, files in os.walk(static_folder):
+        if os.path.abspath(directory).startswith(os.path.abspath(output_root)):
+            continue
+        for name in sorted(files):
+            if not name.endswith(ASSET_EXTENSIONS):
+                continue
+            source_path = os.path.join(directory, name)
+            relative = os.path.relpath(source_path, static_folder).replace(os.sep, '/')
+            original_size, content = minified_asset(static_folder, relative)
+            target = f"{output_dir}/{fingerprinted_name(relative, content)}"
+            target_path = os.path.join(static_folder, *target.split('/'))
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            with open(target_path, 'wb') as f:
+                f.write(content)
+            with open(target_path + '.gz', 'wb') as f:
+                f.write(gzip.compress(content, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(target_path + '.br', 'wb') as f:
+                    f.write(brotli.compress(content, quality=11))
+            manifest[relative] = target
+            print(f"  {relative}: {original_size} -> {len(content)} octets ({target})")
+
+    with open(os.path.join(output_root, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class AssetManifest:
+    """Réécrit les URL statiques vers les fichiers avec empreinte et les sert avec un cache immuable."""
+
+    def __init__(self, static_folder, output_dir=DIST_DIR):
+        self.static_folder = static_folder
+        self.output_dir = output_dir
+        self.assets = {}
+        path = os.path.join(static_folder, output_dir, MANIFEST_NAME)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.assets = json.load(f)
+        self.stale = self._drop_stale()
+        self.fingerprinted = frozenset(self.assets.values())
+
+    def _drop_stale(self):
+        """Retire du manifest les fichiers dont la source a changé depuis la construction ; retourne leur liste."""
+        stale = []
+        for relative, target in list(self.assets.items()):
+            try:
+                _, content = minified_asset(self.static_folder, relative)
+            except OSError:
+                content = None
+            expected = f"{self.output_dir}/{fingerprinted_name(relative, content)}" if content is not None else None
+            if target != expected or not os.path.exists(os.path.join(self.static_folder, *target.split('/'))):
+                stale.append(relative)
+                del self.assets[relative]
+        if stale:
+            print(f"⚠️ Fichiers statiques à reconstruire (python asset_pipeline.py), servis sans empreinte : "
+                  f"{', '.join(sorted(stale))}")
+        return stale
+
+    def url_defaults(self, endpoint, values):
+        """Hook url_defaults : url_for('static', filename='css/style.css') -> fichier avec empreinte."""
+        if endpoint == 'static' and values.get('filename') in self.assets:
+            values['filename'] = self.assets[values['filename']]
+
+    def wrap_static_view(self, static_view):
+        """Vue « static » servant les fichiers avec empreinte précompressés et en cache immuable."""
+        def static(filename):
+            if filename not in self.fingerprinted:
+                return static_view(filename=filename)
+            accepted = request.accept_encodings
+            encoding = None
+            for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+                if accepted[candidate] and os.path.exists(os.path.join(self.static_folder, filename + suffix)):
+                    encoding = candidate
+                    filename_on_disk = filename + suffix
+                    break
+            else:
+                filename_on_disk = filename
+            response = send_from_directory(self.static_folder, filename_on_disk,
+                                           mimetype='text/css' if filename.endswith('.css') else 'text/javascript')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+            response.vary.add('Accept-Encoding')
+            return response
+        return static
+
+
+if __name__ == '__main__':
+    static_folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    print(f"Construction des fichiers statiques de {static_folder}")
+    result = build_assets(static_folder)
+    print(f"✅ {len(result)} fichiers écrits dans {os.path.join(static_folder, DIST_DIR)}")
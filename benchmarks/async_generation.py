@@ -0,0 +1,185 @@
+"""Débit de générations simultanées par worker : chemin synchrone vs asynchrone.
+
+Un faux serveur OpenAI local (asyncio) répond à chaque /chat/completions
+après un délai fixe, comme un modèle lent. Le même lot de requêtes POST
+/generate (profils tous différents, cache de génération désactivé) est
+envoyé :
+- en synchrone à l'application Flask, depuis autant de threads qu'un worker
+  gthread en aurait (--threads) ;
+- en asynchrone au point d'entrée ASGI (asgi.py), dans une seule boucle
+  asyncio avec --concurrency requêtes en cours.
+
+Usage : python benchmarks/async_generation.py [--requests 200] [--latency 0.5]
+                                              [--threads 8] [--concurrency 200]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USER = {'uid': 'bench', 'email': 'bench@example.com', 'name': 'Bench', 'picture': ''}
+PLAN = {"j": [{"d": 1, "t": 1, "e": [{"n": 1, "s": 3, "r": 12, "m": None}, {"n": 2, "s": 3, "r": 15, "m": None}]},
+              {"d": 2, "t": 0, "e": []}, {"d": 3, "t": 1, "e": [{"n": 4, "s": 3, "r": None, "m": 1}]},
+              {"d": 4, "t": 0, "e": []}, {"d": 5, "t": 1, "e": [{"n": 3, "s": 3, "r": 10, "m": None}]},
+              {"d": 6, "t": 0, "e": []}, {"d": 7, "t": 0, "e": []}]}
+
+
+def completion_body():
+    return json.dumps({
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": "gpt-4.1-mini",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": json.dumps(PLAN)}}],
+        "usage": {"prompt_tokens": 900, "completion_tokens": 150, "total_tokens": 1050},
+    }).encode('utf-8')
+
+
+async def handle_connection(reader, writer, latency):
+    """Faux serveur OpenAI : HTTP/1.1 keep-alive, réponse après `latency` secondes."""
+    try:
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = 0
+            for line in head.split(b'\r\n'):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            await asyncio.sleep(latency)
+            body = completion_body()
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                         b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def start_stub_server(latency):
+    """Démarre le faux serveur dans un thread ; retourne son port."""
+    ready = threading.Event()
+    port = []
+
+    async def serve():
+        server = await asyncio.start_server(lambda r, w: handle_connection(r, w, latency), '127.0.0.1', 0,
+                                            backlog=4096)
+        port.append(server.sockets[0].getsockname()[1])
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    ready.wait()
+    return port[0]
+
+
+def payload(index):
+    # Profils tous différents : aucune requête n'est regroupée avec une autre
+    return {'height': 100 + 5 * index, 'weight': 70, 'age': 30, 'gym': True, 'difficulty': 'intermediate'}
+
+
+def summarize(name, durations, elapsed, failures):
+    durations.sort()
+    print(f"{name:<30} {len(durations) / elapsed:>8.1f} gén./s  p50 {statistics.median(durations) * 1000:>6.0f} ms"
+          f"  p95 {durations[int(len(durations) * 0.95) - 1] * 1000:>6.0f} ms  erreurs {failures}")
+
+
+def run_sync(app_module, requests, threads):
+    flask_app = app_module.app
+    durations = []
+    failures = 0
+
+    def one(index):
+        client = flask_app.test_client()
+        with client.session_transaction() as session:
+            session['user'] = USER
+        start = time.perf_counter()
+        response = client.post('/generate', json=payload(index))
+        return time.perf_counter() - start, response.status_code == 200 and 'plan' in response.get_json()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        for duration, ok in pool.map(one, range(requests)):
+            durations.append(duration)
+            failures += not ok
+    summarize(f"synchrone ({threads} threads)", durations, time.perf_counter() - start, failures)
+
+
+async def run_async(app_module, asgi_module, requests, concurrency):
+    serializer = app_module.app.session_interface.get_signing_serializer(app_module.app)
+    cookie = SimpleCookie()
+    cookie[app_module.app.config['SESSION_COOKIE_NAME']] = serializer.dumps({'user': USER})
+    cookie_header = cookie.output(header='', sep=';').strip().encode('latin-1')
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index):
+        body = json.dumps(payload(index)).encode('utf-8')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+            'scheme': 'http', 'path': '/generate', 'raw_path': b'/generate', 'root_path': '', 'query_string': b'',
+            'headers': [(b'host', b'localhost'), (b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode()), (b'cookie', cookie_header)],
+            'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        async with semaphore:
+            start = time.perf_counter()
+            await asgi_module.application(scope, receive, send)
+            duration = time.perf_counter() - start
+        ok = sent[0]['status'] == 200 and 'plan' in json.loads(sent[1]['body'])
+        return duration, ok
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(index) for index in range(requests)))
+    summarize(f"asynchrone ({concurrency} en cours)", [d for d, _ in results], time.perf_counter() - start,
+              sum(1 for _, ok in results if not ok))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.5, help="Délai de réponse du faux modèle (s)")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=200)
+    args = parser.parse_args()
+
+    port = start_stub_server(args.latency)
+    directory = tempfile.mkdtemp()
+    os.environ.update({
+        'OPENAI_API_KEY': 'sk-benchmark',
+        'OPENAI_BASE_URL': f'http://127.0.0.1:{port}/v1',
+        'GENERATION_MODE': 'llm',
+        'GENERATION_CACHE_ENABLED': '0',
+        'GENERATION_JOBS_ENABLED': '0',
+        'ADMISSION_ENABLED': '0',
+        'SESSION_BACKEND': 'cookie',
+        'SDK_WARMUP': '0',
+        'CACHE_DB_PATH': os.path.join(directory, 'cache.sqlite3'),
+    })
+    import app as app_module
+    import asgi as asgi_module
+
+    print(f"{args.requests} générations, modèle simulé à {args.latency * 1000:.0f} ms par réponse")
+    run_sync(app_module, args.requests, args.threads)
+    asyncio.run(run_async(app_module, asgi_module, args.requests, args.concurrency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Compare la latence d'une lecture réussie (hit) selon le backend de cache.
+
+Usage : python benchmarks/cache_backends.py [--entries 1000] [--reads 20000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import make_cache  # noqa: E402
+
+# Plan compressé réaliste : 5 jours d'entraînement, 2 jours de repos
+SAMPLE_PLAN = {"j": [
+    {"d": d, "t": 1 if d not in (3, 7) else 0,
+     "e": [] if d in (3, 7) else [{"n": n, "s": 3, "r": 12} for n in (1, 2, 3, 5)] + [{"n": 4, "s": 3, "m": 1}]}
+    for d in range(1, 8)
+]}
+
+
+def encode(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def decode(data):
+    return json.loads(data)
+
+
+def measure(cache, keys, reads):
+    samples = []
+    for _ in range(reads):
+        key = random.choice(keys)
+        started = time.perf_counter()
+        cache.get(key)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return {
+        'p50_us': samples[len(samples) // 2],
+        'p99_us': samples[int(len(samples) * 0.99)],
+        'mean_us': sum(samples) / len(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=1000)
+    parser.add_argument('--reads', type=int, default=20000)
+    args = parser.parse_args()
+
+    keys = [f"user-{i}" for i in range(args.entries)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        print(f"{'backend':<8} {'p50 (µs)':>10} {'p99 (µs)':>10} {'moyenne (µs)':>13}")
+        for backend in ('memory', 'sqlite', 'tiered'):
+            cache = make_cache(backend, path=path, namespace=backend, max_entries=args.entries * 2,
+                               encode=encode, decode=decode)
+            for key in keys:
+                cache.set(key, SAMPLE_PLAN)
+            measure(cache, keys, min(args.reads, 1000))  # préchauffage
+            result = measure(cache, keys, args.reads)
+            print(f"{backend:<8} {result['p50_us']:>10.1f} {result['p99_us']:>10.1f} {result['mean_us']:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
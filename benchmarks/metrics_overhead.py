@@ -0,0 +1,73 @@
+"""Coût des métriques par requête : chronométrage des routes actif ou retiré.
+
+Le client de test Flask sert une page en cache (/about) par séries de
+`--batch` requêtes, en alternant des séries avec et sans les hooks de
+chronométrage (before/after_request) pour que les variations de la machine
+touchent les deux modes de la même façon. La différence des médianes est le
+coût du chronométrage ; le coût d'une observation d'histogramme seule est
+aussi mesuré.
+
+Usage : python benchmarks/metrics_overhead.py [--rounds 20] [--batch 500]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TIMING_HOOKS = ('start_request_timer', 'record_request_duration')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--batch', type=int, default=500)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    os.environ.update({
+        'CACHE_DB_PATH': os.path.join(directory, 'cache.sqlite3'),
+        'METRICS_DIR': os.path.join(directory, 'metrics'),
+        'METRICS_ENABLED': '1',
+    })
+    import app as app_module
+    flask_app = app_module.app
+    client = flask_app.test_client()
+    hooks = {'before': list(flask_app.before_request_funcs[None]), 'after': list(flask_app.after_request_funcs[None])}
+
+    def set_timing(enabled):
+        keep = (lambda f: True) if enabled else (lambda f: f.__name__ not in TIMING_HOOKS)
+        flask_app.before_request_funcs[None] = [f for f in hooks['before'] if keep(f)]
+        flask_app.after_request_funcs[None] = [f for f in hooks['after'] if keep(f)]
+
+    def batch():
+        start = time.perf_counter()
+        for _ in range(args.batch):
+            client.get('/about')
+        return (time.perf_counter() - start) / args.batch * 1e6
+
+    batch()
+    samples = {False: [], True: []}
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            set_timing(enabled)
+            samples[enabled].append(batch())
+
+    start = time.perf_counter()
+    for _ in range(100000):
+        app_module.http_request_duration.observe(0.012, 'GET', '/about', '200')
+    observe_ns = (time.perf_counter() - start) / 100000 * 1e9
+
+    off, on = statistics.median(samples[False]), statistics.median(samples[True])
+    print(f"sans chronométrage  {off:>8.1f} µs/requête")
+    print(f"avec chronométrage  {on:>8.1f} µs/requête")
+    print(f"surcoût : {on - off:.1f} µs/requête ({(on / off - 1) * 100:.1f} %), observation seule : {observe_ns:.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Compare la taille et le débit du format binaire des plans au format dict compressé.
+
+Les plans générés ressemblent à ceux du modèle : 3 à 7 jours, 3 à 6
+exercices par séance, exercices mesurés en temps et quelques noms libres.
+
+Usage : python benchmarks/plan_codec.py [--plans 2000] [--rounds 5]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py crée le client OpenAI et les caches à l'import
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+os.environ.setdefault('CACHE_DB_PATH', os.path.join(tempfile.mkdtemp(), 'cache.sqlite3'))
+
+from app import (DAY_MAPPING, EXERCISE_MAPPING, TIME_BASED_EXERCISES,  # noqa: E402
+                 compress_workout_plan, decompress_workout_plan, plan_codec)
+
+FREE_TEXT_EXERCISES = ["Pompes diamant", "Gainage dynamique", "Sprint en côte"]
+
+
+def random_plan(rng):
+    day_count = rng.randint(3, 7)
+    workout_days = set(rng.sample(range(1, 8), day_count))
+    days = []
+    for day_id in range(1, 8):
+        if day_id not in workout_days:
+            days.append({"nomJour": DAY_MAPPING[day_id], "type": "rest", "exercices": []})
+            continue
+        exercises = []
+        for exercise_id in rng.sample(list(EXERCISE_MAPPING), rng.randint(3, 6)):
+            if exercise_id in TIME_BASED_EXERCISES:
+                exercises.append({"nom": EXERCISE_MAPPING[exercise_id], "series": 3,
+                                  "repetitions": None, "duree_minutes": rng.choice([1, 2, 20, 30])})
+            else:
+                exercises.append({"nom": EXERCISE_MAPPING[exercise_id], "series": rng.randint(2, 5),
+                                  "repetitions": rng.choice([8, 10, 12, 15, 20]), "duree_minutes": None})
+        if rng.random() < 0.1:
+            exercises.append({"nom": rng.choice(FREE_TEXT_EXERCISES), "series": 3,
+                              "repetitions": 10, "duree_minutes": None})
+        days.append({"nomJour": DAY_MAPPING[day_id], "type": "workout", "exercices": exercises})
+    return {"jours": days}
+
+
+def dict_encode(plan):
+    return json.dumps(compress_workout_plan(plan), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dict_decode(data):
+    return decompress_workout_plan(json.loads(data))
+
+
+def throughput(fn, items, rounds):
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn(items)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(items) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--plans', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    plans = [random_plan(rng) for _ in range(args.plans)]
+
+    dict_encoded = [dict_encode(plan) for plan in plans]
+    binary_encoded = plan_codec.encode_many(plans)
+    assert plan_codec.decode_many(binary_encoded) == [dict_decode(data) for data in dict_encoded]
+
+    codecs = [
+        ('dict', lambda items: [dict_encode(plan) for plan in items],
+         lambda items: [dict_decode(data) for data in items], dict_encoded),
+        ('binary', plan_codec.encode_many, plan_codec.decode_many, binary_encoded),
+    ]
+    print(f"{'format':<8} {'taille moy. (o)':>16} {'+zlib (o)':>10} {'encode (plans/s)':>17} {'decode (plans/s)':>17}")
+    for name, encode_many, decode_many, encoded in codecs:
+        size = sum(len(data) for data in encoded) / len(encoded)
+        zsize = sum(len(zlib.compress(data)) for data in encoded) / len(encoded)
+        encode_rate = throughput(encode_many, plans, args.rounds)
+        decode_rate = throughput(decode_many, encoded, args.rounds)
+        print(f"{name:<8} {size:>16.1f} {zsize:>10.1f} {encode_rate:>17,.0f} {decode_rate:>17,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Mesure le coût par requête de la session selon le backend.
+
+Chaque backend sert une page qui lit session.get('user') (cas de toutes les
+pages du site) pour un utilisateur connecté ; le surcoût est mesuré par
+rapport à une requête anonyme sans cookie de session.
+
+Usage : python benchmarks/session_overhead.py [--requests 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, session  # noqa: E402
+from flask_session import Session  # noqa: E402
+
+from cache import SQLiteCache  # noqa: E402
+from sessions import SQLiteSessionInterface  # noqa: E402
+
+USER = {'uid': 'abc123', 'email': 'test@example.com', 'name': 'Test User', 'picture': ''}
+
+
+def build_app(backend, directory):
+    app = Flask(__name__)
+    app.secret_key = 'bench'
+    app.config['SESSION_REFRESH_EACH_REQUEST'] = False
+    if backend == 'filesystem':
+        app.config['SESSION_TYPE'] = 'filesystem'
+        app.config['SESSION_FILE_DIR'] = os.path.join(directory, 'flask_session')
+        Session(app)
+    elif backend == 'filesystem (refresh)':
+        # Comportement historique : session réécrite à chaque requête
+        app.config['SESSION_TYPE'] = 'filesystem'
+        app.config['SESSION_FILE_DIR'] = os.path.join(directory, 'flask_session_refresh')
+        app.config['SESSION_REFRESH_EACH_REQUEST'] = True
+        Session(app)
+    elif backend == 'sqlite':
+        app.session_interface = SQLiteSessionInterface(
+            SQLiteCache(os.path.join(directory, 'sessions.sqlite3'), namespace='sessions',
+                        max_entries=1000000, ttl=3600, cleanup_interval=60)
+        )
+
+    @app.route('/login')
+    def login():
+        session['user'] = USER
+        return 'ok'
+
+    @app.route('/page')
+    def page():
+        return session.get('user', {}).get('name', '')
+
+    @app.route('/plain')
+    def plain():
+        return ''
+
+    return app
+
+
+def measure(client, path, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        client.get(path)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'backend':<22} {'requête (µs)':>13} {'surcoût session (µs)':>21}")
+        for backend in ('cookie', 'sqlite', 'filesystem', 'filesystem (refresh)'):
+            app = build_app(backend, directory)
+            anonymous = app.test_client()
+            client = app.test_client()
+            client.get('/login')
+            measure(client, '/page', 100)  # préchauffage
+            baseline = measure(anonymous, '/plain', args.requests)
+            with_session = measure(client, '/page', args.requests)
+            print(f"{backend:<22} {with_session:>13.1f} {with_session - baseline:>21.1f}")
+
+
+if __name__ == '__main__':
+    main()
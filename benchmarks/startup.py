@@ -0,0 +1,71 @@
+"""Mesure le démarrage d'un worker : import de app.py et première réponse.
+
+Chaque essai lance un nouveau processus Python (imports à froid) qui importe
+l'application puis sert `/` avec le client de test Flask. En mode « eager »,
+les SDK sont initialisés avant la première requête (comme au démarrage d'un
+worker gunicorn avec SDK_WARMUP=1) ; en mode « lazy », ils ne le sont qu'au
+premier usage.
+
+Sans identifiants Firebase, seule l'initialisation du client OpenAI est
+mesurée (une clé factice suffit, aucun appel réseau n'est fait).
+
+Usage : python benchmarks/startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+if sys.argv[1] == 'eager':
+    app.warm_up()
+warmed = time.perf_counter()
+response = app.app.test_client().get('/')
+first = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'warm_up_ms': (warmed - imported) * 1000,
+    'first_response_ms': (first - warmed) * 1000,
+    'total_ms': (first - start) * 1000,
+    'sdk_loaded': 'openai' in sys.modules,
+}))
+'''
+
+
+def run(mode, directory):
+    env = dict(os.environ)
+    env.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    env['CACHE_DB_PATH'] = os.path.join(directory, f'{mode}.sqlite3')
+    output = subprocess.run([sys.executable, '-c', PROBE, mode], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'mode':<8} {'import':>10} {'warm-up':>10} {'1re réponse':>12} {'total':>10}  SDK chargés")
+        for mode in ('lazy', 'eager'):
+            results = [run(mode, directory) for _ in range(args.runs)]
+            median = {key: statistics.median(r[key] for r in results)
+                      for key in ('import_ms', 'warm_up_ms', 'first_response_ms', 'total_ms')}
+            print(f"{mode:<8} {median['import_ms']:>8.0f}ms {median['warm_up_ms']:>8.0f}ms "
+                  f"{median['first_response_ms']:>10.0f}ms {median['total_ms']:>8.0f}ms  "
+                  f"{'oui' if results[0]['sdk_loaded'] else 'non'}")
+
+
+if __name__ == '__main__':
+    main()
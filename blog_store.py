@@ -0,0 +1,135 @@
+"""Articles du blog stockés sur disque.
+
+content/blog/index.json contient les métadonnées des articles (titre,
+catégorie, date, image, résumé) dans l'ordre d'affichage ; le corps HTML de
+chaque article est dans content/blog/<id>.html. Seul l'index est lu au
+démarrage : les corps sont chargés à la première lecture et gardés dans un
+cache LRU. L'index est relu quand un des fichiers change.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from cache import LRUCache
+
+INDEX_NAME = 'index.json'
+
+
+class BlogStore:
+    """Index des articles par id, pages de la liste et corps chargés à la demande."""
+
+    def __init__(self, directory, body_cache_size=64, per_page=12, check_interval=2.0):
+        self.directory = directory
+        self.per_page = max(int(per_page), 1)
+        self.check_interval = check_interval
+        self.bodies = LRUCache(max_entries=body_cache_size, negative_ttl=0,
+                               encode=lambda body: body.encode('utf-8'),
+                               decode=lambda data: data.decode('utf-8'))
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._mtimes = None
+        self.articles = []
+        self.by_id = {}
+        self.pages = [[]]
+        self.token = None
+        self.last_modified = 0.0
+        self.reloads = 0
+        self.body_loads = 0
+        self._load()
+
+    def _path(self, article_id):
+        return os.path.join(self.directory, f"{article_id}.html")
+
+    def _scan(self):
+        """Dates de modification de l'index et des corps d'articles."""
+        mtimes = {INDEX_NAME: os.stat(os.path.join(self.directory, INDEX_NAME)).st_mtime}
+        for article in self.articles:
+            try:
+                mtimes[article['id']] = os.stat(self._path(article['id'])).st_mtime
+            except OSError:
+                mtimes[article['id']] = None
+        return mtimes
+
+    def _load(self):
+        with open(os.path.join(self.directory, INDEX_NAME), 'r', encoding='utf-8') as f:
+            raw = f.read()
+        articles = json.loads(raw)
+        by_id = {article['id']: article for article in articles}
+        pages = [articles[start:start + self.per_page] for start in range(0, len(articles), self.per_page)] or [[]]
+        with self._lock:
+            self.articles = articles
+            self.by_id = by_id
+            self.pages = pages
+            self.reloads += 1
+        mtimes = self._scan()
+        for article in articles:
+            # Date de modification du corps de l'article (celle de l'index si le fichier manque)
+            article['updated'] = mtimes[article['id']] or mtimes[INDEX_NAME]
+        with self._lock:
+            self._mtimes = mtimes
+            self.token = hashlib.sha256(raw.encode('utf-8') + repr(sorted(mtimes.items())).encode('utf-8')).hexdigest()[:32]
+            self.last_modified = max(mtime for mtime in mtimes.values() if mtime is not None)
+            self._checked_at = time.monotonic()
+        self.bodies.clear()
+
+    def refresh(self):
+        """Relit l'index si un fichier du blog a changé (vérification au plus toutes les check_interval secondes)."""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            if self._scan() != self._mtimes:
+                self._load()
+        except (OSError, ValueError, KeyError) as e:
+            # On garde la version précédente tant que l'index est illisible ou invalide
+            print(f"⚠️ Impossible de recharger le blog: {e}")
+
+    def version(self):
+        """(jeton de version, date de la dernière modification) du contenu du blog."""
+        self.refresh()
+        return self.token, self.last_modified
+
+    def get(self, article_id):
+        """Article complet (métadonnées et corps HTML), ou None s'il n'existe pas."""
+        self.refresh()
+        meta = self.by_id.get(article_id)
+        if meta is None:
+            return None
+        body = self.bodies.get(article_id)
+        if body is None:
+            try:
+                with open(self._path(article_id), 'r', encoding='utf-8') as f:
+                    body = f.read()
+            except OSError as e:
+                print(f"⚠️ Article {article_id} illisible: {e}")
+                return None
+            self.bodies.set(article_id, body)
+            with self._lock:
+                self.body_loads += 1
+        return dict(meta, content=body)
+
+    def page(self, number):
+        """Articles de la page `number` (à partir de 1), ou None si la page n'existe pas."""
+        self.refresh()
+        pages = self.pages
+        if number < 1 or number > len(pages):
+            return None
+        return pages[number - 1]
+
+    @property
+    def page_count(self):
+        return len(self.pages)
+
+    def stats(self):
+        stats = {'bodies': self.bodies.stats()}
+        with self._lock:
+            stats.update({
+                'articles': len(self.articles),
+                'pages': len(self.pages),
+                'reloads': self.reloads,
+                'body_loads': self.body_loads,
+            })
+        return stats
@@ -0,0 +1,439 @@
+"""Caches en mémoire et caches partagés entre les workers gunicorn.
+
+LRUCache vit dans la mémoire du worker ; SQLiteCache est stocké dans une
+base SQLite locale (mode WAL) pour que tous les workers d'une même machine
+voient les mêmes entrées.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Valeur renvoyée par LRUCache.get pour une clé connue comme absente (cache négatif)
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Cache en mémoire borné en nombre d'entrées et en octets, avec TTL optionnel.
+
+    Les valeurs sont stockées sous forme sérialisée (bytes) via `encode` et
+    reconstruites à la lecture via `decode`. `set_missing` mémorise qu'une clé
+    n'a pas de valeur pour éviter de la rechercher à nouveau.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=None, ttl=None, negative_ttl=300,
+                 encode=None, decode=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.encode = encode or (lambda value: json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        self.decode = decode or (lambda data: json.loads(data))
+        self._entries = OrderedDict()  # clé -> (données ou None si absente, expiration)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Retourne la valeur, MISSING si la clé est connue comme absente, ou None si inconnue."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            data, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if data is None:
+                self.negative_hits += 1
+                return MISSING
+            self.hits += 1
+        return self.decode(data)
+
+    def set(self, key, value, ttl=None):
+        data = self.encode(value)
+        ttl = self.ttl if ttl is None else ttl
+        self._store(key, data, time.monotonic() + ttl if ttl else None)
+
+    def set_missing(self, key):
+        """Mémorise que la clé n'a pas de valeur (pendant negative_ttl secondes)."""
+        if self.negative_ttl:
+            self._store(key, None, time.monotonic() + self.negative_ttl)
+
+    def _store(self, key, data, expires_at):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (data, expires_at)
+            self._bytes += len(data) if data else 0
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        data, _ = self._entries.pop(key)
+        self._bytes -= len(data) if data else 0
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Statistiques du cache pour le worker courant."""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+            }
+
+
+class SQLiteCache:
+    """
+    Cache clé/valeur partagé (SQLite, mode WAL) avec éviction LRU, TTL et compteurs hit/miss.
+
+    Chaque écriture reçoit un numéro de version croissant (séquence par espace
+    de noms), ce qui permet aux copies locales des autres workers de savoir
+    qu'elles sont périmées.
+    """
+
+    def __init__(self, path, namespace='default', max_entries=5000, ttl=None, negative_ttl=300,
+                 encode=None, decode=None, cleanup_interval=0):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # Nettoyage (expirations + LRU) au plus toutes les `cleanup_interval` secondes
+        self.cleanup_interval = cleanup_interval
+        self._last_cleanup = 0.0
+        self.encode = encode or (lambda value: json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        self.decode = decode or (lambda data: json.loads(data))
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value BLOB NOT NULL,"
+            " expires_at REAL,"
+            " last_access REAL NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")}
+        if 'version' not in columns:
+            conn.execute("ALTER TABLE cache_entries ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_entries_lru ON cache_entries (namespace, last_access)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_entries_expiry ON cache_entries (namespace, expires_at)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_sequences (namespace TEXT PRIMARY KEY, seq INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO cache_sequences (namespace, seq) VALUES (?, 0)", (namespace,)
+        )
+
+    def _connection(self):
+        # Une connexion par thread et par processus (les workers sont forkés)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get_raw(self, key):
+        """Retourne (données sérialisées, version), ou None si absente ou expirée."""
+        now = time.time()
+        conn = self._connection()
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at, version FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                self._count('misses')
+                return None
+            data, expires_at, version = row
+            if expires_at is not None and expires_at <= now:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self._count('misses')
+                return None
+            conn.execute(
+                "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ Erreur du cache {self.namespace}: {e}")
+            self._count('misses')
+            return None
+        if isinstance(data, str):
+            # Entrée écrite en texte par une version précédente
+            data = data.encode('utf-8')
+        self._count('negative_hits' if not data else 'hits')
+        return data, version
+
+    def get(self, key):
+        """Retourne la valeur, MISSING si la clé est connue comme absente, ou None si inconnue."""
+        row = self.get_raw(key)
+        if row is None:
+            return None
+        data, _ = row
+        if not data:
+            return MISSING
+        return self.decode(data)
+
+    def version(self, key):
+        """Version courante de l'entrée (None si absente ou expirée), sans lire la valeur."""
+        try:
+            row = self._connection().execute(
+                "SELECT version, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ Erreur du cache {self.namespace}: {e}")
+            return None
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        """Enregistre une valeur ; retourne sa version (None en cas d'erreur)."""
+        return self.set_raw(key, self.encode(value), self.ttl if ttl is None else ttl)
+
+    def set_missing(self, key):
+        """Mémorise que la clé n'a pas de valeur (pendant negative_ttl secondes)."""
+        if self.negative_ttl:
+            return self.set_raw(key, b'', self.negative_ttl)
+        return None
+
+    def set_raw(self, key, data, ttl=None):
+        """Enregistre des données déjà sérialisées et évince les entrées les moins récemment utilisées."""
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute("UPDATE cache_sequences SET seq = seq + 1 WHERE namespace = ?", (self.namespace,))
+                (version,) = conn.execute(
+                    "SELECT seq FROM cache_sequences WHERE namespace = ?", (self.namespace,)
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, last_access, version)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.namespace, key, sqlite3.Binary(data), expires_at, now, version)
+                )
+                self._evict(conn, now)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            print(f"⚠️ Erreur du cache {self.namespace}: {e}")
+            return None
+        return version
+
+    def _evict(self, conn, now):
+        if self.cleanup_interval and now - self._last_cleanup < self.cleanup_interval:
+            return
+        self._last_cleanup = now
+        conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.namespace, now)
+        )
+        (count,) = conn.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE rowid IN ("
+                " SELECT rowid FROM cache_entries WHERE namespace = ?"
+                " ORDER BY last_access LIMIT ?)",
+                (self.namespace, overflow)
+            )
+            with self._lock:
+                self.evictions += overflow
+
+    def delete(self, key):
+        try:
+            self._connection().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ Erreur du cache {self.namespace}: {e}")
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self):
+        (count,) = self._connection().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        return count
+
+    def stats(self):
+        """Statistiques du cache pour le worker courant."""
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            'entries': len(self),
+            'max_entries': self.max_entries,
+        }
+
+
+class TieredCache:
+    """
+    Copie locale (LRUCache) devant un cache partagé (SQLiteCache).
+
+    Une lecture ne vérifie que la version de l'entrée partagée : si la copie
+    locale porte la même version, elle est utilisée sans relire ni décoder la
+    valeur. Une écriture sur un autre worker change la version et invalide
+    donc automatiquement les copies locales.
+    """
+
+    def __init__(self, shared, local):
+        self.shared = shared
+        self.local = local
+        self.local_hits = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        version = self.shared.version(key)
+        if version is None:
+            self.local.delete(key)
+            self.shared._count('misses')
+            return None
+
+        cached = self.local.get(key)
+        if cached is not None and cached is not MISSING and cached[0] == version:
+            with self._lock:
+                self.local_hits += 1
+            # Compté aussi dans les totaux (hits/negative_hits, hit_rate) ; local_hits n'en est que le détail
+            self.shared._count('negative_hits' if not cached[1] else 'hits')
+            return MISSING if not cached[1] else self.shared.decode(cached[1])
+
+        row = self.shared.get_raw(key)
+        if row is None:
+            return None
+        data, version = row
+        self.local.set(key, (version, data))
+        return MISSING if not data else self.shared.decode(data)
+
+    def set(self, key, value, ttl=None):
+        data = self.shared.encode(value)
+        ttl = self.shared.ttl if ttl is None else ttl
+        version = self.shared.set_raw(key, data, ttl)
+        if version is not None:
+            self.local.set(key, (version, data))
+        return version
+
+    def set_missing(self, key):
+        version = self.shared.set_missing(key)
+        if version is not None:
+            self.local.set(key, (version, b''))
+        return version
+
+    def delete(self, key):
+        self.shared.delete(key)
+        self.local.delete(key)
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+
+    def stats(self):
+        """Statistiques du cache partagé, lectures servies par la copie locale comprises."""
+        stats = self.shared.stats()
+        stats['local_hits'] = self.local_hits
+        stats['local'] = self.local.stats()
+        return stats
+
+
+def _pack_versioned(entry):
+    version, data = entry
+    return version.to_bytes(8, 'big') + data
+
+
+def _unpack_versioned(data):
+    return int.from_bytes(data[:8], 'big'), data[8:]
+
+
+def make_cache(backend, path=None, namespace='default', max_entries=10000, max_bytes=None, ttl=None,
+               negative_ttl=300, encode=None, decode=None):
+    """
+    Construit un cache selon le backend demandé :
+    - "memory" : LRUCache propre au worker ;
+    - "sqlite" : SQLiteCache partagé par les workers de la machine ;
+    - "tiered" : copie locale versionnée devant le cache SQLite partagé.
+    """
+    if backend == 'memory':
+        return LRUCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl, negative_ttl=negative_ttl,
+                        encode=encode, decode=decode)
+    if path is None:
+        raise ValueError(f"Le backend de cache '{backend}' nécessite un chemin de base SQLite")
+    shared = SQLiteCache(path, namespace=namespace, max_entries=max_entries, ttl=ttl, negative_ttl=negative_ttl,
+                         encode=encode, decode=decode)
+    if backend == 'sqlite':
+        return shared
+    if backend == 'tiered':
+        local = LRUCache(max_entries=max_entries, max_bytes=max_bytes, negative_ttl=0,
+                         encode=_pack_versioned, decode=_unpack_versioned)
+        return TieredCache(shared, local)
+    raise ValueError(f"Backend de cache inconnu : {backend}")
@@ -0,0 +1,19 @@
+# Configuration gunicorn (chargée automatiquement par `gunicorn app:app`)
+
+
+def worker_exit(server, worker):
+    """Écrit dans Firestore les modifications de plans encore en attente et archive les métriques du worker"""
+    from app import metrics, plan_writer
+    written = plan_writer.flush(force=True)
+    if written:
+        server.log.info("Write-behind : %s plan(s) écrit(s) avant l'arrêt du worker %s", written, worker.pid)
+    # Les compteurs du worker restent comptés dans /metrics après son arrêt
+    metrics.retire()
+
+
+def post_fork(server, worker):
+    """Crée les clients OpenAI/Firebase/Firestore et précharge les certificats dès le démarrage du worker"""
+    from app import SDK_WARMUP, warm_up
+    if SDK_WARMUP:
+        warm_up()
+        server.log.info("SDK initialisés dans le worker %s", worker.pid)
@@ -0,0 +1,214 @@
+"""Requêtes OpenAI « couvertes » (hedging) pour réduire la latence p99 des générations.
+
+La première requête part seule ; si elle n'a pas répondu après un délai égal
+au percentile HEDGE_PERCENTILE des latences observées, une seconde requête
+identique est lancée. La première réponse dont le contenu est un JSON valide
+l'emporte et l'autre requête est annulée :
+- en asynchrone, la tâche perdante est annulée (connexion HTTP interrompue) ;
+- en synchrone, les deux requêtes sont lues en streaming et le flux perdant
+  est fermé au morceau suivant (OpenAI arrête alors la génération).
+
+Le nombre de requêtes supplémentaires est plafonné : chaque génération
+crédite `max_rate` jeton (jusqu'à `burst`), chaque requête couverte en
+consomme un. Tant que moins de `min_samples` latences sont connues, aucune
+requête n'est couverte.
+"""
+import asyncio
+import queue
+import threading
+import time
+import types
+
+from plan_stream import LatencyStats
+
+
+class _Cancelled(Exception):
+    """Flux fermé parce que l'autre requête a gagné."""
+
+
+def collect_stream(stream, cancelled):
+    """Lit un flux de chat.completions et retourne un objet réponse équivalent (None si annulé)."""
+    content = []
+    finish_reason = None
+    usage = None
+    try:
+        for chunk in stream:
+            if cancelled.is_set():
+                raise _Cancelled()
+            if getattr(chunk, 'usage', None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            finish_reason = choice.finish_reason or finish_reason
+            if choice.delta.content:
+                content.append(choice.delta.content)
+    except _Cancelled:
+        return None
+    finally:
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+    message = types.SimpleNamespace(content=''.join(content))
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message, finish_reason=finish_reason)],
+                                 usage=usage)
+
+
+class HedgePolicy:
+    """Délai de couverture (percentile des latences), plafond du taux de couverture et compteurs."""
+
+    def __init__(self, percentile=95, max_rate=0.1, burst=10, min_samples=20, min_delay=0.5):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.burst = burst
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.latency = LatencyStats()
+        self._lock = threading.Lock()
+        self._budget = 0.0
+        self.requests = 0
+        self.hedged = 0
+        self.throttled = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+        self.cancelled = 0
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def delay(self):
+        """Délai (secondes) avant la requête de couverture, ou None si les latences sont encore inconnues."""
+        if self.latency.count < self.min_samples:
+            return None
+        return max(self.latency.percentile(self.percentile) / 1000, self.min_delay)
+
+    def _start(self):
+        with self._lock:
+            self.requests += 1
+            self._budget = min(self._budget + self.max_rate, self.burst)
+
+    def _admit(self):
+        """Réserve une requête de couverture si le plafond le permet."""
+        with self._lock:
+            if self._budget >= 1:
+                self._budget -= 1
+                self.hedged += 1
+                return True
+            self.throttled += 1
+            return False
+
+    def _finish(self, winner, started_at, primary_done_at):
+        # Latence de la requête principale ; si elle a perdu, la durée écoulée en est une borne inférieure
+        end = primary_done_at or time.monotonic()
+        self.latency.record((end - started_at) * 1000)
+        if winner == 1:
+            self._count('hedge_wins')
+        elif winner == 0:
+            self._count('primary_wins')
+
+    def completion(self, client, is_valid, **kwargs):
+        """chat.completions.create couvert (client OpenAI synchrone) ; retourne la réponse gagnante."""
+        self._start()
+        started_at = time.monotonic()
+        results = queue.Queue()
+        cancelled = [threading.Event(), threading.Event()]
+
+        def attempt(index):
+            try:
+                stream = client.chat.completions.create(stream=True, stream_options={'include_usage': True},
+                                                        **kwargs)
+                results.put((index, collect_stream(stream, cancelled[index]), None, time.monotonic()))
+            except Exception as e:
+                results.put((index, None, e, time.monotonic()))
+
+        threading.Thread(target=attempt, args=(0,), daemon=True).start()
+        running = {0}
+        timeout = self.delay()
+        winner, fallback, errors, primary_done_at = None, None, [], None
+        while running:
+            try:
+                index, response, error, done_at = results.get(timeout=timeout)
+            except queue.Empty:
+                # La requête principale dépasse le percentile : requête de couverture si le plafond le permet
+                timeout = None
+                if self._admit():
+                    threading.Thread(target=attempt, args=(1,), daemon=True).start()
+                    running.add(1)
+                continue
+            running.discard(index)
+            timeout = None
+            if index == 0:
+                primary_done_at = done_at
+            if error is not None:
+                errors.append(error)
+            elif is_valid(response):
+                winner = index
+                break
+            elif fallback is None:
+                fallback = response
+        for index in running:
+            cancelled[index].set()
+            self._count('cancelled')
+        self._finish(winner, started_at, primary_done_at)
+        if winner is not None:
+            return response
+        if fallback is not None:
+            return fallback
+        raise errors[0]
+
+    async def completion_async(self, client, is_valid, **kwargs):
+        """Équivalent de completion() pour un client AsyncOpenAI : la tâche perdante est annulée."""
+        self._start()
+        started_at = time.monotonic()
+        primary = asyncio.ensure_future(client.chat.completions.create(**kwargs))
+        tasks = {primary: 0}
+        delay = self.delay()
+        winner, fallback, errors, primary_done_at = None, None, [], None
+        try:
+            while tasks:
+                timeout = delay if len(tasks) == 1 and primary in tasks else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                delay = None
+                if not done:
+                    if self._admit():
+                        tasks[asyncio.ensure_future(client.chat.completions.create(**kwargs))] = 1
+                    continue
+                for task in done:
+                    index = tasks.pop(task)
+                    if index == 0:
+                        primary_done_at = time.monotonic()
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                    elif is_valid(task.result()):
+                        winner, response = index, task.result()
+                    elif fallback is None:
+                        fallback = task.result()
+                if winner is not None:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+                self._count('cancelled')
+        self._finish(winner, started_at, primary_done_at)
+        if winner is not None:
+            return response
+        if fallback is not None:
+            return fallback
+        raise errors[0]
+
+    def stats(self):
+        delay = self.delay()
+        with self._lock:
+            stats = {
+                'requests': self.requests,
+                'hedged': self.hedged,
+                'throttled': self.throttled,
+                'hedge_wins': self.hedge_wins,
+                'primary_wins': self.primary_wins,
+                'cancelled': self.cancelled,
+                'hedge_rate': round(self.hedged / self.requests, 4) if self.requests else 0.0,
+            }
+        stats['delay_ms'] = round(delay * 1000, 1) if delay is not None else None
+        stats['latency'] = self.latency.stats()
+        return stats
@@ -0,0 +1,158 @@
+"""Exécution des générations de plans en tâche de fond.
+
+Les tâches tournent dans un pool de threads borné. Leur état est enregistré
+dans un cache partagé (SQLite) pour que n'importe quel worker gunicorn puisse
+répondre aux requêtes de suivi, quel que soit le worker qui a lancé la tâche.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Levée quand le pool et la file d'attente sont saturés."""
+
+
+class JobManager:
+    """Pool de threads borné avec file d'attente limitée et délai maximal par tâche."""
+
+    def __init__(self, store, max_workers=4, max_queue=16, job_timeout=120, result_ttl=3600):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.job_timeout = job_timeout
+        self.result_ttl = result_ttl
+        self._executor = None
+        self._executor_pid = None
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    def _get_executor(self):
+        # Le pool est créé après le fork du worker gunicorn
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='generation')
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def submit(self, owner, fn, *args, on_finish=None, on_success=None, **kwargs):
+        """
+        Enregistre une tâche et retourne son identifiant, ou lève QueueFullError.
+        `on_finish` (optionnel) est appelé quand la tâche se termine, même si elle n'a pas pu démarrer.
+        `on_success(result)` (optionnel) n'est appelé que si la tâche a réussi dans son délai :
+        une tâche signalée en timeout n'a donc aucun effet (sauvegarde du plan, par exemple).
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFullError("Trop de générations en cours, veuillez réessayer dans quelques instants.")
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._save(job_id, {
+            'id': job_id,
+            'owner': owner,
+            'status': 'queued',
+            'created_at': now,
+            'deadline': now + self.job_timeout,
+        })
+        with self._lock:
+            self._pending += 1
+            self.submitted += 1
+        try:
+            self._get_executor().submit(self._run, job_id, fn, args, kwargs, on_finish, on_success)
+        except Exception:
+            self._release()
+            raise
+        return job_id
+
+    def _run(self, job_id, fn, args, kwargs, on_finish=None, on_success=None):
+        try:
+            job = self.store.get(job_id) or {'id': job_id}
+            if time.time() > job.get('deadline', float('inf')):
+                # Resté trop longtemps en file d'attente
+                self._finish(job, 'timeout', error="Délai de génération dépassé")
+                return
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+            self._save(job_id, job)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                print(f"❌ Erreur dans la tâche {job_id}: {e}")
+                self._finish(job, 'failed', error=str(e))
+                return
+            if time.time() > job.get('deadline', float('inf')):
+                self._finish(job, 'timeout', error="Délai de génération dépassé")
+                return
+            if on_success is not None:
+                try:
+                    on_success(result)
+                except Exception as e:
+                    print(f"❌ Erreur à la fin de la tâche {job_id}: {e}")
+                    self._finish(job, 'failed', error=str(e))
+                    return
+            self._finish(job, 'done', result=result)
+        finally:
+            self._release()
+            if on_finish is not None:
+                on_finish()
+
+    def _finish(self, job, status, result=None, error=None):
+        job['status'] = status
+        job['finished_at'] = time.time()
+        if result is not None:
+            job['result'] = result
+        if error is not None:
+            job['error'] = error
+        self._save(job['id'], job)
+        with self._lock:
+            if status == 'done':
+                self.completed += 1
+            elif status == 'timeout':
+                self.timed_out += 1
+            else:
+                self.failed += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _save(self, job_id, job):
+        self.store.set(job_id, job, ttl=self.result_ttl)
+
+    def get(self, job_id):
+        """Retourne l'état d'une tâche ; une tâche dépassant son délai est signalée en timeout."""
+        job = self.store.get(job_id)
+        if job and job['status'] in ('queued', 'running') and time.time() > job.get('deadline', float('inf')):
+            job = dict(job, status='timeout', error="Délai de génération dépassé")
+        return job
+
+    def wait(self, job_id, timeout, interval=0.25):
+        """Attend (long-poll) que la tâche soit terminée, au plus `timeout` secondes."""
+        deadline = time.time() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job['status'] not in ('queued', 'running') or time.time() >= deadline:
+                return job
+            time.sleep(interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'capacity': self.max_workers + self.max_queue,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timed_out': self.timed_out,
+            }
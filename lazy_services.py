@@ -0,0 +1,52 @@
+"""Clients externes créés au premier usage.
+
+Importer l'application ne charge plus les SDK OpenAI et Firebase : chaque
+service est construit au premier accès (ou par le hook post_fork de
+gunicorn), une seule fois par processus. La durée de l'initialisation est
+mesurée et exposée sur /stats.
+"""
+import threading
+import time
+
+
+class LazyService:
+    """Valeur construite par `factory` au premier appel de get(), puis réutilisée."""
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._ready = False
+        self._value = None
+        self.init_ms = None
+        self.error = None
+
+    def get(self):
+        """Retourne le service (None si son initialisation a échoué)."""
+        if self._ready:
+            return self._value
+        with self._lock:
+            if not self._ready:
+                start = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    # Même comportement qu'un service non configuré : l'application continue sans lui
+                    print(f"❌ Initialisation de {self.name} impossible: {e}")
+                    self.error = str(e)
+                    self._value = None
+                self.init_ms = round((time.perf_counter() - start) * 1000, 1)
+                self._ready = True
+        return self._value
+
+    @property
+    def initialized(self):
+        return self._ready
+
+    def stats(self):
+        return {
+            'initialized': self._ready,
+            'available': self._value is not None,
+            'init_ms': self.init_ms,
+            'error': self.error,
+        }
@@ -0,0 +1,186 @@
+"""Générateur local de plans d'entraînement, sans appel à OpenAI.
+
+Construit un plan compressé ({"j": [{"d", "t", "e"}]}) sur 7 jours à partir
+des métadonnées de static/data/exercises.json (équipement, difficulté,
+catégorie, type de mesure) et des contraintes de l'utilisateur (durée
+maximale d'une séance, nombre maximal de jours). Le résultat est
+déterministe : un même profil donne toujours le même plan.
+"""
+import json
+import threading
+
+# Valeurs envoyées par le formulaire -> équipement du catalogue
+EQUIPMENT_ALIASES = {
+    'dumbbells': 'Haltères',
+    'pull-up bar': 'Barre de traction',
+    'resistance bands': 'Bandes de résistance',
+    'kettlebell': 'Kettlebell',
+    'jump rope': 'Corde à sauter',
+    'mat': 'Tapis',
+}
+# Équipement disponible en salle de sport (pas de piscine)
+GYM_EQUIPMENT = frozenset({
+    'Aucun', 'Haltères', 'Barre de traction', 'Barres parallèles', 'Bandes de résistance',
+    'Kettlebell', 'Corde à sauter', 'Tapis', 'Vélo',
+})
+
+LEVELS = {'beginner': 0, 'intermediate': 1, 'advanced': 2}
+CATALOGUE_LEVELS = {'Débutant': 0, 'Intermédiaire': 1, 'Avancé': 2}
+
+# Répartition des séances dans la semaine selon leur nombre
+WEEK_PATTERNS = {
+    1: (1,), 2: (1, 4), 3: (1, 3, 5), 4: (1, 2, 4, 5),
+    5: (1, 2, 3, 5, 6), 6: (1, 2, 3, 4, 5, 6), 7: (1, 2, 3, 4, 5, 6, 7),
+}
+# Séances en rotation : catégories dans l'ordre où les exercices sont choisis
+SESSION_TEMPLATES = (
+    ('Haut du corps', 'Core', 'Haut du corps', 'Cardio', 'Core', 'Haut du corps'),
+    ('Bas du corps', 'Cardio', 'Bas du corps', 'Core', 'Bas du corps', 'Flexibilité'),
+    ('Tout le corps', 'Cardio', 'Haut du corps', 'Bas du corps', 'Core', 'Flexibilité'),
+)
+
+# Paramètres par niveau : jours par défaut, durée par défaut, séries, répétitions, minutes de cardio
+DEFAULT_DAYS = (3, 4, 5)
+DEFAULT_DURATION = (30, 45, 60)
+SERIES = (2, 3, 4)
+REPETITIONS = (10, 12, 15)
+CARDIO_MINUTES = (10, 15, 20)
+MAX_EXERCISES = 6
+
+
+def available_equipment(gym, equipment_list):
+    """Équipement du catalogue accessible à l'utilisateur (salle de sport ou liste du formulaire)."""
+    if gym:
+        return GYM_EQUIPMENT
+    available = {'Aucun'}
+    for item in equipment_list or []:
+        item = str(item).strip()
+        available.add(EQUIPMENT_ALIASES.get(item.lower(), item))
+    return frozenset(available)
+
+
+def difficulty_level(difficulty):
+    """Niveau 0 (débutant) à 2 (avancé) ; intermédiaire par défaut."""
+    return LEVELS.get(str(difficulty or '').strip().lower(), 1)
+
+
+class LocalPlanGenerator:
+    """Génère des plans compressés à partir du catalogue d'exercices."""
+
+    def __init__(self, exercises, time_based_ids=()):
+        self.time_based_ids = frozenset(time_based_ids)
+        self._lock = threading.Lock()
+        self.generated = 0
+        self.fallbacks = 0
+        self.load(exercises)
+
+    def load(self, exercises):
+        """(Re)charge le catalogue d'exercices ; les exercices autorisés déjà calculés sont oubliés."""
+        catalogue = []
+        for exercise in exercises:
+            catalogue.append({
+                'id': exercise['id'],
+                'category': exercise.get('category', ''),
+                'level': CATALOGUE_LEVELS.get(exercise.get('difficulty'), 1),
+                'equipment': exercise.get('equipment', 'Aucun'),
+                'timed': exercise.get('measurement_type') == 'time' or exercise['id'] in self.time_based_ids,
+            })
+        with self._lock:
+            self.exercises = catalogue
+            # Équipement présent dans le catalogue : borne les clés du cache des exercices autorisés
+            self.equipment = frozenset(exercise['equipment'] for exercise in catalogue)
+            self._pools = {}
+
+    @classmethod
+    def from_file(cls, path, time_based_ids=()):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), time_based_ids)
+
+    def _pool(self, equipment, level):
+        """Exercices autorisés, par catégorie (mis en cache par équipement et niveau)."""
+        with self._lock:
+            # Même version du catalogue pour tout le calcul, même si load() le remplace entre-temps
+            exercises, known_equipment, pools = self.exercises, self.equipment, self._pools
+        # Les valeurs inconnues envoyées par le client ne créent pas de nouvelle entrée
+        key = (equipment & known_equipment, level)
+        pool = pools.get(key)
+        if pool is None:
+            pool = {}
+            candidates = [e for e in exercises if e['equipment'] in equipment and e['level'] <= level]
+            # Les exercices du niveau de l'utilisateur d'abord
+            candidates.sort(key=lambda e: (level - e['level'], e['id']))
+            for exercise in candidates:
+                pool.setdefault(exercise['category'], []).append(exercise)
+            with self._lock:
+                pools[key] = pool
+        return pool
+
+    @staticmethod
+    def _prescription(exercise, level):
+        """Séries et répétitions/minutes d'un exercice, avec sa durée estimée en minutes."""
+        if not exercise['timed']:
+            series = SERIES[level]
+            # Environ 1 min 30 par série, récupération comprise
+            return {"n": exercise['id'], "s": series, "r": REPETITIONS[level]}, series * 1.5
+        if exercise['category'] == 'Cardio':
+            minutes = CARDIO_MINUTES[level]
+            return {"n": exercise['id'], "s": 1, "m": minutes}, minutes
+        series = SERIES[level]
+        return {"n": exercise['id'], "s": series, "m": 1}, series * 2
+
+    def generate(self, gym, equipment_list, difficulty='intermediate',
+                 max_session_duration=None, max_workout_days=None):
+        """Retourne le plan compressé de la semaine pour ce profil."""
+        level = difficulty_level(difficulty)
+        pool = self._pool(available_equipment(gym, equipment_list), level)
+
+        day_count = DEFAULT_DAYS[level]
+        if max_workout_days:
+            day_count = min(max(int(max_workout_days), 1), 7)
+        budget = max_session_duration or DEFAULT_DURATION[level]
+
+        workout_days = WEEK_PATTERNS[day_count]
+        days = []
+        session_index = 0
+        for day in range(1, 8):
+            if day not in workout_days:
+                days.append({"d": day, "t": 0, "e": []})
+                continue
+            template = SESSION_TEMPLATES[session_index % len(SESSION_TEMPLATES)]
+            used = set()
+            exercises = []
+            duration = 0
+            for slot, category in enumerate(template):
+                candidates = pool.get(category)
+                if not candidates:
+                    continue
+                # Rotation dans la catégorie pour varier d'une séance à l'autre
+                start = session_index + slot
+                for offset in range(len(candidates)):
+                    exercise = candidates[(start + offset) % len(candidates)]
+                    if exercise['id'] not in used:
+                        break
+                else:
+                    continue
+                prescription, minutes = self._prescription(exercise, level)
+                if exercises and duration + minutes > budget:
+                    continue
+                used.add(exercise['id'])
+                exercises.append(prescription)
+                duration += minutes
+                if len(exercises) >= MAX_EXERCISES:
+                    break
+            days.append({"d": day, "t": 1, "e": exercises})
+            session_index += 1
+
+        with self._lock:
+            self.generated += 1
+        return {"j": days}
+
+    def record_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def stats(self):
+        with self._lock:
+            return {'generated': self.generated, 'fallbacks': self.fallbacks, 'pools': len(self._pools)}
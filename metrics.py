@@ -0,0 +1,300 @@
+"""Métriques Prometheus (compteurs et histogrammes) agrégées entre les workers gunicorn.
+
+Chaque worker enregistre ses mesures en mémoire (un verrou, une recherche
+dichotomique par observation) et écrit toutes les `flush_interval` secondes
+un instantané JSON dans `directory/<pid>.json`, depuis un thread de fond.
+L'endpoint /metrics additionne les instantanés de tous les workers.
+
+Quand un worker s'arrête (hook worker_exit de gunicorn) ou disparaît, son
+instantané est ajouté à `archive.json` : les compteurs restent croissants
+pour Prometheus malgré les redémarrages de workers.
+"""
+import asyncio
+import bisect
+import contextlib
+import fcntl
+import json
+import os
+import threading
+import time
+
+# Bornes (secondes) des histogrammes de durée
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEPENDENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+ARCHIVE = 'archive.json'
+
+
+class Counter:
+    """Compteur par combinaison de valeurs d'étiquettes."""
+
+    kind = 'counter'
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self._registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        with self._registry.lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        """Séries de l'instantané : étiquettes -> valeur."""
+        return {json.dumps(labels): value for labels, value in self._values.items()}
+
+
+class Histogram:
+    """Histogramme cumulatif (bornes fixes) par combinaison de valeurs d'étiquettes."""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=REQUEST_BUCKETS):
+        self._registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._registry.lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                # Un compteur par borne (non cumulés), +Inf, somme
+                series = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, *labelvalues):
+        """Mesure la durée du bloc ; la dernière étiquette reçoit « ok », « error » ou « cancelled »."""
+        start = time.perf_counter()
+        outcome = 'ok'
+        try:
+            yield
+        except asyncio.CancelledError:
+            outcome = 'cancelled'
+            raise
+        except BaseException:
+            outcome = 'error'
+            raise
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues, outcome)
+
+    def samples(self):
+        return {json.dumps(labels): list(series) for labels, series in self._values.items()}
+
+
+class Metrics:
+    """Registre des métriques d'un worker et agrégation des instantanés de tous les workers."""
+
+    def __init__(self, directory, prefix='', flush_interval=5.0, enabled=True):
+        self.directory = directory
+        self.prefix = prefix
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        # Vérification de _retired et écriture de l'instantané sous le même verrou (distinct de `lock`,
+        # pris par snapshot() et par chaque observation)
+        self._flush_lock = threading.Lock()
+        self._metrics = {}
+        self._callbacks = []
+        self._flusher_pid = None
+        self._retired = False
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    def counter(self, name, help, labelnames=()):
+        metric = self._metrics[self.prefix + name] = Counter(self, self.prefix + name, help, labelnames)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=REQUEST_BUCKETS):
+        metric = self._metrics[self.prefix + name] = Histogram(self, self.prefix + name, help, labelnames, buckets)
+        return metric
+
+    def counter_callback(self, name, help, labelnames, collect):
+        """Compteur lu à chaque instantané : `collect()` retourne {tuple de valeurs d'étiquettes: valeur}."""
+        self._callbacks.append((self.prefix + name, help, tuple(labelnames), collect))
+
+    # Instantanés par worker
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'{pid}.json')
+
+    def snapshot(self):
+        """Toutes les séries du worker courant, au format des fichiers d'instantané."""
+        with self.lock:
+            data = {metric.name: {'kind': metric.kind, 'help': metric.help, 'labels': metric.labelnames,
+                                  'buckets': getattr(metric, 'buckets', None), 'samples': metric.samples()}
+                    for metric in self._metrics.values()}
+        for name, help, labelnames, collect in self._callbacks:
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"⚠️ Métrique {name} indisponible: {e}")
+                continue
+            data[name] = {'kind': 'counter', 'help': help, 'labels': labelnames, 'buckets': None,
+                          'samples': {json.dumps(list(labels)): value for labels, value in values.items()}}
+        return data
+
+    def flush(self):
+        """Écrit l'instantané du worker courant (remplacement atomique du fichier), sauf après retire()."""
+        if not self.enabled:
+            return
+        with self._flush_lock:
+            if self._retired:
+                return
+            self._write()
+
+    def _write(self):
+        path = self._path(os.getpid())
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary, path)
+
+    def start(self):
+        """Démarre (une fois par processus) le thread qui écrit l'instantané du worker."""
+        if not self.enabled or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        threading.Thread(target=self._loop, name='metrics-flush', daemon=True).start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"⚠️ Écriture des métriques impossible: {e}")
+
+    @contextlib.contextmanager
+    def _archive_lock(self):
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _archive(self, pid):
+        """Ajoute l'instantané d'un worker arrêté à l'archive, puis le supprime (sous verrou)."""
+        path = self._path(pid)
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        archive_path = os.path.join(self.directory, ARCHIVE)
+        try:
+            with open(archive_path) as f:
+                archive = json.load(f)
+        except (OSError, ValueError):
+            archive = {}
+        _merge(archive, snapshot)
+        temporary = f'{archive_path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(archive, f)
+        os.replace(temporary, archive_path)
+        os.remove(path)
+
+    def retire(self):
+        """Archive l'instantané du worker courant (hook worker_exit)."""
+        if not self.enabled:
+            return
+        with self._flush_lock:
+            if self._retired:
+                return
+            self._write()
+            # Plus d'écriture après l'archivage : l'instantané serait compté deux fois. Une écriture du thread
+            # de fond déjà commencée s'est terminée avant (verrou) ; les suivantes verront le drapeau.
+            self._retired = True
+        with self._archive_lock():
+            self._archive(os.getpid())
+
+    def collect(self):
+        """Instantanés de tous les workers additionnés (celui du worker courant est à jour)."""
+        self.flush()
+        with self._archive_lock():
+            for name in os.listdir(self.directory):
+                pid = name[:-5]
+                if name.endswith('.json') and pid.isdigit() and not _alive(int(pid)):
+                    # Worker disparu sans passer par worker_exit
+                    self._archive(int(pid))
+            merged = {}
+            for name in sorted(os.listdir(self.directory)):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        _merge(merged, json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return merged
+
+    def render(self):
+        """Texte d'exposition Prometheus (version 0.0.4) de toutes les métriques agrégées."""
+        if not self.enabled:
+            return _render(self.snapshot())
+        return _render(self.collect())
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(target, snapshot):
+    for name, metric in snapshot.items():
+        current = target.setdefault(name, dict(metric, samples={}))
+        for labels, value in metric['samples'].items():
+            if labels not in current['samples']:
+                current['samples'][labels] = value
+            elif metric['kind'] == 'histogram':
+                current['samples'][labels] = [a + b for a, b in zip(current['samples'][labels], value)]
+            else:
+                current['samples'][labels] += value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _render(metrics):
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels_json in sorted(metric['samples']):
+            labels = json.loads(labels_json)
+            value = metric['samples'][labels_json]
+            if metric['kind'] != 'histogram':
+                lines.append(f"{name}{_labels(metric['labels'], labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric['buckets']) + ['+Inf'], value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(metric['labels'], labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric['labels'], labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(metric['labels'], labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
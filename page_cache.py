@@ -0,0 +1,157 @@
+"""Cache des pages rendues (accueil, pages statiques, blog).
+
+Le HTML produit par une vue est gardé en mémoire, indexé par la vue, ses
+arguments et les seuls paramètres de requête qu'elle lit (les autres, comme
+les paramètres de suivi, ne créent pas de nouvelle entrée), et par une
+variante : anonyme, ou propre à l'utilisateur connecté (l'en-tête affiche
+son nom et sa photo). Les réponses portent un ETag et un
+Last-Modified ; un navigateur qui a déjà la page reçoit un 304 sans corps.
+Tout le cache est vidé quand un template ou le contenu du blog change.
+"""
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+
+from flask import make_response, request, session
+
+from cache import LRUCache
+
+ETAG_LENGTH = 32
+
+
+def _pack_page(page):
+    etag, body = page
+    return etag.encode('ascii') + body
+
+
+def _unpack_page(data):
+    return data[:ETAG_LENGTH].decode('ascii'), data[ETAG_LENGTH:]
+
+
+class PageCache:
+    """Pages HTML rendues, invalidées quand les templates ou le contenu changent."""
+
+    def __init__(self, template_folder, content_version=None, max_entries=1000, max_bytes=None,
+                 check_interval=2.0, enabled=True):
+        self.template_folder = template_folder
+        # Fonction retournant (jeton de version, date de modification) du contenu affiché (blog)
+        self.content_version = content_version
+        self.check_interval = check_interval
+        self.enabled = enabled
+        self.pages = LRUCache(max_entries=max_entries, max_bytes=max_bytes, negative_ttl=0,
+                              encode=_pack_page, decode=_unpack_page)
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self.version = None
+        self.last_modified = None
+        self.invalidations = 0
+        self.not_modified = 0
+        self.bypassed = 0
+        self.refresh(force=True)
+
+    def _current_version(self):
+        templates = []
+        for directory, _, files in os.walk(self.template_folder):
+            for name in files:
+                path = os.path.join(directory, name)
+                templates.append((path, os.stat(path).st_mtime))
+        templates.sort()
+        last_modified = max((mtime for _, mtime in templates), default=0.0)
+        content = None
+        if self.content_version is not None:
+            content, content_mtime = self.content_version()
+            last_modified = max(last_modified, content_mtime)
+        return (tuple(templates), content), last_modified
+
+    def refresh(self, force=False):
+        """Vide le cache si un template ou le contenu a changé (vérification au plus toutes les check_interval secondes)."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            version, last_modified = self._current_version()
+        except OSError as e:
+            print(f"⚠️ Impossible de vérifier les templates: {e}")
+            return
+        with self._lock:
+            if version == self.version:
+                return
+            if self.version is not None:
+                self.invalidations += 1
+            self.version = version
+            self.last_modified = last_modified
+        self.pages.clear()
+
+    @staticmethod
+    def variant(user):
+        """Variante de la page : anonyme, ou empreinte des informations de l'utilisateur affichées."""
+        if not user:
+            return 'anonymous'
+        return hashlib.sha256(json.dumps(user, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def key(variant, query):
+        """Clé d'une page : variante, vue, arguments de la vue et paramètres `query` ({nom: type}) convertis.
+
+        L'hôte n'en fait pas partie (le client le choisit) : les pages n'utilisent que l'URL canonique du site.
+        """
+        view_args = sorted((request.view_args or {}).items())
+        params = [(name, request.args.get(name, type=kind)) for name, kind in sorted(query.items())]
+        return json.dumps([variant, request.endpoint, view_args, params], default=str)
+
+    def cached(self, view=None, *, query=None):
+        """Décorateur de vue : sert la page depuis le cache ; seules les pages HTML (str) sont gardées.
+
+        `query` ({nom: type}) liste les paramètres de requête lus par la vue : @page_cache.cached(query={'page': int}).
+        """
+        if view is None:
+            return functools.partial(self.cached, query=query)
+        query = query or {}
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return view(*args, **kwargs)
+            self.refresh()
+            variant = self.variant(session.get('user'))
+            key = self.key(variant, query)
+            page = self.pages.get(key)
+            if page is None:
+                result = view(*args, **kwargs)
+                if not isinstance(result, str):
+                    # Redirection ou réponse particulière : pas mise en cache
+                    with self._lock:
+                        self.bypassed += 1
+                    return result
+                body = result.encode('utf-8')
+                page = (hashlib.sha256(body).hexdigest()[:ETAG_LENGTH], body)
+                self.pages.set(key, page)
+
+            etag, body = page
+            response = make_response(body)
+            response.set_etag(etag)
+            response.last_modified = self.last_modified
+            # Revalidation à chaque visite (304 si inchangée) ; jamais partagée pour un utilisateur connecté
+            response.headers['Cache-Control'] = 'no-cache' if variant == 'anonymous' else 'private, no-cache'
+            response.vary.add('Cookie')
+            response.make_conditional(request)
+            if response.status_code == 304:
+                with self._lock:
+                    self.not_modified += 1
+            return response
+        return wrapper
+
+    def stats(self):
+        stats = self.pages.stats()
+        with self._lock:
+            stats.update({
+                'enabled': self.enabled,
+                'invalidations': self.invalidations,
+                'not_modified': self.not_modified,
+                'bypassed': self.bypassed,
+            })
+        return stats
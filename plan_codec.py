@@ -0,0 +1,206 @@
+"""Format binaire compact et versionné des plans d'entraînement.
+
+Même contenu que compress_workout_plan (jour, type, exercice, séries,
+répétitions, minutes) mais sérialisé en entiers varint au lieu de JSON :
+
+    version (1 octet) | nombre de jours (varint) | jours...
+
+    jour      : 1 octet = id du jour (bits 0-2, 0 = nom libre) | séance (bit 3)
+                [nom libre] [nombre d'exercices (varint) exercices...]
+    exercice  : 1 octet = nom libre (bit 0) | type des séries (bits 1-2)
+                | des répétitions (bits 3-4) | des minutes (bits 5-6)
+                id de l'exercice (varint) ou nom libre, puis les valeurs
+
+Une valeur est absente (0), un entier positif (1, varint) ou un texte JSON
+(2) pour les valeurs inattendues renvoyées par le modèle (« 10-12 », 0.5...).
+Un texte est stocké sous la forme longueur (varint) + UTF-8. La version 0
+contient le plan tel quel en JSON, pour les plans qui n'ont pas la forme
+attendue.
+"""
+import json
+
+FORMAT_JSON = 0
+FORMAT_VERSION = 1
+
+_ABSENT, _UINT, _TEXT = 0, 1, 2
+_FREE_TEXT_NAME = 0x01
+_WORKOUT = 0x08
+
+# Varints précalculés pour les petites valeurs (séries, répétitions, ids)
+_VARINTS = [bytes([i]) if i < 0x80 else bytes([(i & 0x7f) | 0x80, i >> 7]) for i in range(256)]
+
+
+def _write_varint(out, value):
+    if value < 256:
+        out += _VARINTS[value]
+        return
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    value = byte & 0x7f
+    shift = 7
+    while True:
+        pos += 1
+        byte = data[pos]
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos + 1
+        shift += 7
+
+
+def _write_text(out, text):
+    raw = text.encode('utf-8')
+    _write_varint(out, len(raw))
+    out += raw
+
+
+def _read_text(data, pos):
+    length, pos = _read_varint(data, pos)
+    end = pos + length
+    return bytes(data[pos:end]).decode('utf-8'), end
+
+
+def _value_kind(value):
+    if value is None:
+        return _ABSENT
+    if type(value) is int and value >= 0:
+        return _UINT
+    return _TEXT
+
+
+class PlanCodec:
+    """Encode/décode les plans ({"jours": [...]}) au format binaire versionné."""
+
+    def __init__(self, exercise_mapping, day_mapping):
+        # Tables de correspondance calculées une seule fois
+        self.exercise_ids = {name: exercise_id for exercise_id, name in exercise_mapping.items()}
+        self.day_ids = {name: day_id for day_id, name in day_mapping.items() if 0 < day_id < 8}
+        self.exercise_names = dict(exercise_mapping)
+        self.day_names = [day_mapping.get(day_id, str(day_id)) for day_id in range(8)]
+
+    def encode(self, plan):
+        """Retourne le plan encodé en bytes (version 0 si le plan n'a pas la forme attendue)."""
+        if isinstance(plan, dict) and isinstance(plan.get('jours'), list):
+            try:
+                return self._encode_v1(plan['jours'])
+            except (AttributeError, TypeError):
+                pass
+        return bytes([FORMAT_JSON]) + json.dumps(plan, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def _encode_v1(self, days):
+        exercise_ids = self.exercise_ids
+        day_ids = self.day_ids
+        out = bytearray([FORMAT_VERSION])
+        _write_varint(out, len(days))
+        for day in days:
+            day_name = day.get('nomJour', '')
+            day_id = day_ids.get(day_name, 0)
+            workout = day.get('type') == 'workout'
+            out.append(day_id | (_WORKOUT if workout else 0))
+            if not day_id:
+                _write_text(out, str(day_name))
+            if not workout:
+                continue
+            exercises = day.get('exercices') or []
+            _write_varint(out, len(exercises))
+            for exercise in exercises:
+                name = exercise.get('nom', '')
+                exercise_id = exercise_ids.get(name)
+                series = exercise.get('series', 0)
+                reps = exercise.get('repetitions')
+                minutes = exercise.get('duree_minutes')
+                series_kind = _value_kind(series)
+                reps_kind = _value_kind(reps)
+                minutes_kind = _value_kind(minutes)
+                out.append((0 if exercise_id is not None else _FREE_TEXT_NAME)
+                           | series_kind << 1 | reps_kind << 3 | minutes_kind << 5)
+                if exercise_id is not None:
+                    _write_varint(out, exercise_id)
+                else:
+                    _write_text(out, str(name))
+                for value, kind in ((series, series_kind), (reps, reps_kind), (minutes, minutes_kind)):
+                    if kind == _UINT:
+                        _write_varint(out, value)
+                    elif kind == _TEXT:
+                        _write_text(out, json.dumps(value, ensure_ascii=False, separators=(',', ':')))
+        return bytes(out)
+
+    def decode(self, data):
+        """Retourne le plan décodé ; lève ValueError pour une version inconnue ou des données tronquées."""
+        if not data:
+            raise ValueError("Plan binaire vide")
+        version = data[0]
+        if version == FORMAT_JSON:
+            return json.loads(bytes(data[1:]).decode('utf-8'))
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Version de plan binaire inconnue : {version}")
+        try:
+            return self._decode_v1(data)
+        except IndexError:
+            raise ValueError("Plan binaire tronqué") from None
+
+    def _decode_v1(self, data):
+        exercise_names = self.exercise_names
+        day_names = self.day_names
+        day_count, pos = _read_varint(data, 1)
+        days = []
+        for _ in range(day_count):
+            header = data[pos]
+            pos += 1
+            day_id = header & 0x07
+            if day_id:
+                day_name = day_names[day_id]
+            else:
+                day_name, pos = _read_text(data, pos)
+            exercises = []
+            workout = header & _WORKOUT
+            if workout:
+                exercise_count, pos = _read_varint(data, pos)
+                for _ in range(exercise_count):
+                    flags = data[pos]
+                    pos += 1
+                    if flags & _FREE_TEXT_NAME:
+                        name, pos = _read_text(data, pos)
+                    else:
+                        exercise_id, pos = _read_varint(data, pos)
+                        name = exercise_names.get(exercise_id, str(exercise_id))
+                    values = []
+                    for shift in (1, 3, 5):
+                        kind = (flags >> shift) & 0x03
+                        if kind == _UINT:
+                            value, pos = _read_varint(data, pos)
+                        elif kind == _TEXT:
+                            text, pos = _read_text(data, pos)
+                            value = json.loads(text)
+                        else:
+                            value = None
+                        values.append(value)
+                    exercises.append({
+                        "nom": name,
+                        "series": values[0] if values[0] is not None else 0,
+                        "repetitions": values[1],
+                        "duree_minutes": values[2]
+                    })
+            days.append({
+                "nomJour": day_name,
+                "type": "workout" if workout else "rest",
+                "exercices": exercises
+            })
+        return {"jours": days}
+
+    def encode_many(self, plans):
+        """Encode une liste de plans (liste de bytes dans le même ordre)."""
+        encode = self.encode
+        return [encode(plan) for plan in plans]
+
+    def decode_many(self, items):
+        """Décode une liste de plans encodés (liste de plans dans le même ordre)."""
+        decode = self.decode
+        return [decode(data) for data in items]
@@ -0,0 +1,91 @@
+"""Lecture incrémentale d'un plan compressé reçu en streaming.
+
+Le modèle renvoie le plan au format {"j":[{"d":1,"t":1,"e":[...]}, ...]}.
+Le parseur reçoit les morceaux de texte au fil de l'eau et restitue chaque
+jour dès que son objet JSON est refermé, sans attendre la fin de la réponse.
+"""
+import json
+import threading
+from collections import deque
+
+
+class IncrementalPlanParser:
+    """Découpe le flux JSON et renvoie les objets « jour » complets."""
+
+    # Profondeur des objets jour : { (racine) -> [ (tableau j) -> { (jour)
+    DAY_DEPTH = 3
+
+    def __init__(self):
+        self.text = []
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._capturing = False
+
+    def feed(self, chunk):
+        """Ajoute un morceau de texte et retourne la liste des jours terminés."""
+        days = []
+        self.text.append(chunk)
+        for char in chunk:
+            if self._capturing:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+                if char == '{' and self._depth == self.DAY_DEPTH:
+                    self._capturing = True
+                    self._buffer = ['{']
+            elif char in '}]':
+                if char == '}' and self._depth == self.DAY_DEPTH and self._capturing:
+                    self._capturing = False
+                    try:
+                        days.append(json.loads(''.join(self._buffer)))
+                    except json.JSONDecodeError:
+                        pass
+                self._depth -= 1
+        return days
+
+    def full_text(self):
+        return ''.join(self.text)
+
+
+class LatencyStats:
+    """Conserve les dernières mesures de latence (en ms) et calcule des percentiles."""
+
+    def __init__(self, size=500):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, value_ms):
+        with self._lock:
+            self._samples.append(value_ms)
+            self.count += 1
+
+    def percentile(self, pct):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return round(samples[index], 1)
+
+    def stats(self):
+        return {
+            'count': self.count,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+        }
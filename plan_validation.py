@@ -0,0 +1,365 @@
+"""Validation et réparation des plans compressés renvoyés par le modèle.
+
+La réponse est demandée au format JSON contraint par un schéma (j/d/t/e/n/s/r/m).
+Si elle est malgré tout invalide ou tronquée (limite de tokens), le texte est
+coupé après la dernière valeur complète et les tableaux ouverts sont
+refermés ; les exercices inconnus sont retirés. Seuls les jours manquants
+sont redemandés au modèle, puis les jours encore absents deviennent des jours
+de repos.
+"""
+import json
+import threading
+
+DAYS = range(1, 8)
+
+
+def build_plan_response_format(exercise_ids):
+    """response_format OpenAI (json_schema strict) correspondant au format compressé."""
+    exercise = {
+        "type": "object",
+        "properties": {
+            "n": {"type": "integer", "enum": sorted(exercise_ids)},
+            "s": {"type": "integer"},
+            "r": {"type": ["integer", "null"]},
+            "m": {"type": ["number", "null"]},
+        },
+        "required": ["n", "s", "r", "m"],
+        "additionalProperties": False,
+    }
+    day = {
+        "type": "object",
+        "properties": {
+            "d": {"type": "integer", "enum": list(DAYS)},
+            "t": {"type": "integer", "enum": [0, 1]},
+            "e": {"type": "array", "items": exercise},
+        },
+        "required": ["d", "t", "e"],
+        "additionalProperties": False,
+    }
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "plan_compresse",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {"j": {"type": "array", "items": day}},
+                "required": ["j"],
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+def close_truncated_json(text):
+    """
+    Coupe le texte après la dernière valeur complète et referme les objets/tableaux ouverts.
+    Retourne (texte réparé, nombre de niveaux refermés), ou None si rien n'est récupérable.
+    """
+    stack = []
+    in_string = False
+    escape = False
+    cut = None
+    closers = ''
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char == '{':
+            stack.append('}')
+        elif char == '[':
+            stack.append(']')
+        elif char in '}]':
+            if not stack or stack[-1] != char:
+                break
+            stack.pop()
+            cut = index + 1
+            closers = ''.join(reversed(stack))
+            if not stack:
+                break
+    if cut is None:
+        return None
+    return text[:cut] + closers, len(closers)
+
+
+def _as_number(value):
+    """Nombre strictement positif (int si possible) ou None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        try:
+            value = float(value.strip())
+        except ValueError:
+            return None
+    if not isinstance(value, (int, float)) or value <= 0:
+        return None
+    return int(value) if float(value).is_integer() else value
+
+
+class PlanCheck:
+    """Résultat de la validation d'une réponse : jours valides et jours à redemander."""
+
+    def __init__(self, days, reask, repaired=False, dropped=0):
+        self.days = days
+        self.reask = reask
+        self.repaired = repaired
+        self.dropped = dropped
+
+
+class PlanValidator:
+    """Valide, répare et complète les plans compressés."""
+
+    def __init__(self, exercise_ids, time_based_ids=()):
+        self.exercise_ids = frozenset(exercise_ids)
+        self.time_based_ids = frozenset(time_based_ids)
+        self.response_format = build_plan_response_format(self.exercise_ids)
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.repaired = 0
+        self.dropped_exercises = 0
+        self.reasks = 0
+        self.rest_days_filled = 0
+
+    def _count(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def validate_day(self, day):
+        """Retourne (jour normalisé ou None, nombre d'exercices retirés)."""
+        if not isinstance(day, dict):
+            return None, 0
+        day_id = _as_number(day.get('d'))
+        if day_id not in DAYS:
+            return None, 0
+        if _as_number(day.get('t')) != 1:
+            return {"d": day_id, "t": 0, "e": []}, 0
+
+        exercises = []
+        dropped = 0
+        raw_exercises = day.get('e')
+        for exercise in raw_exercises if isinstance(raw_exercises, list) else []:
+            exercise_id = _as_number(exercise.get('n')) if isinstance(exercise, dict) else None
+            if exercise_id not in self.exercise_ids:
+                dropped += 1
+                continue
+            fixed = {"n": exercise_id, "s": _as_number(exercise.get('s')) or 3}
+            repetitions = _as_number(exercise.get('r'))
+            minutes = _as_number(exercise.get('m'))
+            if repetitions is not None:
+                fixed["r"] = repetitions
+            if minutes is not None:
+                fixed["m"] = minutes
+            if repetitions is None and minutes is None:
+                if exercise_id in self.time_based_ids:
+                    fixed["m"] = 1
+                else:
+                    fixed["r"] = 10
+            exercises.append(fixed)
+        if dropped:
+            self._count('dropped_exercises', dropped)
+        return {"d": day_id, "t": 1, "e": exercises}, dropped
+
+    def check(self, text, truncated=False):
+        """Analyse le texte d'une réponse et détermine les jours à redemander."""
+        self._count('checked')
+        text = (text or '').strip()
+        if text.startswith('```'):
+            # Réponse entourée d'un bloc de code malgré les consignes
+            text = text.split('\n', 1)[1] if '\n' in text else ''
+            if text.rstrip().endswith('```'):
+                text = text.rstrip()[:-3]
+        repaired = False
+        partial_last_day = False
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            closed = close_truncated_json(text)
+            data = None
+            if closed is not None:
+                try:
+                    data = json.loads(closed[0])
+                except json.JSONDecodeError:
+                    data = None
+                # Plus de deux niveaux refermés ({"j":[ ) : le dernier jour a été coupé en cours de route
+                partial_last_day = closed[1] > 2
+            repaired = truncated = True
+
+        raw_days = data.get('j') if isinstance(data, dict) else None
+        if partial_last_day and isinstance(raw_days, list) and raw_days:
+            raw_days = raw_days[:-1]
+        days = {}
+        dropped = 0
+        emptied = []
+        for raw_day in raw_days if isinstance(raw_days, list) else []:
+            day, day_dropped = self.validate_day(raw_day)
+            dropped += day_dropped
+            if day is None or day['d'] in days:
+                continue
+            if day['t'] == 1 and not day['e']:
+                # Séance dont tous les exercices étaient invalides
+                emptied.append(day['d'])
+                continue
+            days[day['d']] = day
+        if repaired or dropped:
+            self._count('repaired')
+
+        # Réponse tronquée ou vide : les jours absents n'ont pas été générés.
+        # Réponse complète : les jours absents sont des jours de repos.
+        if truncated or not days:
+            reask = [day_id for day_id in DAYS if day_id not in days]
+        else:
+            reask = sorted(emptied)
+        return PlanCheck(days, reask, repaired or bool(dropped), dropped)
+
+    def merge(self, check, text, wanted):
+        """Ajoute au plan les jours demandés présents dans une réponse de relance."""
+        extra = self.check(text, truncated=True)
+        for day_id, day in extra.days.items():
+            if day_id in wanted:
+                check.days[day_id] = day
+        check.reask = [day_id for day_id in check.reask if day_id not in check.days]
+        return check
+
+    def complete(self, days, max_workout_days=None):
+        """Plan final sur 7 jours ; les jours absents (ou au-delà du maximum de séances) sont des jours de repos."""
+        plan = []
+        workouts = 0
+        for day_id in DAYS:
+            day = days.get(day_id)
+            if day is not None and day['t'] == 1 and max_workout_days and workouts >= max_workout_days:
+                day = None
+            if day is None:
+                self._count('rest_days_filled')
+                day = {"d": day_id, "t": 0, "e": []}
+            elif day['t'] == 1:
+                workouts += 1
+            plan.append(day)
+        return {"j": plan}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'checked': self.checked,
+                'repaired': self.repaired,
+                'dropped_exercises': self.dropped_exercises,
+                'reasks': self.reasks,
+                'rest_days_filled': self.rest_days_filled,
+            }
+
+
+def reask_prompt(check, wanted):
+    """Message de relance demandant uniquement les jours manquants."""
+    known = {"j": [check.days[day_id] for day_id in sorted(check.days)]}
+    return (
+        f"Le programme suivant est incomplet : {json.dumps(known, separators=(',', ':'))}\n"
+        f"Générez UNIQUEMENT les jours {', '.join(str(day_id) for day_id in wanted)} (d), "
+        f"dans le même format JSON compressé, en restant cohérent avec les jours déjà prévus."
+    )
+
+
+def is_plan_json(response):
+    """Réponse dont le contenu est un JSON de plan analysable (critère de victoire d'une requête couverte)."""
+    try:
+        data = json.loads(response.choices[0].message.content or '')
+    except (json.JSONDecodeError, TypeError):
+        return False
+    return isinstance(data, dict) and isinstance(data.get('j'), list) and bool(data['j'])
+
+
+def request_validated_plan(client, messages, validator, max_reasks=1, max_workout_days=None, usage=None,
+                           hedge=None, **create_kwargs):
+    """
+    Demande un plan au modèle (client OpenAI ou équivalent), le répare et ne redemande que les
+    jours manquants. Retourne le plan compressé complet sur 7 jours.
+    `usage` (optionnel) reçoit record(response.usage, finish_reason) après chaque appel.
+    `hedge` (optionnel, HedgePolicy) couvre la première requête par une seconde si elle tarde.
+    """
+    if hedge is not None:
+        response = hedge.completion(client, is_plan_json, messages=messages,
+                                    response_format=validator.response_format, **create_kwargs)
+    else:
+        response = client.chat.completions.create(
+            messages=messages,
+            response_format=validator.response_format,
+            **create_kwargs
+        )
+    choice = response.choices[0]
+    if usage is not None:
+        usage.record(response.usage, choice.finish_reason)
+    check = validator.check(choice.message.content, truncated=choice.finish_reason == 'length')
+    return complete_plan(client, messages, validator, check, max_reasks, max_workout_days, usage, **create_kwargs)
+
+
+def _days_to_reask(check, max_workout_days=None):
+    """Jours à redemander, sauf si le maximum de séances est déjà atteint."""
+    if max_workout_days:
+        # Inutile de redemander des séances au-delà du maximum de jours d'entraînement
+        workouts = sum(1 for day in check.days.values() if day['t'] == 1)
+        if workouts >= max_workout_days:
+            return []
+    return check.reask
+
+
+def _final_plan(validator, check, max_workout_days=None):
+    plan = validator.complete(check.days, max_workout_days)
+    if not any(day['t'] == 1 for day in plan['j']):
+        raise ValueError("Le plan généré ne contient aucun jour d'entraînement")
+    return plan
+
+
+def complete_plan(client, messages, validator, check, max_reasks=1, max_workout_days=None, usage=None,
+                  **create_kwargs):
+    """Redemande les jours manquants d'une réponse validée puis complète la semaine avec des jours de repos."""
+    for _ in range(max_reasks):
+        wanted = _days_to_reask(check, max_workout_days)
+        if not wanted:
+            break
+        validator._count('reasks')
+        followup = client.chat.completions.create(
+            messages=list(messages) + [{"role": "user", "content": reask_prompt(check, wanted)}],
+            response_format=validator.response_format,
+            **create_kwargs
+        )
+        if usage is not None:
+            usage.record(followup.usage, followup.choices[0].finish_reason)
+        check = validator.merge(check, followup.choices[0].message.content, set(wanted))
+    return _final_plan(validator, check, max_workout_days)
+
+
+async def request_validated_plan_async(client, messages, validator, max_reasks=1, max_workout_days=None,
+                                       usage=None, hedge=None, **create_kwargs):
+    """Équivalent de request_validated_plan pour un client AsyncOpenAI."""
+    if hedge is not None:
+        response = await hedge.completion_async(client, is_plan_json, messages=messages,
+                                                response_format=validator.response_format, **create_kwargs)
+    else:
+        response = await client.chat.completions.create(
+            messages=messages,
+            response_format=validator.response_format,
+            **create_kwargs
+        )
+    choice = response.choices[0]
+    if usage is not None:
+        usage.record(response.usage, choice.finish_reason)
+    check = validator.check(choice.message.content, truncated=choice.finish_reason == 'length')
+    for _ in range(max_reasks):
+        wanted = _days_to_reask(check, max_workout_days)
+        if not wanted:
+            break
+        validator._count('reasks')
+        followup = await client.chat.completions.create(
+            messages=list(messages) + [{"role": "user", "content": reask_prompt(check, wanted)}],
+            response_format=validator.response_format,
+            **create_kwargs
+        )
+        if usage is not None:
+            usage.record(followup.usage, followup.choices[0].finish_reason)
+        check = validator.merge(check, followup.choices[0].message.content, set(wanted))
+    return _final_plan(validator, check, max_workout_days)
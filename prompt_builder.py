@@ -0,0 +1,144 @@
+"""Construction du prompt de génération avec un budget de tokens.
+
+Les parties fixes du prompt (format, légende, règles) sont construites une
+seule fois. Seuls les exercices accessibles à l'utilisateur (équipement,
+niveau) sont envoyés, et max_tokens est calculé à partir du nombre de jours
+d'entraînement demandés pour éviter les réponses tronquées.
+"""
+import threading
+
+from local_planner import CATALOGUE_LEVELS, available_equipment, difficulty_level
+
+# Estimation des tokens de la réponse (format strict avec "r":null / "m":null)
+TOKENS_PER_EXERCISE = 20
+TOKENS_PER_WORKOUT_DAY = 15
+TOKENS_PER_REST_DAY = 15
+TOKENS_OVERHEAD = 20
+MAX_EXERCISES_PER_DAY = 8
+# Marge de sécurité sur l'estimation
+TOKEN_MARGIN = 1.25
+
+# Partie fixe du prompt : format, légende et règles
+FORMAT_INSTRUCTIONS = (
+    "Format JSON OBLIGATOIRE (sans explication, sans ```json):\n"
+    '{"j":[{"d":1,"t":1,"e":[{"n":1,"s":3,"r":12},{"n":4,"s":3,"m":1}]},{"d":2,"t":0,"e":[]}]}\n\n'
+    "Légende: j=jours, d=jour(1-7), t=type(1=workout,0=rest), e=exercices, n=nom(ID), s=séries, r=répétitions, m=minutes\n"
+    "RÈGLES: Pour les exercices mesurés en TEMPS, utilisez 'm' (minutes). Pour les autres, utilisez 'r' (répétitions).\n"
+    "Donnez les 7 jours. RETOURNEZ SEULEMENT LE JSON."
+)
+
+
+class PromptBuilder:
+    """Prompt de génération filtré selon l'équipement et le niveau de l'utilisateur."""
+
+    def __init__(self, exercises, time_based_ids=()):
+        self.time_based_ids = frozenset(time_based_ids)
+        self._lock = threading.Lock()
+        self.load(exercises)
+
+    def load(self, exercises):
+        """(Re)charge le catalogue d'exercices ; les textes déjà construits sont oubliés."""
+        catalogue = [
+            (
+                exercise['id'],
+                exercise['name'],
+                exercise.get('equipment', 'Aucun'),
+                CATALOGUE_LEVELS.get(exercise.get('difficulty'), 1),
+                exercise.get('measurement_type') == 'time' or exercise['id'] in self.time_based_ids,
+            )
+            for exercise in sorted(exercises, key=lambda e: e['id'])
+        ]
+        with self._lock:
+            self.exercises = catalogue
+            # Équipement présent dans le catalogue : borne les clés du cache des textes
+            self.equipment = frozenset(exercise[2] for exercise in catalogue)
+            self._catalogues = {}
+
+    def catalogue(self, gym, equipment_list, difficulty):
+        """Textes (liste des exercices, exercices en temps) pour ce profil, mis en cache par équipement et niveau."""
+        # Les valeurs inconnues envoyées par le client ne créent pas de nouvelle entrée
+        with self._lock:
+            # Même version du catalogue pour tout le calcul, même si load() le remplace entre-temps
+            exercises, known_equipment, catalogues = self.exercises, self.equipment, self._catalogues
+        key = (available_equipment(gym, equipment_list) & known_equipment, difficulty_level(difficulty))
+        texts = catalogues.get(key)
+        if texts is None:
+            equipment, level = key
+            eligible = [e for e in exercises if e[2] in equipment and e[3] <= level]
+            exercise_list = "\n".join(f"{exercise_id}: {name}" for exercise_id, name, _, _, _ in eligible)
+            time_list = ", ".join(str(exercise_id) for exercise_id, _, _, _, timed in eligible if timed)
+            texts = (exercise_list, time_list)
+            with self._lock:
+                catalogues[key] = texts
+        return texts
+
+    def build(self, height, weight, age, gym, equipment_list, difficulty,
+              max_session_duration=None, max_workout_days=None):
+        """Prompt envoyé à OpenAI pour un profil utilisateur."""
+        if gym:
+            equipment_text = "en salle de sport avec accès à une grande variété d'équipements"
+        elif equipment_list:
+            equipment_text = f"à domicile avec : {', '.join(equipment_list)}"
+        else:
+            equipment_text = "à domicile sans équipement"
+
+        constraints = []
+        if max_session_duration:
+            constraints.append(f"durée maximale de session: {max_session_duration} minutes")
+        if max_workout_days:
+            constraints.append(f"maximum {max_workout_days} jours d'entraînement par semaine")
+        constraints_text = f" Contraintes: {', '.join(constraints)}." if constraints else ""
+
+        exercise_list, time_list = self.catalogue(gym, equipment_list, difficulty)
+        time_text = f"Exercices mesurés en TEMPS (IDs): {time_list}\n\n" if time_list else ""
+        return (
+            f"Créez un programme d'entraînement pour: {age} ans, {height}cm, {weight}kg, {equipment_text}, "
+            f"niveau {difficulty}.{constraints_text} "
+            f"UTILISEZ UNIQUEMENT ce format JSON compressé et ces exercices (ID: nom):\n{exercise_list}\n\n"
+            f"{time_text}{FORMAT_INSTRUCTIONS}"
+        )
+
+    @staticmethod
+    def max_tokens(max_workout_days=None, day_count=7):
+        """Tokens de réponse nécessaires pour `day_count` jours dont au plus `max_workout_days` séances."""
+        workout_days = min(max_workout_days or day_count, day_count)
+        estimate = (TOKENS_OVERHEAD
+                    + workout_days * (TOKENS_PER_WORKOUT_DAY + MAX_EXERCISES_PER_DAY * TOKENS_PER_EXERCISE)
+                    + (day_count - workout_days) * TOKENS_PER_REST_DAY)
+        return int(estimate * TOKEN_MARGIN)
+
+
+class TokenUsageStats:
+    """Cumule les tokens consommés par les appels OpenAI."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.truncated = 0
+        self.last = None
+
+    def record(self, usage, finish_reason=None):
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            if finish_reason == 'length':
+                self.truncated += 1
+            self.last = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}
+
+    def stats(self):
+        with self._lock:
+            requests = self.requests or 1
+            return {
+                'requests': self.requests,
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+                'avg_prompt_tokens': round(self.prompt_tokens / requests, 1),
+                'avg_completion_tokens': round(self.completion_tokens / requests, 1),
+                'truncated': self.truncated,
+                'last': dict(self.last) if self.last else None,
+            }
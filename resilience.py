@@ -0,0 +1,441 @@
+"""Délais, nouvelles tentatives et disjoncteur autour des appels OpenAI.
+
+Chaque génération dispose d'un budget de temps (Deadline) partagé par tous
+ses appels (requête initiale, relances des jours manquants) : le délai de
+chaque appel est le plus petit entre le délai par appel et le temps restant.
+Seules les erreurs transitoires (délai dépassé, connexion, 429, 5xx) sont
+retentées, avec un délai exponentiel aléatoire (« full jitter »).
+
+Le disjoncteur s'ouvre quand le taux d'erreurs transitoires sur la fenêtre
+glissante dépasse le seuil : les appels échouent alors immédiatement
+(CircuitOpenError) pendant open_seconds, puis un appel de test est laissé
+passer (demi-ouvert) ; son succès referme le disjoncteur. Les erreurs non
+transitoires (400, 401...) sont neutres : elles ne comptent ni comme
+échec ni comme succès.
+
+Pour une réponse en streaming, le résultat n'est connu qu'à la fin du flux :
+le budget de temps est vérifié à chaque morceau et le disjoncteur reçoit le
+résultat (succès, erreur, délai dépassé) quand le flux se termine.
+"""
+import asyncio
+import contextlib
+import random
+import threading
+import time
+import types
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Codes HTTP pour lesquels une nouvelle tentative a une chance de réussir
+RETRYABLE_STATUS = frozenset({408, 409, 429})
+
+
+class CircuitOpenError(RuntimeError):
+    """Levée sans appeler le service quand le disjoncteur est ouvert."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Levée quand le budget de temps de la génération est épuisé."""
+
+
+def is_retryable(error):
+    """Erreur transitoire du SDK OpenAI (délai, connexion, 408/409/429, 5xx)."""
+    try:
+        from openai import APIConnectionError, APIStatusError
+    except ImportError:
+        return isinstance(error, (TimeoutError, ConnectionError))
+    if isinstance(error, APIConnectionError):
+        # APITimeoutError en hérite
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+def retry_after(error):
+    """Délai demandé par le serveur (en-tête Retry-After d'une réponse 429/503), en secondes."""
+    response = getattr(error, 'response', None)
+    value = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class Deadline:
+    """Budget de temps d'une génération."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget if budget else None
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def timeout(self, per_call):
+        """Délai à donner au prochain appel ; DeadlineExceeded si le budget est épuisé."""
+        remaining = self.remaining()
+        if remaining is None:
+            return per_call
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Budget de {self.budget}s épuisé")
+        return min(per_call, remaining) if per_call else remaining
+
+
+class CircuitBreaker:
+    """Disjoncteur à taux d'erreurs sur une fenêtre glissante, avec appels de test en demi-ouvert."""
+
+    def __init__(self, name, error_rate=0.5, min_calls=10, window=60.0, open_seconds=30.0, half_open_calls=1):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (instant, échec)
+        self._failures = 0
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.trips = 0
+        self.rejected = 0
+        self.probes = 0
+
+    def _prune(self, now):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._probes = 0
+        self.trips += 1
+        print(f"⚠️ Disjoncteur {self.name} ouvert pour {self.open_seconds}s")
+
+    def allow(self):
+        """Réserve un appel ; CircuitOpenError si le disjoncteur est ouvert (ou si le test est déjà en cours)."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                self.probes += 1
+                return
+            if self.state != CLOSED:
+                self.rejected += 1
+                raise CircuitOpenError(f"Service {self.name} indisponible (disjoncteur {self.state})")
+
+    def release(self):
+        """Appel autorisé par allow() puis annulé avant son résultat : libère l'appel de test éventuel."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def record(self, failed):
+        """Résultat d'un appel autorisé par allow()."""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    self._failures = 0
+                    print(f"✅ Disjoncteur {self.name} refermé")
+                return
+            if self.state == OPEN:
+                return
+            self._outcomes.append((now, failed))
+            self._failures += failed
+            self._prune(now)
+            calls = len(self._outcomes)
+            if failed and calls >= self.min_calls and self._failures / calls >= self.error_rate:
+                self._open(now)
+
+    def stats(self):
+        with self._lock:
+            self._prune(time.monotonic())
+            calls = len(self._outcomes)
+            return {
+                'state': self.state,
+                'trips': self.trips,
+                'rejected': self.rejected,
+                'probes': self.probes,
+                'window_calls': calls,
+                'window_error_rate': round(self._failures / calls, 4) if calls else 0.0,
+            }
+
+
+class RetryPolicy:
+    """Nouvelles tentatives à délai exponentiel aléatoire, limitées par la Deadline de la génération."""
+
+    def __init__(self, max_retries=2, base_delay=0.5, max_delay=8.0, call_timeout=30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.call_timeout = call_timeout
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def delay(self, attempt, error):
+        """Attente avant la tentative `attempt` (1 = première nouvelle tentative)."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        server_delay = retry_after(error)
+        return max(delay, server_delay) if server_delay is not None else delay
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _next_delay(self, attempt, error, deadline):
+        """Attente avant la prochaine tentative, ou None s'il ne faut pas retenter."""
+        if attempt > self.max_retries or not is_retryable(error):
+            return None
+        delay = self.delay(attempt, error)
+        remaining = deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
+
+    @staticmethod
+    def _record_error(breaker, error):
+        # Erreur non transitoire (requête invalide) : neutre, elle ne referme pas un disjoncteur demi-ouvert
+        if is_retryable(error):
+            breaker.record(True)
+        else:
+            breaker.release()
+
+    def call(self, fn, breaker, deadline, wrap=None):
+        """
+        Retourne fn(timeout) en appliquant disjoncteur, délais et nouvelles tentatives.
+        `wrap(result)` (optionnel, flux) reçoit le résultat et se charge de l'enregistrer dans le disjoncteur.
+        """
+        self._count('calls')
+        attempt = 0
+        while True:
+            timeout = deadline.timeout(self.call_timeout)
+            breaker.allow()
+            try:
+                result = fn(timeout)
+            except Exception as e:
+                self._record_error(breaker, e)
+                attempt += 1
+                delay = self._next_delay(attempt, e, deadline)
+                if delay is None:
+                    self._count('failures')
+                    raise
+                self._count('retries')
+                time.sleep(delay)
+                continue
+            if wrap is not None:
+                return wrap(result)
+            breaker.record(False)
+            return result
+
+    async def call_async(self, fn, breaker, deadline, wrap=None):
+        """Équivalent de call() pour une fonction retournant une coroutine."""
+        self._count('calls')
+        attempt = 0
+        while True:
+            timeout = deadline.timeout(self.call_timeout)
+            breaker.allow()
+            try:
+                result = await fn(timeout)
+            except asyncio.CancelledError:
+                # Requête perdante d'une génération couverte (hedging)
+                breaker.release()
+                raise
+            except Exception as e:
+                self._record_error(breaker, e)
+                attempt += 1
+                delay = self._next_delay(attempt, e, deadline)
+                if delay is None:
+                    self._count('failures')
+                    raise
+                self._count('retries')
+                await asyncio.sleep(delay)
+                continue
+            if wrap is not None:
+                return wrap(result)
+            breaker.record(False)
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'retries': self.retries, 'failures': self.failures,
+                    'max_retries': self.max_retries, 'call_timeout': self.call_timeout}
+
+
+class GuardedStream:
+    """
+    Flux de chat.completions borné par la Deadline de la génération : le budget est vérifié avant chaque
+    morceau, et le disjoncteur et la mesure de durée reçoivent le résultat à la fin du flux.
+    Un flux fermé avant la fin (requête couverte perdante, client déconnecté) est neutre.
+    """
+
+    def __init__(self, stream, breaker, deadline, timer):
+        # `timer` : mesure déjà commencée à l'ouverture du flux
+        self._done = False
+        self._stream = stream
+        self._iterator = None
+        self._breaker = breaker
+        self._deadline = deadline
+        self._timer = timer
+
+    def _end(self, error=None):
+        if self._done:
+            return
+        self._done = True
+        if error is None:
+            self._breaker.record(False)
+            self._timer.__exit__(None, None, None)
+        else:
+            RetryPolicy._record_error(self._breaker, error)
+            self._timer.__exit__(type(error), error, error.__traceback__)
+
+    def _check_deadline(self):
+        if self._deadline.remaining() == 0:
+            raise DeadlineExceeded(f"Budget de {self._deadline.budget}s épuisé pendant le flux")
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            self._check_deadline()
+            if self._iterator is None:
+                self._iterator = iter(self._stream)
+            return next(self._iterator)
+        except StopIteration:
+            self._end()
+            raise
+        except Exception as e:
+            self._end(e)
+            self.close()
+            raise
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            self._check_deadline()
+            if self._iterator is None:
+                self._iterator = self._stream.__aiter__()
+            return await self._iterator.__anext__()
+        except StopAsyncIteration:
+            self._end()
+            raise
+        except Exception as e:
+            self._end(e)
+            await self.aclose()
+            raise
+
+    def _abandon(self):
+        if not self._done:
+            self._done = True
+            self._breaker.release()
+            self._timer.__exit__(None, None, None)
+
+    def close(self):
+        self._abandon()
+        close = getattr(self._stream, 'close', None)
+        if close is not None:
+            close()
+
+    async def aclose(self):
+        self._abandon()
+        close = getattr(self._stream, 'close', None)
+        if close is not None:
+            await close()
+
+    def __del__(self):
+        # Flux abandonné sans être lu jusqu'au bout : libérer l'appel de test éventuel du disjoncteur
+        self._abandon()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _Completions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, **kwargs):
+        owner = self._owner
+        if kwargs.get('stream'):
+            return self._create_stream(kwargs)
+
+        def call(timeout):
+            with owner.timer('chat.completions'):
+                return owner.client.with_options(timeout=timeout, max_retries=0).chat.completions.create(**kwargs)
+
+        async def call_async(timeout):
+            with owner.timer('chat.completions'):
+                return await owner.client.with_options(timeout=timeout, max_retries=0).chat.completions.create(
+                    **kwargs)
+
+        if owner.asynchronous:
+            return owner.policy.call_async(call_async, owner.breaker, owner.deadline)
+        return owner.policy.call(call, owner.breaker, owner.deadline)
+
+    def _create_stream(self, kwargs):
+        """Ouverture du flux avec nouvelles tentatives ; sa lecture est mesurée et bornée par GuardedStream."""
+        owner = self._owner
+
+        def wrap(opened):
+            stream, timer = opened
+            return GuardedStream(stream, owner.breaker, owner.deadline, timer)
+
+        def call(timeout):
+            timer = owner.timer('chat.completions.stream')
+            timer.__enter__()
+            try:
+                stream = owner.client.with_options(timeout=timeout, max_retries=0).chat.completions.create(**kwargs)
+            except BaseException as e:
+                timer.__exit__(type(e), e, e.__traceback__)
+                raise
+            return stream, timer
+
+        async def call_async(timeout):
+            timer = owner.timer('chat.completions.stream')
+            timer.__enter__()
+            try:
+                stream = await owner.client.with_options(timeout=timeout, max_retries=0).chat.completions.create(
+                    **kwargs)
+            except BaseException as e:
+                timer.__exit__(type(e), e, e.__traceback__)
+                raise
+            return stream, timer
+
+        if owner.asynchronous:
+            return owner.policy.call_async(call_async, owner.breaker, owner.deadline, wrap=wrap)
+        return owner.policy.call(call, owner.breaker, owner.deadline, wrap=wrap)
+
+
+class ResilientClient:
+    """
+    Client OpenAI (ou AsyncOpenAI) dont chat.completions.create passe par le disjoncteur et les
+    nouvelles tentatives, dans le budget de temps d'une génération.
+    `timer(operation)` (optionnel) retourne le gestionnaire de contexte qui mesure chaque tentative.
+    """
+
+    def __init__(self, client, breaker, policy, budget=None, asynchronous=False, timer=None):
+        self.client = client
+        self.breaker = breaker
+        self.policy = policy
+        self.deadline = Deadline(budget)
+        self.asynchronous = asynchronous
+        self.timer = timer or (lambda operation: contextlib.nullcontext())
+        self.chat = types.SimpleNamespace(completions=_Completions(self))
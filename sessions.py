@@ -0,0 +1,89 @@
+"""Stockage des sessions Flask côté serveur dans le cache SQLite partagé.
+
+Le cookie ne contient qu'un identifiant signé ; les données sont stockées dans
+une seule base SQLite indexée (au lieu d'un fichier par session) et les
+sessions expirées sont supprimées par lots. Une requête qui ne modifie pas la
+session ne déclenche aucune écriture.
+"""
+import secrets
+
+from flask.sessions import SecureCookieSession, SessionInterface
+from itsdangerous import BadSignature, Signer
+
+
+class ServerSideSession(SecureCookieSession):
+    """Session dont les données sont stockées côté serveur sous l'identifiant `sid`."""
+
+    def __init__(self, initial=None, sid=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Change l'identifiant de session (à appeler à la connexion)."""
+        if self.sid is not None:
+            self.previous_sid = self.sid
+        self.sid = None
+        self.modified = True
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """Sessions serveur stockées dans un SQLiteCache (espace de noms dédié)."""
+
+    salt = 'corvio-session'
+
+    def __init__(self, store):
+        self.store = store
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie or not app.secret_key:
+            return ServerSideSession()
+        try:
+            sid = self._signer(app).unsign(cookie).decode('ascii')
+        except BadSignature:
+            return ServerSideSession()
+        data = self.store.get(sid)
+        if not isinstance(data, dict):
+            return ServerSideSession()
+        return ServerSideSession(data, sid=sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            # Session vidée (logout) : supprimer les données et le cookie
+            if session.modified:
+                if session.sid:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not session.modified and not (session.permanent and app.config['SESSION_REFRESH_EACH_REQUEST']):
+            return
+
+        if session.previous_sid is not None:
+            self.store.delete(session.previous_sid)
+            session.previous_sid = None
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        self.store.set(session.sid, dict(session), ttl=int(app.permanent_session_lifetime.total_seconds()))
+
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode('ascii'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
@@ -0,0 +1,124 @@
+"""Regroupement des appels concurrents identiques (« single-flight »).
+
+Quand plusieurs requêtes demandent le même résultat en même temps, un seul
+appel est réellement exécuté et tous les appelants reçoivent son résultat.
+Les erreurs sont transmises à tous les appelants en attente mais ne sont
+jamais conservées : l'appel suivant relance une exécution.
+"""
+import asyncio
+import threading
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Levée quand un appelant a attendu trop longtemps le résultat partagé."""
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Exécute au plus un appel en cours par clé."""
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.deduplicated = 0
+        self.timeouts = 0
+        self.shared_errors = 0
+
+    def do(self, key, fn, timeout=None):
+        """Retourne fn(), en partageant l'exécution avec les appels concurrents de même clé."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.deduplicated += 1
+                leader = False
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    if call.waiters and call.error is not None:
+                        self.shared_errors += call.waiters
+                    self._calls.pop(key, None)
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise SingleFlightTimeout(f"Délai dépassé en attendant l'appel en cours ({key})")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executions': self.executions,
+                'deduplicated': self.deduplicated,
+                'timeouts': self.timeouts,
+                'shared_errors': self.shared_errors,
+                'in_flight': len(self._calls),
+            }
+
+
+class AsyncSingleFlight:
+    """Équivalent de SingleFlight pour les coroutines d'une même boucle asyncio."""
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self._calls = {}
+        self.executions = 0
+        self.deduplicated = 0
+        self.timeouts = 0
+
+    def _finished(self, key, task):
+        self._calls.pop(key, None)
+        if not task.cancelled():
+            # Erreur déjà transmise aux appelants (ou à personne s'ils ont tous abandonné)
+            task.exception()
+
+    async def do(self, key, coroutine_fn, timeout=None):
+        """Retourne await coroutine_fn(), en partageant l'exécution avec les appels concurrents de même clé."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coroutine_fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self.executions += 1
+        else:
+            self.deduplicated += 1
+        try:
+            # shield : un appelant qui abandonne n'annule pas l'appel partagé
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise SingleFlightTimeout(f"Délai dépassé en attendant l'appel en cours ({key})") from None
+
+    def stats(self):
+        return {
+            'executions': self.executions,
+            'deduplicated': self.deduplicated,
+            'timeouts': self.timeouts,
+            'in_flight': len(self._calls),
+        }
@@ -0,0 +1,164 @@
+"""Génération du sitemap XML.
+
+Les URL (pages du site, pages du blog, articles) sont énumérées avec la date
+de modification réelle de leur contenu. Le XML et sa version gzip sont
+construits une seule fois puis servis avec un ETag ; ils ne sont
+reconstruits que si la liste des URL ou leurs dates changent. Au-delà de
+50 000 URL (ou 50 Mo), sitemap.xml devient un index qui pointe vers des
+sitemaps numérotés.
+"""
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+from flask import Response
+
+# Limites du protocole sitemaps.org pour un fichier
+MAX_URLS = 50000
+MAX_BYTES = 50 * 1024 * 1024
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_OPEN = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+
+def w3c_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def url_element(loc, lastmod=None, priority=None):
+    parts = [f'  <url>\n    <loc>{escape(loc)}</loc>\n']
+    if lastmod:
+        parts.append(f'    <lastmod>{w3c_datetime(lastmod)}</lastmod>\n')
+    if priority:
+        parts.append(f'    <priority>{priority}</priority>\n')
+    parts.append('  </url>\n')
+    return ''.join(parts)
+
+
+def split_urlsets(elements, max_urls=MAX_URLS, max_bytes=MAX_BYTES):
+    """Répartit les éléments <url> en fichiers respectant les limites ; retourne les indices de chaque fichier."""
+    overhead = len(XML_HEADER) + len(URLSET_OPEN) + len('</urlset>\n')
+    chunks = []
+    current = []
+    size = overhead
+    for index, element in enumerate(elements):
+        element_size = len(element.encode('utf-8'))
+        if current and (len(current) >= max_urls or size + element_size > max_bytes):
+            chunks.append(current)
+            current = []
+            size = overhead
+        current.append(index)
+        size += element_size
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
+
+
+class Sitemap:
+    """sitemap.xml (ou index de sitemaps) mis en cache par URL de base du site.
+
+    L'URL de base vient de l'en-tête Host, que le client choisit : seuls les
+    `max_sites` sites servis le plus récemment sont gardés (www et domaine nu,
+    http et https derrière un proxy).
+    """
+
+    def __init__(self, entries, part_url, max_urls=MAX_URLS, max_bytes=MAX_BYTES, check_interval=2.0, max_sites=4):
+        # entries() -> [(loc, lastmod, priority)] ; part_url(numéro) -> URL absolue d'un sitemap numéroté
+        self.entries = entries
+        self.part_url = part_url
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self.max_sites = max_sites
+        self._sites = OrderedDict()  # URL de base -> (vérifié à, empreinte des URL, documents), du plus ancien au plus récent
+        self.builds = 0
+        self.served = 0
+        self.not_modified = 0
+
+    def _build(self, entries):
+        """Documents {0: sitemap.xml, 1..n: sitemaps numérotés} -> (corps, corps gzip, ETag)."""
+        elements = [url_element(loc, lastmod, priority) for loc, lastmod, priority in entries]
+        chunks = split_urlsets(elements, self.max_urls, self.max_bytes)
+        texts = {}
+        for number, chunk in enumerate(chunks, start=1):
+            texts[number] = XML_HEADER + URLSET_OPEN + ''.join(elements[i] for i in chunk) + '</urlset>\n'
+        if len(chunks) == 1:
+            texts = {0: texts[1]}
+        else:
+            index = [XML_HEADER, INDEX_OPEN]
+            for number, chunk in enumerate(chunks, start=1):
+                lastmod = max((entries[i][1] or 0 for i in chunk), default=0)
+                index.append(f'  <sitemap>\n    <loc>{escape(self.part_url(number))}</loc>\n')
+                if lastmod:
+                    index.append(f'    <lastmod>{w3c_datetime(lastmod)}</lastmod>\n')
+                index.append('  </sitemap>\n')
+            index.append('</sitemapindex>\n')
+            texts[0] = ''.join(index)
+
+        documents = {}
+        for number, text in texts.items():
+            body = text.encode('utf-8')
+            documents[number] = (body, gzip.compress(body, compresslevel=9, mtime=0),
+                                 hashlib.sha256(body).hexdigest()[:32])
+        with self._lock:
+            self.builds += 1
+        return documents
+
+    def documents(self, base_url):
+        """Documents à jour pour ce site (reconstruits seulement si les URL ou leurs dates ont changé)."""
+        now = time.monotonic()
+        site = self._sites.get(base_url)
+        if site is not None and now - site[0] < self.check_interval:
+            return site[2]
+        entries = list(self.entries())
+        digest = hashlib.sha256(repr(entries).encode('utf-8')).hexdigest()
+        if site is not None and site[1] == digest:
+            documents = site[2]
+        else:
+            documents = self._build(entries)
+        with self._lock:
+            self._sites[base_url] = (now, digest, documents)
+            self._sites.move_to_end(base_url)
+            while len(self._sites) > self.max_sites:
+                self._sites.popitem(last=False)
+        return documents
+
+    def response(self, request, number=0):
+        """Réponse HTTP pour sitemap.xml (number=0) ou un sitemap numéroté ; None s'il n'existe pas."""
+        document = self.documents(request.host_url).get(number)
+        if document is None:
+            return None
+        body, compressed, etag = document
+        use_gzip = bool(request.accept_encodings['gzip'])
+        if request.if_none_match.contains(etag) or request.if_none_match.contains(etag + '-gz'):
+            response = Response(status=304)
+            with self._lock:
+                self.not_modified += 1
+        else:
+            if use_gzip:
+                response = Response(compressed, mimetype='application/xml')
+                response.headers['Content-Encoding'] = 'gzip'
+            else:
+                response = Response(body, mimetype='application/xml')
+            with self._lock:
+                self.served += 1
+        response.set_etag(etag + '-gz' if use_gzip else etag)
+        response.headers['Cache-Control'] = 'public, max-age=3600'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                'builds': self.builds,
+                'served': self.served,
+                'not_modified': self.not_modified,
+                'sites': len(self._sites),
+                'documents': {base_url: len(site[2]) for base_url, site in self._sites.items()},
+            }
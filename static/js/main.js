@@ -220,22 +220,30 @@ document.addEventListener('DOMContentLoaded', () => {
                 resultSection.classList.remove('visible');
             }
             
+            const payload = {
+                age: age,
+                height: height,
+                weight: weight,
+                difficulty: difficulty,
+                maxSessionDuration: maxSessionDuration,
+                maxWorkoutDays: maxWorkoutDays,
+                gym: gym,
+                equipmentList: equipmentList
+            };
+            
             try {
+                // Par défaut : tâche de fond (/generate puis suivi de statusUrl), qui ne bloque pas de worker.
+                // Affichage progressif jour par jour seulement si le serveur l'active (GENERATION_STREAM_UI)
+                if (form.dataset.stream === '1' && await streamPlan(payload)) {
+                    return;
+                }
+                
                 const response = await fetch('/generate', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json'
                     },
-                    body: JSON.stringify({
-                        age: age,
-                        height: height,
-                        weight: weight,
-                        difficulty: difficulty,
-                        maxSessionDuration: maxSessionDuration,
-                        maxWorkoutDays: maxWorkoutDays,
-                        gym: gym,
-                        equipmentList: equipmentList
-                    })
+                    body: JSON.stringify(payload)
                 });
                 
                 if (response.status === 401) {
@@ -244,7 +252,18 @@ document.addEventListener('DOMContentLoaded', () => {
                     return;
                 }
                 
-                const data = await response.json();
+                let data = await response.json();
+                if (response.status === 202 && data.statusUrl) {
+                    // Génération lancée en tâche de fond : attendre le résultat
+                    data = await waitForJob(data.statusUrl);
+                }
+                if (data.error) {
+                    if (programContainer) {
+                        programContainer.textContent = data.error;
+                    }
+                    showResults();
+                    return;
+                }
                 // Essayer d'interpréter la réponse comme JSON structuré
                 let schedule;
                 try {
@@ -260,37 +279,8 @@ document.addEventListener('DOMContentLoaded', () => {
                     renderSchedule(schedule);
                 }
                 // Afficher les produits
-                if (data.products && productList) {
-                    data.products.forEach(prod => {
-                        const productCard = document.createElement('div');
-                        productCard.classList.add('product-card');
-                        
-                        const productName = document.createElement('h4');
-                        productName.textContent = prod.name;
-                        
-                        const productDesc = document.createElement('p');
-                        productDesc.textContent = prod.description;
-                        
-                        const productLink = document.createElement('a');
-                        productLink.href = prod.link || '#';
-                        productLink.target = '_blank';
-                        productLink.rel = 'noopener noreferrer';
-                        productLink.textContent = 'Voir le produit';
-                        productLink.innerHTML += ' <i class="fas fa-external-link-alt"></i>';
-                        
-                        productCard.appendChild(productName);
-                        productCard.appendChild(productDesc);
-                        productCard.appendChild(productLink);
-                        productList.appendChild(productCard);
-                    });
-                }
-                // Hide spinner, fade in results
-                if (loadingSpinner) loadingSpinner.style.display = 'none';
-                if (resultSection) {
-                    setTimeout(() => {
-                        resultSection.classList.add('visible');
-                    }, 100);
-                }
+                renderProducts(data.products);
+                showResults();
             } catch (error) {
                 if (programContainer) {
                     programContainer.textContent = 'Une erreur est survenue lors de la génération du programme.';
@@ -304,6 +294,170 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    // Masquer le spinner et faire apparaître les résultats
+    function showResults() {
+        if (loadingSpinner) loadingSpinner.style.display = 'none';
+        if (resultSection) {
+            setTimeout(() => {
+                resultSection.classList.add('visible');
+            }, 100);
+        }
+    }
+
+    /**
+     * Interroge régulièrement l'état d'une génération jusqu'à sa fin.
+     * (Pas de long-poll : il bloquerait un worker gunicorn synchrone.)
+     * @param {string} statusUrl - URL de suivi renvoyée par /generate.
+     * @returns {Promise<Object>} Réponse finale (plan et produits, ou erreur).
+     */
+    async function waitForJob(statusUrl) {
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const response = await fetch(statusUrl);
+            const job = await response.json();
+            if (!response.ok) {
+                return { error: job.error || 'Une erreur est survenue lors de la génération du programme.' };
+            }
+            if (job.status === 'done') {
+                return job;
+            }
+            if (job.status !== 'queued' && job.status !== 'running') {
+                return { error: job.error || 'Une erreur est survenue lors de la génération du programme.' };
+            }
+        }
+    }
+
+    /**
+     * Génère le plan via /generate-stream et affiche chaque jour dès sa réception.
+     * @param {Object} payload - Paramètres du formulaire.
+     * @returns {Promise<boolean>} false uniquement si le streaming n'est pas disponible (repli sur /generate).
+     */
+    async function streamPlan(payload) {
+        if (!window.ReadableStream || !window.TextDecoder) return false;
+        
+        const startedAt = performance.now();
+        let firstDayAt = null;
+        let dayIndex = 0;
+        
+        const response = await fetch('/generate-stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify(payload)
+        });
+        
+        if (response.status === 401) {
+            window.location.href = '/login';
+            return true;
+        }
+        // Route absente (404/405/501) : streaming non disponible, repli sur /generate.
+        // Toute autre erreur (429, 5xx) est affichée : un repli relancerait la génération.
+        if ([404, 405, 501].includes(response.status)) return false;
+        if (!response.ok || !response.body) {
+            let message = 'Une erreur est survenue lors de la génération du programme.';
+            try {
+                message = (await response.json()).error || message;
+            } catch (e) {
+                // Corps non JSON : message générique
+            }
+            const retryAfter = response.headers.get('Retry-After');
+            if (retryAfter) {
+                message += ` (réessayez dans ${retryAfter} s)`;
+            }
+            if (programContainer) programContainer.textContent = message;
+            showResults();
+            return true;
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        const handleEvent = (event, data) => {
+            if (event === 'day') {
+                if (firstDayAt === null) {
+                    firstDayAt = performance.now();
+                    if (programContainer) programContainer.innerHTML = '';
+                    showResults();
+                }
+                if (programContainer) {
+                    programContainer.appendChild(renderDayCard(data, dayIndex));
+                }
+                dayIndex += 1;
+            } else if (event === 'done') {
+                // Plan final (semaine complète, dans l'ordre) tel qu'il a été sauvegardé
+                renderSchedule(data.plan);
+                renderProducts(data.products);
+                showResults();
+                console.log('Plan généré', {
+                    firstDayMs: firstDayAt === null ? null : Math.round(firstDayAt - startedAt),
+                    totalMs: Math.round(performance.now() - startedAt),
+                    server: data.timing
+                });
+            } else if (event === 'error') {
+                if (programContainer && dayIndex === 0) {
+                    programContainer.textContent = data.error;
+                }
+                showResults();
+            }
+        };
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Les évènements SSE sont séparés par une ligne vide
+            let separator;
+            while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, separator);
+                buffer = buffer.slice(separator + 2);
+                
+                let event = 'message';
+                let data = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                });
+                if (data) handleEvent(event, JSON.parse(data));
+            }
+        }
+        return true;
+    }
+
+    /**
+     * Affiche les produits suggérés.
+     * @param {Array} products - Liste des produits renvoyés par le serveur.
+     */
+    function renderProducts(products) {
+        if (!products || !productList) return;
+        
+        products.forEach(prod => {
+            const productCard = document.createElement('div');
+            productCard.classList.add('product-card');
+            
+            const productName = document.createElement('h4');
+            productName.textContent = prod.name;
+            
+            const productDesc = document.createElement('p');
+            productDesc.textContent = prod.description;
+            
+            const productLink = document.createElement('a');
+            productLink.href = prod.link || '#';
+            productLink.target = '_blank';
+            productLink.rel = 'noopener noreferrer';
+            productLink.textContent = 'Voir le produit';
+            productLink.innerHTML += ' <i class="fas fa-external-link-alt"></i>';
+            
+            productCard.appendChild(productName);
+            productCard.appendChild(productDesc);
+            productCard.appendChild(productLink);
+            productList.appendChild(productCard);
+        });
+    }
+
     /**
      * Affiche le programme structuré sous forme d'agenda interactif.
      * @param {Object} schedule - Objet JSON avec un tableau 'jours'.
@@ -319,87 +473,97 @@ document.addEventListener('DOMContentLoaded', () => {
         
         // Pour chaque jour, créer une carte
         schedule.jours.forEach((dayObj, dayIndex) => {
-            const card = document.createElement('div');
-            card.classList.add('day-card');
+            programContainer.appendChild(renderDayCard(dayObj, dayIndex));
+        });
+    }
+
+    /**
+     * Construit la carte d'un jour du programme.
+     * @param {Object} dayObj - Jour décompressé (nomJour, type, exercices).
+     * @param {number} dayIndex - Position du jour dans la semaine.
+     * @returns {HTMLElement} La carte du jour.
+     */
+    function renderDayCard(dayObj, dayIndex) {
+        const card = document.createElement('div');
+        card.classList.add('day-card');
+        
+        // Ajouter la classe pour les jours de repos
+        if (dayObj.type === 'rest') {
+            card.classList.add('rest-day');
+        } else {
+            card.classList.add('workout-day');
+        }
+        
+        const title = document.createElement('h4');
+        title.textContent = dayObj.nomJour || `Jour ${dayIndex + 1}`;
+        card.appendChild(title);
+        
+        // Contenu selon le type de jour
+        if (dayObj.type === 'rest') {
+            const restContent = document.createElement('div');
+            restContent.classList.add('rest-content');
             
-            // Ajouter la classe pour les jours de repos
-            if (dayObj.type === 'rest') {
-                card.classList.add('rest-day');
-            } else {
-                card.classList.add('workout-day');
-            }
+            const restIcon = document.createElement('span');
+            restIcon.classList.add('rest-icon');
+            restIcon.textContent = '😴';
             
-            const title = document.createElement('h4');
-            title.textContent = dayObj.nomJour || `Jour ${dayIndex + 1}`;
-            card.appendChild(title);
+            const restText = document.createElement('p');
+            restText.textContent = 'Jour de repos';
             
-            // Contenu selon le type de jour
-            if (dayObj.type === 'rest') {
-                const restContent = document.createElement('div');
-                restContent.classList.add('rest-content');
-                
-                const restIcon = document.createElement('span');
-                restIcon.classList.add('rest-icon');
-                restIcon.textContent = '😴';
-                
-                const restText = document.createElement('p');
-                restText.textContent = 'Jour de repos';
-                
-                const restSubtext = document.createElement('small');
-                restSubtext.textContent = 'Profitez de votre récupération !';
+            const restSubtext = document.createElement('small');
+            restSubtext.textContent = 'Profitez de votre récupération !';
+            
+            restContent.appendChild(restIcon);
+            restContent.appendChild(restText);
+            restContent.appendChild(restSubtext);
+            card.appendChild(restContent);
+        } else {
+            // Liste des exercices pour les jours d'entraînement
+            if (Array.isArray(dayObj.exercices)) {
+                const exercisesList = document.createElement('div');
+                exercisesList.classList.add('exercises-list');
                 
-                restContent.appendChild(restIcon);
-                restContent.appendChild(restText);
-                restContent.appendChild(restSubtext);
-                card.appendChild(restContent);
-            } else {
-                // Liste des exercices pour les jours d'entraînement
-                if (Array.isArray(dayObj.exercices)) {
-                    const exercisesList = document.createElement('div');
-                    exercisesList.classList.add('exercises-list');
+                dayObj.exercices.forEach((exercise, exIndex) => {
+                    const exerciseItem = document.createElement('div');
+                    exerciseItem.classList.add('exercise-item');
                     
-                    dayObj.exercices.forEach((exercise, exIndex) => {
-                        const exerciseItem = document.createElement('div');
-                        exerciseItem.classList.add('exercise-item');
-                        
-                        const exerciseHeader = document.createElement('div');
-                        exerciseHeader.classList.add('exercise-header');
-                        
-                        const exerciseName = document.createElement('h5');
-                        exerciseName.textContent = exercise.nom || `Exercice ${exIndex + 1}`;
-                        
-                        const exerciseType = document.createElement('span');
-                        exerciseType.classList.add('exercise-type');
-                        
-                        // Déterminer si l'exercice est mesuré en temps ou répétitions
-                        const timeBasedExercises = [4, 16, 20, 21, 22, 23, 24, 30]; // IDs des exercices en temps
-                        const exerciseId = exercise.id || exercise.nom_id;
-                        
-                        if (exercise.duree_minutes || (exerciseId && timeBasedExercises.includes(exerciseId))) {
-                            // Exercice mesuré en temps
-                            const duration = exercise.duree_minutes || exercise.minutes || 1;
-                            exerciseType.textContent = `${exercise.series} séries × ${duration} min`;
-                            exerciseType.classList.add('time-based');
-                        } else if (exercise.repetitions) {
-                            // Exercice mesuré en répétitions
-                            exerciseType.textContent = `${exercise.series} séries × ${exercise.repetitions} répétitions`;
-                            exerciseType.classList.add('repetition-based');
-                        } else {
-                            exerciseType.textContent = `${exercise.series} séries`;
-                        }
-                        
-                        exerciseHeader.appendChild(exerciseName);
-                        exerciseHeader.appendChild(exerciseType);
-                        exerciseItem.appendChild(exerciseHeader);
-                        exercisesList.appendChild(exerciseItem);
-                    });
+                    const exerciseHeader = document.createElement('div');
+                    exerciseHeader.classList.add('exercise-header');
                     
-                    card.appendChild(exercisesList);
-                }
+                    const exerciseName = document.createElement('h5');
+                    exerciseName.textContent = exercise.nom || `Exercice ${exIndex + 1}`;
+                    
+                    const exerciseType = document.createElement('span');
+                    exerciseType.classList.add('exercise-type');
+                    
+                    // Déterminer si l'exercice est mesuré en temps ou répétitions
+                    const timeBasedExercises = [4, 16, 20, 21, 22, 23, 24, 30]; // IDs des exercices en temps
+                    const exerciseId = exercise.id || exercise.nom_id;
+                    
+                    if (exercise.duree_minutes || (exerciseId && timeBasedExercises.includes(exerciseId))) {
+                        // Exercice mesuré en temps
+                        const duration = exercise.duree_minutes || exercise.minutes || 1;
+                        exerciseType.textContent = `${exercise.series} séries × ${duration} min`;
+                        exerciseType.classList.add('time-based');
+                    } else if (exercise.repetitions) {
+                        // Exercice mesuré en répétitions
+                        exerciseType.textContent = `${exercise.series} séries × ${exercise.repetitions} répétitions`;
+                        exerciseType.classList.add('repetition-based');
+                    } else {
+                        exerciseType.textContent = `${exercise.series} séries`;
+                    }
+                    
+                    exerciseHeader.appendChild(exerciseName);
+                    exerciseHeader.appendChild(exerciseType);
+                    exerciseItem.appendChild(exerciseHeader);
+                    exercisesList.appendChild(exerciseItem);
+                });
+                
+                card.appendChild(exercisesList);
             }
-            
-            programContainer.appendChild(card);
-        });
+        }
+        
+        return card;
     }
 
     // Mobile Menu Functionality
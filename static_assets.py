@@ -0,0 +1,132 @@
+"""Fichiers servis depuis la mémoire, précompressés et validés par ETag.
+
+Le contenu est lu une seule fois (puis relu si la date de modification du
+fichier change), compressé en gzip et en brotli quand le module est
+disponible, et servi avec un ETag fort par encodage. Une requête dont
+l'en-tête If-None-Match correspond reçoit un 304 sans corps.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class CompressedAsset:
+    """Contenu d'un fichier gardé en mémoire avec ses variantes compressées."""
+
+    def __init__(self, path, mimetype='application/octet-stream', max_age=86400, check_interval=2.0):
+        self.path = path
+        self.mimetype = mimetype
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self.mtime = None
+        self.data = None
+        self.variants = {}
+        self.etag = None
+        self.reloads = 0
+        self.not_modified = 0
+        self.served = 0
+        self._listeners = []
+        self._load()
+
+    def serialize(self, raw):
+        """Retourne (données décodées, octets servis) ; à surcharger selon le format."""
+        return raw, raw
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, 'rb') as f:
+            data, body = self.serialize(f.read())
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        variants = {'identity': (body, digest)}
+        variants['gzip'] = (gzip.compress(body, compresslevel=9, mtime=0), digest + '-gz')
+        if brotli is not None:
+            variants['br'] = (brotli.compress(body, quality=11), digest + '-br')
+        # Avant le remplacement : si un dépendant refuse le nouveau contenu, l'ancienne version reste servie
+        for listener in self._listeners:
+            listener(data)
+        with self._lock:
+            self.mtime = mtime
+            self.data = data
+            self.variants = variants
+            self.etag = digest
+            self.reloads += 1
+            self._checked_at = time.monotonic()
+
+    def on_reload(self, listener):
+        """Appelle `listener(données)` maintenant puis à chaque rechargement du fichier."""
+        self._listeners.append(listener)
+        listener(self.data)
+
+    def refresh(self):
+        """Relit le fichier s'il a été modifié (vérification au plus toutes les check_interval secondes)."""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            if os.stat(self.path).st_mtime != self.mtime:
+                self._load()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # On garde la version précédente tant que le fichier est illisible ou invalide
+            print(f"⚠️ Impossible de recharger {self.path}: {e}")
+
+    def _select(self, request):
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accepted[encoding]:
+                return encoding
+        return 'identity'
+
+    def response(self, request):
+        """Réponse HTTP (200 avec la variante adaptée, ou 304) pour cette requête."""
+        self.refresh()
+        encoding = self._select(request)
+        body, etag = self.variants[encoding]
+
+        if any(request.if_none_match.contains(tag) for _, tag in self.variants.values()):
+            response = Response(status=304)
+            with self._lock:
+                self.not_modified += 1
+        else:
+            response = Response(body, mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+            with self._lock:
+                self.served += 1
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f'public, max-age={self.max_age}'
+        response.vary.add('Accept-Encoding')
+        response.last_modified = self.mtime
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                'served': self.served,
+                'not_modified': self.not_modified,
+                'reloads': self.reloads,
+                'sizes': {encoding: len(body) for encoding, (body, _) in self.variants.items()},
+            }
+
+
+class JSONAsset(CompressedAsset):
+    """Fichier JSON servi sous forme compacte ; `data` contient le contenu décodé."""
+
+    def __init__(self, path, max_age=86400, check_interval=2.0):
+        super().__init__(path, mimetype='application/json', max_age=max_age, check_interval=check_interval)
+
+    def serialize(self, raw):
+        data = json.loads(raw)
+        return data, json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,141 @@
+"""Validation et réparation des plans renvoyés par OpenAI, avec un client factice.
+
+Le client factice remplace chat.completions.create : il renvoie des réponses
+préparées (JSON tronqué, exercices inconnus, jours absents) et garde les
+messages reçus pour vérifier ce qui est redemandé au modèle.
+"""
+import importlib
+import json
+import types
+
+import pytest
+
+from plan_validation import PlanValidator, request_validated_plan
+
+NS = types.SimpleNamespace
+
+# Réponse coupée par max_tokens au milieu du jour 4 ; l'exercice 99 n'existe pas
+TRUNCATED = (
+    '{"j":[{"d":1,"t":1,"e":[{"n":1,"s":3,"r":12,"m":null},{"n":99,"s":3,"r":10,"m":null}]},'
+    '{"d":2,"t":0,"e":[]},'
+    '{"d":3,"t":1,"e":[{"n":4,"s":3,"r":null,"m":1}]},'
+    '{"d":4,"t":1,"e":[{"n":2,"s":3'
+)
+# Relance : les jours 4 et 5 ; le jour 1, non demandé, doit être ignoré
+REASK = (
+    '{"j":[{"d":4,"t":1,"e":[{"n":2,"s":3,"r":15,"m":null}]},'
+    '{"d":5,"t":1,"e":[{"n":5,"s":3,"r":10,"m":null}]},'
+    '{"d":1,"t":1,"e":[{"n":3,"s":3,"r":8,"m":null}]}]}'
+)
+
+
+class StubLLM:
+    """Client OpenAI factice : chaque appel renvoie la réponse suivante (texte, finish_reason)."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+        self.chat = NS(completions=self)
+
+    def with_options(self, **kwargs):
+        return self
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        text, finish_reason = self.replies.pop(0)
+        message = NS(content=text)
+        return NS(choices=[NS(message=message, finish_reason=finish_reason)], usage=None)
+
+
+def days_by_id(plan):
+    return {day['d']: day for day in plan['j']}
+
+
+def test_truncated_plan_is_repaired_and_only_missing_days_are_reasked():
+    validator = PlanValidator(range(1, 31), time_based_ids={4})
+    llm = StubLLM([(TRUNCATED, 'length'), (REASK, 'stop')])
+
+    plan = request_validated_plan(llm, [{"role": "user", "content": "plan"}], validator, max_reasks=1)
+    days = days_by_id(plan)
+
+    # Une seule relance, qui ne demande que les jours absents (le jour 4 coupé compris)
+    assert len(llm.calls) == 2
+    reask = llm.calls[1]['messages'][-1]['content']
+    assert 'UNIQUEMENT les jours 4, 5, 6, 7 ' in reask
+    # Jours reçus gardés, exercice inconnu retiré, jour 1 non remplacé par la relance
+    assert days[1] == {"d": 1, "t": 1, "e": [{"n": 1, "s": 3, "r": 12}]}
+    assert days[3] == {"d": 3, "t": 1, "e": [{"n": 4, "s": 3, "m": 1}]}
+    assert days[4]['e'] == [{"n": 2, "s": 3, "r": 15}]
+    assert days[5]['e'] == [{"n": 5, "s": 3, "r": 10}]
+    # Jours toujours absents après la relance : jours de repos
+    assert [day['d'] for day in plan['j']] == [1, 2, 3, 4, 5, 6, 7]
+    assert days[6] == {"d": 6, "t": 0, "e": []}
+    assert days[7] == {"d": 7, "t": 0, "e": []}
+    assert validator.stats()['dropped_exercises'] == 1
+    assert validator.stats()['reasks'] == 1
+
+
+def test_complete_plan_missing_rest_days_is_not_reasked():
+    validator = PlanValidator(range(1, 31))
+    text = '```json\n{"j":[{"d":1,"t":1,"e":[{"n":"3","s":"4","r":12}]},{"d":3,"t":1,"e":[{"n":20,"s":1}]}]}\n```'
+    llm = StubLLM([(text, 'stop')])
+
+    plan = request_validated_plan(llm, [], validator, max_reasks=1)
+
+    assert len(llm.calls) == 1
+    assert [day['t'] for day in plan['j']] == [1, 0, 1, 0, 0, 0, 0]
+    assert days_by_id(plan)[1]['e'] == [{"n": 3, "s": 4, "r": 12}]
+    # Ni répétitions ni minutes : 10 répétitions par défaut
+    assert days_by_id(plan)[3]['e'] == [{"n": 20, "s": 1, "r": 10}]
+
+
+def test_session_with_only_unknown_exercises_is_reasked():
+    validator = PlanValidator(range(1, 31))
+    text = '{"j":[{"d":1,"t":1,"e":[{"n":1,"s":3,"r":10}]},{"d":2,"t":1,"e":[{"n":99,"s":3,"r":10}]}]}'
+    llm = StubLLM([(text, 'stop'), ('{"j":[{"d":2,"t":1,"e":[{"n":6,"s":3,"r":10}]}]}', 'stop')])
+
+    plan = request_validated_plan(llm, [], validator, max_reasks=1)
+
+    assert 'UNIQUEMENT les jours 2 ' in llm.calls[1]['messages'][-1]['content']
+    assert days_by_id(plan)[2]['e'] == [{"n": 6, "s": 3, "r": 10}]
+
+
+def test_workouts_are_capped_and_not_reasked_beyond_maximum():
+    validator = PlanValidator(range(1, 31))
+    text = '{"j":[' + ','.join('{"d":%d,"t":1,"e":[{"n":1,"s":3,"r":10}]}' % day for day in (1, 2, 3)) + ','
+    llm = StubLLM([(text, 'length')])
+
+    plan = request_validated_plan(llm, [], validator, max_reasks=1, max_workout_days=2)
+
+    # Maximum déjà atteint : pas de relance malgré la troncature
+    assert len(llm.calls) == 1
+    assert [day['t'] for day in plan['j']] == [1, 1, 0, 0, 0, 0, 0]
+
+
+def test_unusable_response_raises():
+    validator = PlanValidator(range(1, 31))
+    llm = StubLLM([('garbage', 'stop'), ('still garbage', 'stop')])
+
+    with pytest.raises(ValueError):
+        request_validated_plan(llm, [], validator, max_reasks=1)
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    monkeypatch.setenv('CACHE_DB_PATH', str(tmp_path / 'cache.sqlite3'))
+    monkeypatch.setenv('METRICS_DIR', str(tmp_path / 'metrics'))
+    return importlib.import_module('app')
+
+
+def test_request_workout_plan_with_stub_client(app_module):
+    llm = StubLLM([(TRUNCATED, 'length'), (REASK, 'stop')])
+
+    plan = json.loads(app_module._request_workout_plan('plan', 'test-profile', llm=llm))
+
+    assert len(llm.calls) == 2
+    assert llm.calls[0]['response_format'] == app_module.plan_validator.response_format
+    assert [day['d'] for day in plan['j']] == [1, 2, 3, 4, 5, 6, 7]
+    assert days_by_id(plan)[1]['e'] == [{"n": 1, "s": 3, "r": 12}]
+    if app_module.GENERATION_CACHE_ENABLED:
+        assert app_module.generation_cache.get('test-profile') == plan
@@ -0,0 +1,192 @@
+"""Vérification des jetons Firebase avec cache et certificats préchargés.
+
+Un jeton déjà vérifié est gardé en mémoire jusqu'à son expiration (`exp`),
+sous l'empreinte SHA-256 du jeton (le jeton lui-même n'est jamais stocké).
+Les certificats publics de Google sont récupérés au démarrage du worker puis
+rafraîchis en tâche de fond avant l'expiration indiquée par Cache-Control,
+pour que la première connexion ne paie pas leur téléchargement.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+
+from cache import LRUCache
+from plan_stream import LatencyStats
+
+# Certificats utilisés par Firebase pour signer les ID tokens
+ID_TOKEN_CERT_URI = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+def firebase_token_verifier(auth):
+    """Vérifieur interne de firebase_admin (API privée, testée avec firebase-admin 7.x), ou None s'il a changé.
+
+    Sans lui, les jetons sont vérifiés normalement par auth.verify_id_token,
+    seuls la mesure et le préchargement des certificats sont désactivés.
+    """
+    get_client = getattr(auth, '_get_client', None)
+    if get_client is None:
+        return None
+    token_verifier = getattr(get_client(None), '_token_verifier', None)
+    if not callable(getattr(token_verifier, 'request', None)):
+        return None
+    return token_verifier
+
+
+class TimedCertificateRequest:
+    """Enveloppe la requête HTTP du vérifieur pour mesurer la récupération des certificats."""
+
+    def __init__(self, request, stats):
+        self._request = request
+        self._stats = stats
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self._request, name)
+
+    def __call__(self, url, method='GET', body=None, headers=None, timeout=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._request(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self._stats.record(elapsed)
+            self._local.elapsed_ms = getattr(self._local, 'elapsed_ms', 0.0) + elapsed
+
+    def take_elapsed(self):
+        """Temps passé (ms) à récupérer des certificats dans ce thread depuis le dernier appel."""
+        elapsed = getattr(self._local, 'elapsed_ms', 0.0)
+        self._local.elapsed_ms = 0.0
+        return elapsed
+
+
+class CachedTokenVerifier:
+    """Vérifie les ID tokens Firebase et garde le résultat jusqu'à leur expiration."""
+
+    def __init__(self, verify_fn, max_entries=10000, refresh_margin=300, min_refresh=60, retry_delay=30):
+        self.verify_fn = verify_fn
+        self.refresh_margin = refresh_margin
+        self.min_refresh = min_refresh
+        self.retry_delay = retry_delay
+        self._cache = LRUCache(max_entries=max_entries)
+        self._request = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._wakeup = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.cert_refreshes = 0
+        self.cert_refresh_failures = 0
+        self.cert_expires_at = None
+        self.verify_latency = LatencyStats()
+        self.signature_latency = LatencyStats()
+        self.cert_fetch_latency = LatencyStats()
+
+    def attach(self, token_verifier):
+        """Branche la mesure du temps de récupération des certificats sur le vérifieur firebase_admin.
+
+        Retourne False (rien n'est branché) si `token_verifier` est None.
+        """
+        if token_verifier is None:
+            return False
+        request = token_verifier.request
+        if not isinstance(request, TimedCertificateRequest):
+            request = TimedCertificateRequest(request, self.cert_fetch_latency)
+            token_verifier.request = request
+        self._request = request
+        return True
+
+    @staticmethod
+    def token_key(id_token):
+        return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    def verify(self, id_token):
+        """Retourne le jeton décodé, depuis le cache s'il a déjà été vérifié et n'a pas expiré."""
+        self.start()
+        key = self.token_key(id_token)
+        decoded = self._cache.get(key)
+        if isinstance(decoded, dict) and decoded.get('exp', 0) > time.time():
+            with self._lock:
+                self.hits += 1
+            return decoded
+
+        if self._request is not None:
+            self._request.take_elapsed()
+        started = time.perf_counter()
+        try:
+            decoded = self.verify_fn(id_token)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        total = (time.perf_counter() - started) * 1000
+        cert_fetch = self._request.take_elapsed() if self._request is not None else 0.0
+        self.verify_latency.record(total)
+        self.signature_latency.record(max(0.0, total - cert_fetch))
+        with self._lock:
+            self.misses += 1
+
+        ttl = int(decoded.get('exp', 0) - time.time())
+        if ttl > 0:
+            self._cache.set(key, decoded, ttl=ttl)
+        return decoded
+
+    def refresh_certificates(self):
+        """Télécharge les certificats (en contournant le cache HTTP) et retourne leur durée de validité."""
+        if self._request is None:
+            return None
+        response = self._request(ID_TOKEN_CERT_URI, headers={'Cache-Control': 'no-cache'})
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status}")
+        match = _MAX_AGE_RE.search(response.headers.get('cache-control', ''))
+        max_age = int(match.group(1)) if match else None
+        with self._lock:
+            self.cert_refreshes += 1
+            self.cert_expires_at = time.time() + max_age if max_age else None
+        return max_age
+
+    def start(self):
+        """Démarre le rafraîchissement des certificats (une fois par worker, après le fork)."""
+        if self._request is None:
+            return
+        if self._thread is None or self._thread_pid != os.getpid() or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or self._thread_pid != os.getpid() or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._loop, name='token-certs', daemon=True)
+                    self._thread_pid = os.getpid()
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            try:
+                max_age = self.refresh_certificates()
+                # Rafraîchir avant l'expiration annoncée par Cache-Control
+                delay = max(self.min_refresh, max_age - self.refresh_margin) if max_age else self.min_refresh * 10
+            except Exception as e:
+                print(f"⚠️ Échec du rafraîchissement des certificats Firebase: {e}")
+                with self._lock:
+                    self.cert_refresh_failures += 1
+                delay = self.retry_delay
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'cached_tokens': len(self._cache),
+                'hits': self.hits,
+                'misses': self.misses,
+                'failures': self.failures,
+                'cert_refreshes': self.cert_refreshes,
+                'cert_refresh_failures': self.cert_refresh_failures,
+                'cert_expires_in_s': round(self.cert_expires_at - time.time()) if self.cert_expires_at else None,
+            }
+        stats['verify'] = self.verify_latency.stats()
+        stats['signature'] = self.signature_latency.stats()
+        stats['cert_fetch'] = self.cert_fetch_latency.stats()
+        return stats
@@ -0,0 +1,141 @@
+"""Écriture différée (write-behind) des plans dans Firestore.
+
+Les routes mettent à jour la copie en mémoire et rendent la main tout de
+suite. Un thread de fond regroupe les modifications successives d'un même
+utilisateur (debounce) et les écrit par lots, avec une durée maximale
+pendant laquelle une modification peut rester en attente.
+"""
+import atexit
+import os
+import signal
+import threading
+import time
+
+from plan_stream import LatencyStats
+
+
+class WriteBehindBuffer:
+    """Tampon des écritures en attente, vidé par un thread de fond."""
+
+    def __init__(self, flush_fn, debounce=2.0, max_staleness=10.0, max_batch=400, interval=0.5):
+        self.flush_fn = flush_fn
+        self.debounce = debounce
+        self.max_staleness = max_staleness
+        self.max_batch = max_batch
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self.enqueued = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.flushed_items = 0
+        self.failures = 0
+        self.flush_latency = LatencyStats()
+
+    def put(self, key, value):
+        """Met une écriture en attente ; une écriture déjà en attente pour la même clé est remplacée."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = [value, now, now]
+            else:
+                entry[0] = value
+                entry[2] = now
+                self.coalesced += 1
+            self.enqueued += 1
+        self._ensure_thread()
+
+    def get(self, key):
+        """Valeur en attente d'écriture pour cette clé, ou None."""
+        with self._lock:
+            entry = self._pending.get(key)
+            return entry[0] if entry else None
+
+    def _ensure_thread(self):
+        # Le thread est (re)créé dans chaque worker après le fork
+        if self._thread is None or self._thread_pid != os.getpid() or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or self._thread_pid != os.getpid() or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._loop, name='write-behind', daemon=True)
+                    self._thread_pid = os.getpid()
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Erreur du write-behind: {e}")
+
+    def _take_due(self, force):
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for key, (value, first, last) in list(self._pending.items()):
+                if force or now - last >= self.debounce or now - first >= self.max_staleness:
+                    due.append((key, value, first))
+                    del self._pending[key]
+                    if len(due) >= self.max_batch:
+                        break
+        return due
+
+    def flush(self, force=False):
+        """Écrit les modifications arrivées à échéance (toutes si force=True)."""
+        written = 0
+        while True:
+            due = self._take_due(force)
+            if not due:
+                return written
+            started = time.perf_counter()
+            try:
+                self.flush_fn([(key, value) for key, value, _ in due])
+            except Exception as e:
+                print(f"⚠️ Échec de l'écriture différée ({len(due)} éléments): {e}")
+                with self._lock:
+                    self.failures += 1
+                    # Remettre en attente sans écraser une modification plus récente
+                    for key, value, first in due:
+                        if key not in self._pending:
+                            self._pending[key] = [value, first, time.monotonic()]
+                return written
+            self.flush_latency.record((time.perf_counter() - started) * 1000)
+            with self._lock:
+                self.flushes += 1
+                self.flushed_items += len(due)
+            written += len(due)
+            if not force and len(due) < self.max_batch:
+                return written
+
+    def install_shutdown_hooks(self):
+        """Vide le tampon à l'arrêt du processus (atexit et SIGTERM hors gunicorn)."""
+        atexit.register(self.flush, True)
+        if threading.current_thread() is not threading.main_thread():
+            return
+        # Sous gunicorn, le worker gère déjà SIGTERM (arrêt propre puis atexit et hook worker_exit)
+        if signal.getsignal(signal.SIGTERM) is signal.SIG_DFL:
+            def handle_sigterm(signum, frame):
+                self.flush(force=True)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                os.kill(os.getpid(), signal.SIGTERM)
+            signal.signal(signal.SIGTERM, handle_sigterm)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            oldest = max((now - first for _, first, _ in self._pending.values()), default=0.0)
+            return {
+                'pending': len(self._pending),
+                'oldest_pending_s': round(oldest, 3),
+                'enqueued': self.enqueued,
+                'coalesced': self.coalesced,
+                'flushes': self.flushes,
+                'flushed_items': self.flushed_items,
+                'failures': self.failures,
+                'flush_latency': self.flush_latency.stats(),
+            }